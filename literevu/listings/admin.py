@@ -4,50 +4,352 @@ Configuration de l'interface d'administration pour l'application LITRevu.
 Ce fichier définit comment les modèles sont affichés et gérés dans
 l'interface d'administration Django. Il permet aux administrateurs de :
 - Visualiser les tickets, critiques et relations entre utilisateurs
-- Filtrer et rechercher les données
-- Modifier ou supprimer des entrées
+- Filtrer et rechercher les données (index plein texte pour les tickets et
+  critiques, voir search.py)
+- Modifier ou supprimer des entrées ; les tickets et les comptes sont
+  supprimés en arrière-plan (BackgroundDeletionMixin, deletions.py), dont
+  l'avancement est suivi dans la liste des suppressions
+
+Les listes restent rapides sur des tables de plusieurs millions de lignes :
+- LargeTableAdmin : objets liés chargés par jointure, nombre de lignes
+  estimé (EstimatedCountPaginator) et navigation par date sur index
+  (IndexedDatesQuerySet)
+- RatingFilter / username_filter : filtres qui ne parcourent pas la table ;
+  username_filter filtre par nom d'utilisateur saisi (autocomplétion par
+  l'API de recherche des utilisateurs) au lieu de la liste de tous les
+  utilisateurs
 """
 
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.contrib import admin
-from .models import Ticket, Review, UserFollows
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from . import deletions, search
+from .models import Deletion, Job, Ticket, Review, UserBlocks, UserFollows
+
+# Nombre de lignes au-delà duquel une liste n'est plus comptée exactement
+COUNT_LIMIT = getattr(settings, "LISTINGS_ADMIN_COUNT_LIMIT", 10000)
+
+
+def estimated_count(model, using="default"):
+    """
+    Estime le nombre de lignes d'une table sans la parcourir.
+
+    PostgreSQL fournit l'estimation du planificateur (pg_class.reltuples).
+    SQLite fournit celle de la dernière commande ANALYZE (sqlite_stat1), ou à
+    défaut le plus grand identifiant, lu sur la clé primaire.
+
+    Args:
+        model: Le modèle de la table
+        using: L'alias de la base de données
+
+    Returns:
+        int: Le nombre estimé de lignes, ou None si la base n'en fournit pas
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        "postgresql": [
+            ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        ],
+        "sqlite": [
+            ("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]),
+            (f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}", []),
+        ],
+    }
+    for sql, params in queries.get(connection.vendor, []):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+        except DatabaseError:
+            continue
+        if row and row[0] is not None:
+            estimate = int(str(row[0]).split()[0])
+            if estimate >= 0:
+                return estimate
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginateur qui évite le COUNT(*) complet des grandes tables.
+
+    Une liste sans filtre est comptée par estimated_count ; une liste filtrée
+    est comptée jusqu'à COUNT_LIMIT lignes au plus (COUNT sur une sous-requête
+    limitée), ce qui borne aussi le nombre de pages proposées.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+def _period_start(value, kind):
+    """Début de l'année, du mois ou du jour d'une date (fuseau courant)"""
+    value = timezone.localtime(value)
+    start = datetime(
+        value.year,
+        value.month if kind != "year" else 1,
+        value.day if kind == "day" else 1,
+    )
+    return timezone.make_aware(start)
+
+
+def _next_period(start, kind):
+    """Début de la période suivante"""
+    start = timezone.localtime(start).replace(tzinfo=None)
+    if kind == "year":
+        following = start.replace(year=start.year + 1)
+    elif kind == "month":
+        following = (start + timedelta(days=32)).replace(day=1)
+    else:
+        following = start + timedelta(days=1)
+    return timezone.make_aware(following)
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """
+    Remplace le SELECT DISTINCT de `datetimes()`, qui parcourt toutes les
+    lignes, par une suite de recherches sur l'index de la date : la première
+    date de chaque période est lue avec MIN(date) >= début de la période.
+    Le nombre de requêtes est celui des périodes affichées (années, mois ou
+    jours), quel que soit le nombre de lignes.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None, is_dst=None):
+        if kind not in ("year", "month", "day") or not settings.USE_TZ:
+            return super().datetimes(field_name, kind, order, tzinfo)
+        periods = []
+        first = self.aggregate(first=Min(field_name))["first"]
+        while first is not None:
+            periods.append(_period_start(first, kind))
+            following = _next_period(periods[-1], kind)
+            first = self.filter(**{f"{field_name}__gte": following}).aggregate(
+                first=Min(field_name)
+            )["first"]
+        return periods if order == "ASC" else periods[::-1]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Options communes aux listes des grandes tables : pas de second COUNT(*)
+    pour le total, nombre de lignes estimé et navigation par date sur index.
+    Chaque sous-classe déclare `list_select_related` pour que les colonnes
+    liées (auteur, ticket) ne déclenchent pas une requête par ligne.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        if not self.date_hierarchy:
+            return super().get_queryset(request)
+        # Même requête que ModelAdmin.get_queryset, dans un IndexedDatesQuerySet
+        # que les filtres de la liste conservent
+        queryset = IndexedDatesQuerySet(self.model)
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+
+class BackgroundDeletionMixin:
+    """
+    Remplace la suppression synchrone de l'administration par la suppression
+    en arrière-plan (deletions.py) : l'action delete_selected est retirée, et
+    la page de suppression d'un objet masque l'objet et met sa suppression en
+    file au lieu de la cascade. La page de confirmation ne parcourt pas non
+    plus les lignes liées.
+    """
+
+    # Fonction de deletions.py appelée pour chaque objet supprimé
+    background_delete = None
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.background_delete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.background_delete(obj)
+
+
+def username_filter(field_name, title):
+    """
+    Construit un filtre de liste par nom d'utilisateur saisi.
+
+    Contrairement au filtre par défaut d'une clé étrangère, qui affiche tous
+    les utilisateurs, le filtre est un champ texte complété par l'API de
+    recherche des utilisateurs (`/api/users/`). Un identifiant numérique est
+    aussi accepté.
+
+    Args:
+        field_name: Le champ du modèle qui désigne l'utilisateur
+        title: Le titre du filtre
+
+    Returns:
+        type: La classe du filtre, à placer dans `list_filter`
+    """
+
+    class UsernameFilter(admin.SimpleListFilter):
+        template = "admin/listings/username_filter.html"
+        parameter_name = field_name
+
+        def __init__(self, request, params, model, model_admin):
+            super().__init__(request, params, model, model_admin)
+            # Paramètres de la liste conservés par le formulaire du filtre
+            self.preserved = [
+                (name, value)
+                for name, values in request.GET.lists()
+                if name not in (self.parameter_name, "p")
+                for value in values
+            ]
+
+        def lookups(self, request, model_admin):
+            return ()
+
+        def has_output(self):
+            return True
+
+        def choices(self, changelist):
+            return []
+
+        def queryset(self, request, queryset):
+            value = (self.value() or "").strip()
+            if not value:
+                return queryset
+            user = User.objects.filter(username=value).first()
+            if user is None and value.isdigit():
+                user = User.objects.filter(pk=int(value)).first()
+            if user is None:
+                return queryset.none()
+            return queryset.filter(**{field_name: user})
+
+    UsernameFilter.title = title
+    return UsernameFilter
+
+
+class RatingFilter(admin.SimpleListFilter):
+    """
+    Filtre par note : les valeurs 0 à 5 sont connues, alors que le filtre par
+    défaut les lit par un SELECT DISTINCT sur toute la table.
+    """
+
+    title = "note"
+    parameter_name = "rating"
+
+    def lookups(self, request, model_admin):
+        return [(str(rating), f"{rating} étoile(s)") for rating in range(6)]
+
+    def queryset(self, request, queryset):
+        if self.value() in {str(rating) for rating in range(6)}:
+            return queryset.filter(rating=int(self.value()))
+        return queryset
+
+
+class FullTextSearchMixin:
+    """
+    Remplace la recherche par LIKE '%...%' de l'administration par une
+    requête sur l'index plein texte FTS5.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Filtre la liste sur les publications trouvées par l'index.
+
+        Returns:
+            tuple: (QuerySet filtré, False : aucun doublon possible)
+        """
+        if not search_term.strip():
+            return queryset, False
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return (
+            queryset.filter(id__in=search.matching_ids(self.model, search_term)),
+            False,
+        )
 
 
 @admin.register(Ticket)
-class TicketAdmin(admin.ModelAdmin):
+class TicketAdmin(BackgroundDeletionMixin, FullTextSearchMixin, LargeTableAdmin):
     """
     Configuration de l'interface d'administration pour les tickets.
 
     Fonctionnalités :
     - Liste les tickets avec leur titre, auteur et date de création
-    - Permet de filtrer par utilisateur et date
-    - Permet de rechercher dans les titres et descriptions
+    - Permet de filtrer par utilisateur et de naviguer par date
+    - Permet de rechercher dans les titres et descriptions (index plein texte)
+    - Permet de supprimer des tickets en arrière-plan (deletions.py)
     """
 
-    list_display = ("title", "user", "time_created")
-    list_filter = ("user", "time_created")
+    list_display = ("title", "user", "time_created", "hidden")
+    list_select_related = ("user",)
+    list_filter = (username_filter("user", "auteur"), "hidden")
+    date_hierarchy = "time_created"
     search_fields = ("title", "description")
+    autocomplete_fields = ("user",)
     ordering = ("-time_created",)  # Tri par date décroissante
+    actions = ["delete_in_background"]
+    background_delete = staticmethod(deletions.delete_ticket)
+
+    @admin.action(description="Supprimer en arrière-plan les tickets sélectionnés")
+    def delete_in_background(self, request, queryset):
+        """Masque les tickets sélectionnés et met leur suppression en file"""
+        tickets = list(queryset.filter(hidden=False).only("id", "title"))
+        self.delete_queryset(request, tickets)
+        self.message_user(
+            request, f"{len(tickets)} ticket(s) masqué(s), suppression en cours."
+        )
 
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(FullTextSearchMixin, LargeTableAdmin):
     """
     Configuration de l'interface d'administration pour les critiques.
 
     Fonctionnalités :
     - Liste les critiques avec leur titre, note, auteur, ticket associé et date
-    - Permet de filtrer par note, utilisateur et date
-    - Permet de rechercher dans les titres et contenus
+    - Permet de filtrer par note et utilisateur et de naviguer par date
+    - Permet de rechercher dans les titres et contenus (index plein texte)
     """
 
     list_display = ("headline", "rating", "user", "ticket", "time_created")
-    list_filter = ("rating", "user", "time_created")
+    list_select_related = ("user", "ticket")
+    list_filter = (RatingFilter, username_filter("user", "auteur"))
+    date_hierarchy = "time_created"
     search_fields = ("headline", "body")
+    autocomplete_fields = ("user", "ticket")
     ordering = ("-time_created",)  # Tri par date décroissante
 
 
 @admin.register(UserFollows)
-class UserFollowsAdmin(admin.ModelAdmin):
+class UserFollowsAdmin(LargeTableAdmin):
     """
     Configuration de l'interface d'administration pour les abonnements.
 
@@ -58,6 +360,119 @@ class UserFollowsAdmin(admin.ModelAdmin):
     """
 
     list_display = ("user", "followed_user")
-    list_filter = ("user", "followed_user")
-    search_fields = ("user__username", "followed_user__username")
-    ordering = ("user__username", "followed_user__username")
+    list_select_related = ("user", "followed_user")
+    list_filter = (
+        username_filter("user", "abonné"),
+        username_filter("followed_user", "utilisateur suivi"),
+    )
+    autocomplete_fields = ("user", "followed_user")
+    ordering = ("-id",)  # Abonnements les plus récents d'abord
+
+
+@admin.register(UserBlocks)
+class UserBlocksAdmin(LargeTableAdmin):
+    """
+    Configuration de l'interface d'administration pour les blocages.
+
+    Fonctionnalités :
+    - Liste les blocages avec leur date
+    - Permet de filtrer par utilisateur (qui bloque et bloqué)
+    """
+
+    list_display = ("user", "blocked_user", "time_created")
+    list_select_related = ("user", "blocked_user")
+    list_filter = (
+        username_filter("user", "utilisateur qui bloque"),
+        username_filter("blocked_user", "utilisateur bloqué"),
+    )
+    autocomplete_fields = ("user", "blocked_user")
+    ordering = ("-id",)
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    """
+    Configuration de l'interface d'administration pour les tâches d'arrière-plan.
+
+    Fonctionnalités :
+    - Liste les tâches avec leur état, leurs essais et leur dernière erreur
+    - Permet de filtrer par état et par nom de tâche
+    - Permet de remettre en file les tâches en échec
+    """
+
+    list_display = ("name", "status", "attempts", "available_at", "time_finished")
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    ordering = ("-id",)
+    actions = ["retry"]
+
+    @admin.action(description="Remettre en file les tâches sélectionnées")
+    def retry(self, request, queryset):
+        """Remet en file les tâches sélectionnées pour un nouvel essai"""
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, available_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} tâche(s) remise(s) en file.")
+
+
+@admin.register(Deletion)
+class DeletionAdmin(LargeTableAdmin):
+    """
+    Configuration de l'interface d'administration pour les suppressions en
+    arrière-plan.
+
+    Fonctionnalités :
+    - Liste les suppressions de tickets et de comptes avec leur avancement
+      (étape en cours, lignes supprimées, références aux images retirées)
+    - Permet de filtrer par type d'objet supprimé
+    """
+
+    list_display = (
+        "kind",
+        "label",
+        "step",
+        "rows_deleted",
+        "files_released",
+        "time_created",
+        "time_finished",
+    )
+    list_filter = ("kind",)
+    search_fields = ("label",)
+    ordering = ("-id",)
+    readonly_fields = list_display + ("object_id",)
+
+    def has_add_permission(self, request):
+        """Les suppressions sont créées par deletions.py uniquement"""
+        return False
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class AccountAdmin(BackgroundDeletionMixin, UserAdmin):
+    """
+    Administration des utilisateurs de Django, dont les comptes sont supprimés
+    en arrière-plan (deletions.py).
+    """
+
+    actions = ["delete_in_background"]
+    background_delete = staticmethod(deletions.delete_account)
+
+    def has_delete_permission(self, request, obj=None):
+        """
+        Un administrateur ne peut pas supprimer son propre compte : le compte
+        serait désactivé aussitôt, et sa session refusée
+        """
+        if obj is not None and obj.pk == request.user.pk:
+            return False
+        return super().has_delete_permission(request, obj)
+
+    @admin.action(description="Supprimer en arrière-plan les comptes sélectionnés")
+    def delete_in_background(self, request, queryset):
+        """Désactive les comptes sélectionnés et met leur suppression en file"""
+        users = list(queryset.exclude(pk=request.user.pk))
+        self.delete_queryset(request, users)
+        self.message_user(
+            request, f"{len(users)} compte(s) désactivé(s), suppression en cours."
+        )
@@ -9,6 +9,8 @@ Cette application gère :
 """
 
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class ListingsConfig(AppConfig):
@@ -19,6 +21,12 @@ class ListingsConfig(AppConfig):
     - Le type de clé primaire par défaut (BigAutoField)
     - Le nom de l'application pour Django
     - Les paramètres spécifiques à l'application
+    - La connexion des signaux (voir signals.py) et l'enregistrement des
+      tâches d'arrière-plan (voir tasks.py)
+    - La création de l'index de recherche plein texte après les migrations
+      (voir search.py)
+    - Les PRAGMA appliqués à chaque nouvelle connexion SQLite (voir
+      database.py)
     """
 
     # Utilisation de BigAutoField pour supporter un grand nombre d'entrées
@@ -29,3 +37,19 @@ class ListingsConfig(AppConfig):
 
     # Nom plus lisible pour l'interface d'administration
     verbose_name = "LITRevu - Critiques de livres"
+
+    def ready(self):
+        """Connecte les signaux et enregistre les tâches d'arrière-plan"""
+        from . import database, signals, tasks  # noqa: F401
+
+        post_migrate.connect(_create_search_index, sender=self)
+        connection_created.connect(
+            database.configure_connection, dispatch_uid="listings_sqlite_pragmas"
+        )
+
+
+def _create_search_index(using="default", **kwargs):
+    """Crée la table virtuelle de recherche plein texte après les migrations"""
+    from . import search
+
+    search.create_index(using)
@@ -0,0 +1,67 @@
+"""
+Backend d'authentification de l'application LITRevu.
+
+CachedModelBackend charge l'utilisateur de la session depuis le cache du
+processus, puis le cache partagé, et n'interroge la table auth_user qu'en cas
+d'échec. Django vérifie ensuite, comme avec ModelBackend, l'empreinte du mot
+de passe enregistrée dans la session : une session ouverte avant un
+changement de mot de passe reste refusée. Ce fichier contient :
+- CachedModelBackend : backend (AUTHENTICATION_BACKENDS)
+- invalidate_user : retire un utilisateur des deux niveaux du cache
+  (caching.TieredCache), appelé par les signaux de User et la déconnexion
+
+Le cache partagé doit être commun à tous les processus (CACHES) pour qu'une
+invalidation soit vue partout ; le cache du processus, lui, n'est invalidé que
+dans le processus courant et garde un utilisateur au plus
+LISTINGS_USER_LOCAL_TIMEOUT secondes.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.db import transaction
+
+from .caching import TieredCache
+
+# Durée de vie d'un utilisateur dans le cache partagé (en secondes)
+TIMEOUT = getattr(settings, "LISTINGS_USER_CACHE_TIMEOUT", 300)
+
+# Nombre d'utilisateurs gardés dans le cache du processus
+LOCAL_SIZE = getattr(settings, "LISTINGS_USER_LOCAL_SIZE", 10000)
+
+# Durée de vie d'un utilisateur dans le cache du processus (en secondes)
+LOCAL_TIMEOUT = getattr(settings, "LISTINGS_USER_LOCAL_TIMEOUT", 5)
+
+_users = TieredCache(
+    "users", timeout=TIMEOUT, local_size=LOCAL_SIZE, local_timeout=LOCAL_TIMEOUT
+)
+
+
+def invalidate_user(user_id):
+    """
+    Retire un utilisateur des caches.
+
+    Les caches sont vidés immédiatement, pour que la requête en cours relise
+    l'utilisateur, puis de nouveau après la validation de la transaction,
+    pour qu'une requête concurrente ne remette pas en cache l'ancien état.
+
+    Args:
+        user_id: L'identifiant de l'utilisateur
+    """
+    _users.delete(user_id)
+    transaction.on_commit(lambda: _users.delete(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend dont get_user (appelé à chaque requête authentifiée) est
+    servi par le cache du processus, puis le cache partagé.
+    """
+
+    def get_user(self, user_id):
+        user = _users.get(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            _users.set(user_id, user)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,562 @@
+"""
+Mesure des temps de réponse et du nombre de requêtes SQL des pages.
+
+Les pages sont appelées par le client de test de Django, ou directement par
+les applications WSGI et ASGI du projet, connectées avec des utilisateurs
+existants, sans serveur HTTP. Ce fichier contient :
+- PAGES : pages mesurées par défaut
+- sample_users : utilisateurs connectés pendant les mesures
+- measure : temps et nombre de requêtes SQL de chaque page
+- summarize : percentiles d'une série de mesures
+- compare : régressions entre deux résultats enregistrés
+- session_cookies / throughput : débit d'une page sous WSGI (un thread par
+  requête simultanée) ou sous ASGI (une boucle asyncio) à concurrence donnée
+- contention : lectures du flux pendant des écritures, pour un profil SQLite
+- hydration : temps et mémoire par publication des instances de modèles et
+  des objets légers de records.py
+"""
+
+import asyncio
+import math
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import database, feeds
+from .models import Review, Ticket
+
+# Pages mesurées : {nom: nom de l'URL}
+PAGES = {
+    "feed": "feed",
+    "posts": "posts",
+    "feed_updates": "feed-updates",
+    "follow_users": "follow-users",
+}
+
+# Percentiles calculés pour chaque page
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _host():
+    """Renvoie un nom d'hôte accepté par ALLOWED_HOSTS pour le client de test"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def sample_users(count, seed):
+    """
+    Tire des utilisateurs au hasard, en privilégiant ceux qui publient.
+
+    Args:
+        count: Le nombre d'utilisateurs
+        seed: La graine du tirage
+
+    Returns:
+        list: Les utilisateurs tirés, triés par identifiant
+
+    Raises:
+        ValueError: Si la base ne contient aucun utilisateur actif
+    """
+    ids = list(
+        User.objects.filter(is_active=True, ticket__isnull=False)
+        .distinct()
+        .values_list("id", flat=True)
+    ) or list(User.objects.filter(is_active=True).values_list("id", flat=True))
+    if not ids:
+        raise ValueError("Aucun utilisateur : lancez d'abord generate_dataset.")
+    chosen = random.Random(seed).sample(ids, min(count, len(ids)))
+    return list(User.objects.filter(id__in=chosen).order_by("id"))
+
+
+def percentile(samples, rank):
+    """
+    Calcule un percentile par la méthode du rang le plus proche.
+
+    Args:
+        samples: Les mesures triées par ordre croissant
+        rank: Le percentile (entre 0 et 100)
+
+    Returns:
+        float: La valeur du percentile
+    """
+    index = max(0, math.ceil(rank / 100 * len(samples)) - 1)
+    return samples[index]
+
+
+def summarize(durations, queries):
+    """
+    Résume les mesures d'une page.
+
+    Args:
+        durations: Les temps de réponse (en millisecondes)
+        queries: Le nombre de requêtes SQL de chaque réponse
+
+    Returns:
+        dict: Percentiles, moyenne et maximum des temps, nombre de requêtes
+    """
+    durations = sorted(durations)
+    summary = {f"p{rank}_ms": percentile(durations, rank) for rank in PERCENTILES}
+    summary.update(
+        mean_ms=sum(durations) / len(durations),
+        max_ms=durations[-1],
+        samples=len(durations),
+        queries_min=min(queries),
+        queries_max=max(queries),
+        queries_mean=sum(queries) / len(queries),
+    )
+    return summary
+
+
+def measure(users, pages=PAGES, requests=20, warmup=1, url_for=None):
+    """
+    Mesure chaque page pour une liste d'utilisateurs.
+
+    Args:
+        users: Les utilisateurs connectés tour à tour
+        pages: Les pages à mesurer ({nom: nom de l'URL})
+        requests: Le nombre de requêtes mesurées par utilisateur et par page
+        warmup: Le nombre de requêtes non mesurées avant les mesures (caches)
+        url_for: Fonction optionnelle (nom, utilisateur) -> URL à appeler
+
+    Returns:
+        dict: {nom de la page: résumé des mesures (voir summarize)}
+    """
+    url_for = url_for or (lambda name, user: reverse(pages[name]))
+    results = {}
+    for name in pages:
+        durations, queries = [], []
+        for user in users:
+            client = Client(HTTP_HOST=_host())
+            client.force_login(user)
+            url = url_for(name, user)
+            for _ in range(warmup):
+                client.get(url)
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    durations.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} : réponse {response.status_code}")
+                queries.append(len(captured))
+        results[name] = summarize(durations, queries)
+    return results
+
+
+def compare(old, new, threshold=0.2):
+    """
+    Compare deux résultats et liste les régressions.
+
+    Un temps est en régression s'il dépasse l'ancien de plus de `threshold`
+    (en proportion) ; un nombre de requêtes l'est dès qu'il augmente.
+
+    Args:
+        old: Les résultats de référence ({page: résumé})
+        new: Les nouveaux résultats ({page: résumé})
+        threshold: La hausse de temps tolérée (0.2 = 20 %)
+
+    Returns:
+        list: Les régressions, sous forme de tuples
+            (page, mesure, ancienne valeur, nouvelle valeur)
+    """
+    regressions = []
+    for page, summary in new.items():
+        reference = old.get(page)
+        if reference is None:
+            continue
+        for metric, value in summary.items():
+            before = reference.get(metric)
+            if before is None or metric == "samples":
+                continue
+            if metric.startswith("queries_"):
+                regressed = value > before
+            else:
+                regressed = value > before * (1 + threshold)
+            if regressed:
+                regressions.append((page, metric, before, value))
+    return regressions
+
+
+# Interfaces comparées par throughput
+INTERFACES = ("wsgi", "asgi")
+
+
+def session_cookies(users):
+    """
+    Ouvre une session pour chaque utilisateur.
+
+    Args:
+        users: Les utilisateurs à connecter
+
+    Returns:
+        list: L'en-tête Cookie de chaque session
+    """
+    cookies = []
+    for user in users:
+        client = Client(HTTP_HOST=_host())
+        client.force_login(user)
+        name = settings.SESSION_COOKIE_NAME
+        cookies.append(f"{name}={client.cookies[name].value}")
+    return cookies
+
+
+def _wsgi_get(application, url, cookie):
+    """Appelle l'application WSGI et renvoie le code de la réponse"""
+    path, _, query = url.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "HTTP_HOST": _host(),
+        "HTTP_COOKIE": cookie,
+    }
+    setup_testing_defaults(environ)
+    status = []
+    body = application(
+        environ, lambda line, headers, exc_info=None: status.append(line)
+    )
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def _asgi_get(application, url, cookie):
+    """Appelle l'application ASGI et renvoie le code de la réponse"""
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", _host().encode()), (b"cookie", cookie.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": (_host(), 80),
+    }
+    received = False
+    status = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Le client reste connecté jusqu'à la fin de la réponse
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def _run_wsgi(calls, concurrency):
+    """Exécute les appels dans `concurrency` threads ; renvoie les mesures"""
+    application = get_wsgi_application()
+
+    def timed(call):
+        start = time.perf_counter()
+        status = _wsgi_get(application, *call)
+        return (time.perf_counter() - start) * 1000, status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed, calls))
+
+
+async def _run_asgi(calls, concurrency):
+    """Exécute les appels avec `concurrency` tâches asyncio ; renvoie les mesures"""
+    application = get_asgi_application()
+    pending = iter(calls)
+    results = []
+
+    async def worker():
+        for call in pending:
+            start = time.perf_counter()
+            status = await _asgi_get(application, *call)
+            results.append(((time.perf_counter() - start) * 1000, status))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def throughput(interface, urls, cookies, concurrency, requests):
+    """
+    Mesure le débit d'une application à concurrence donnée.
+
+    Les requêtes sont envoyées directement à l'application WSGI (un thread
+    par requête simultanée, comme un serveur à threads) ou ASGI (tâches d'une
+    même boucle asyncio), sans réseau : seul le coût de Django et de la base
+    est mesuré.
+
+    Args:
+        interface: "wsgi" ou "asgi"
+        urls: Les URL appelées tour à tour
+        cookies: Les en-têtes Cookie des sessions utilisées tour à tour
+        concurrency: Le nombre de requêtes simultanées
+        requests: Le nombre total de requêtes
+
+    Returns:
+        dict: Requêtes par seconde, percentiles des temps de réponse et
+            nombre de réponses en erreur
+    """
+    # Chaque URL est appelée tour à tour par chaque session
+    calls = [
+        (urls[index % len(urls)], cookies[index // len(urls) % len(cookies)])
+        for index in range(requests)
+    ]
+    start = time.perf_counter()
+    if interface == "asgi":
+        results = asyncio.run(_run_asgi(calls, concurrency))
+    else:
+        results = _run_wsgi(calls, concurrency)
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(duration for duration, _ in results)
+    summary = {
+        "requests_per_second": len(results) / elapsed,
+        "errors": sum(1 for _, status in results if status != 200),
+    }
+    summary.update((f"p{rank}_ms", percentile(durations, rank)) for rank in PERCENTILES)
+    return summary
+
+
+def _copy_database(path):
+    """
+    Copie la base principale (API de sauvegarde de SQLite) dans `path`, par
+    la connexion de Django : la copie vaut aussi pour une base en mémoire
+    (base de test).
+    """
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+def _sqlite_connect(path, pragmas, read_only=False):
+    """Ouvre une connexion SQLite comme Django (attente de verrou de 5 s)"""
+    uri = f"file:{path}{'?mode=ro' if read_only else ''}"
+    raw = sqlite3.connect(
+        uri, uri=True, timeout=5, isolation_level=None, check_same_thread=False
+    )
+    database.apply_pragmas(raw.cursor(), pragmas, read_only)
+    return raw
+
+
+def contention(profile, users, readers, writers, duration, batch):
+    """
+    Mesure les lectures du flux pendant des écritures, pour un profil SQLite.
+
+    La mesure porte sur une copie de la base : des threads lecteurs lisent
+    tour à tour la première page du flux matérialisé des utilisateurs (par la
+    connexion en lecture seule avec le profil "production"), pendant que des
+    threads écrivains modifient `batch` tickets par transaction.
+
+    Args:
+        profile: Le profil de PRAGMA (clé de database.PROFILES)
+        users: Les utilisateurs dont le flux est lu
+        readers: Le nombre de threads lecteurs
+        writers: Le nombre de threads écrivains
+        duration: La durée de la mesure (en secondes)
+        batch: Le nombre de tickets modifiés par transaction
+
+    Returns:
+        dict: Lectures et écritures par seconde, percentiles des lectures et
+            nombre d'erreurs de verrou ("database is locked")
+    """
+    # Les réglages par défaut de SQLite : journal de retour arrière
+    pragmas = {"journal_mode": "delete", **database.PROFILES[profile]}
+    replica = bool(database.PROFILES[profile])
+    reads = []
+    for user in users:
+        sql, params = feeds.timeline_keys(user)[
+            : feeds.PAGE_SIZE
+        ].query.sql_with_params()
+        # Paramètres au format du module sqlite3
+        reads.append((sql % (("?",) * len(params)), params))
+    ticket_table = connection.ops.quote_name(Ticket._meta.db_table)
+    last_ticket = Ticket.objects.aggregate(last=Max("pk"))["last"] or 1
+    update = f"UPDATE {ticket_table} SET time_edited = ? WHERE id = ?"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/contention.sqlite3"
+        _copy_database(path)
+        _sqlite_connect(path, pragmas).close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        durations, counts = [], {"writes": 0, "read_errors": 0, "write_errors": 0}
+
+        def reader(index):
+            raw = _sqlite_connect(path, pragmas, read_only=replica)
+            local = []
+            errors = 0
+            while not stop.is_set():
+                sql, params = reads[index % len(reads)]
+                index += 1
+                start = time.perf_counter()
+                try:
+                    raw.execute(sql, params).fetchall()
+                except sqlite3.OperationalError as error:
+                    if "locked" not in str(error):
+                        raise
+                    errors += 1
+                    continue
+                local.append((time.perf_counter() - start) * 1000)
+            raw.close()
+            with lock:
+                durations.extend(local)
+                counts["read_errors"] += errors
+
+        def writer(seed):
+            raw = _sqlite_connect(path, pragmas)
+            rng = random.Random(seed)
+            writes = errors = 0
+            while not stop.is_set():
+                try:
+                    raw.execute("BEGIN")
+                    for _ in range(batch):
+                        raw.execute(
+                            update,
+                            (timezone.now().isoformat(), rng.randint(1, last_ticket)),
+                        )
+                    raw.execute("COMMIT")
+                    writes += 1
+                except sqlite3.OperationalError as error:
+                    if "locked" not in str(error):
+                        raise
+                    errors += 1
+                    if raw.in_transaction:
+                        raw.execute("ROLLBACK")
+            raw.close()
+            with lock:
+                counts["writes"] += writes
+                counts["write_errors"] += errors
+
+        threads = [
+            threading.Thread(target=reader, args=(index,)) for index in range(readers)
+        ] + [threading.Thread(target=writer, args=(seed,)) for seed in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    durations.sort()
+    summary = {
+        "reads_per_second": len(durations) / duration,
+        "writes_per_second": counts["writes"] / duration,
+        "lock_errors": counts["read_errors"] + counts["write_errors"],
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+    }
+    summary.update(
+        (f"read_p{rank}_ms", percentile(durations, rank) if durations else None)
+        for rank in PERCENTILES
+    )
+    return summary
+
+
+def _latest_keys(count):
+    """Clés (time_created, content_type, id) des `count` dernières publications"""
+    keys = [
+        (time_created, content_type, pk)
+        for content_type, model in ((feeds.TICKET, Ticket), (feeds.REVIEW, Review))
+        for pk, time_created in model.objects.filter(hidden=False)
+        .order_by("-time_created")
+        .values_list("pk", "time_created")[:count]
+    ]
+    keys.sort(reverse=True)
+    return keys[:count]
+
+
+def _hydrate_models(keys):
+    """Chargement des publications en instances de modèles (avant records.py)"""
+    ticket_ids, review_ids = feeds._split_ids(keys)
+    objects = {
+        feeds.TICKET: Ticket.objects.select_related("user").in_bulk(ticket_ids),
+        feeds.REVIEW: Review.objects.select_related(
+            "user", "ticket", "ticket__user"
+        ).in_bulk(review_ids),
+    }
+    return feeds._ordered(keys, objects)
+
+
+def hydration(count, page=500, rounds=3):
+    """
+    Compare le chargement des publications en instances de modèles et en
+    objets légers (records.py).
+
+    Les `count` dernières publications sont chargées par pages de `page`
+    clés. Le temps retenu est le meilleur de `rounds` passages ; la mémoire
+    est celle que gardent les publications chargées (tracemalloc), une fois
+    les lignes lues libérées.
+
+    Args:
+        count: Le nombre de publications chargées
+        page: Le nombre de clés chargées par appel
+        rounds: Le nombre de passages chronométrés
+
+    Returns:
+        dict: {méthode: posts, ms_per_post, bytes_per_post}, et le rapport
+            entre les deux méthodes
+    """
+    keys = _latest_keys(count)
+    if not keys:
+        raise ValueError("Aucune publication à charger.")
+    pages = [keys[start : start + page] for start in range(0, len(keys), page)]
+    results = {}
+    for name, load in (("models", _hydrate_models), ("records", feeds.hydrate)):
+        durations = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for chunk in pages:
+                load(chunk)
+            durations.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            posts = [post for chunk in pages for post in load(chunk)]
+            retained, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[name] = {
+            "posts": len(posts),
+            "ms_per_post": min(durations) * 1000 / len(keys),
+            "bytes_per_post": retained / len(posts),
+        }
+        del posts
+    results["ratio"] = {
+        field: results["models"][field] / results["records"][field]
+        for field in ("ms_per_post", "bytes_per_post")
+    }
+    return results
@@ -0,0 +1,191 @@
+"""
+Références des tickets aux fichiers d'images partagés.
+
+Les images sont stockées une seule fois par contenu (storage.py) : plusieurs
+tickets peuvent désigner le même original ou les mêmes déclinaisons. Chaque
+fichier a une ligne ImageBlob qui compte ses références ; le fichier n'est
+supprimé qu'après la validation de la transaction qui retire sa dernière
+référence. Ce fichier contient :
+- ticket_files : fichiers désignés par un ticket (original et déclinaisons)
+- reserve : réservation d'un fichier réutilisé par un envoi (storage.py)
+- acquire / release : ajout et retrait de références, appelés par les signaux
+- collect : suppression des fichiers qui ne sont plus référencés ni réservés
+- references / rebuild : recalcul des compteurs à partir des tickets
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ImageBlob, Ticket
+from .storage import image_storage
+
+# Durée pendant laquelle un fichier réutilisé par un envoi est protégé de
+# collect, le temps que le ticket qui le désigne soit enregistré (en secondes)
+RESERVATION = getattr(settings, "LISTINGS_BLOB_RESERVATION", 3600)
+
+
+def ticket_files(image, renditions):
+    """
+    Renvoie les fichiers désignés par un ticket.
+
+    Args:
+        image: Le nom de l'image (ou le champ de fichier)
+        renditions: Les déclinaisons {format: {largeur: nom}}
+
+    Returns:
+        set: Les noms de l'original et des déclinaisons
+    """
+    names = {str(image)} if image else set()
+    for widths in (renditions or {}).values():
+        names.update(widths.values())
+    return names
+
+
+def _size(storage, name):
+    """Taille d'un fichier, ou 0 s'il n'existe pas"""
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
+
+
+def reserve(name):
+    """
+    Réserve un fichier avant qu'un envoi ne décide de le réutiliser.
+
+    Appelée par le stockage avant de tester l'existence du fichier : si
+    collect a supprimé la ligne entre-temps, il a aussi supprimé le fichier,
+    que l'envoi réécrit ; sinon, la réservation empêche collect de le
+    supprimer avant l'enregistrement du ticket (acquire).
+
+    Args:
+        name: Le nom du fichier dans le stockage
+
+    Returns:
+        bool: True si le fichier a une ligne ImageBlob, désormais réservée
+    """
+    reserved_until = timezone.now() + timedelta(seconds=RESERVATION)
+    return bool(
+        ImageBlob.objects.filter(name=name).update(reserved_until=reserved_until)
+    )
+
+
+def acquire(names):
+    """
+    Ajoute une référence à des fichiers.
+
+    Args:
+        names: Les noms des fichiers désignés par un nouveau ticket ou une
+            nouvelle image
+    """
+    names = sorted(names)
+    if not names:
+        return
+    storage = image_storage()
+    ImageBlob.objects.bulk_create(
+        [ImageBlob(name=name, size=_size(storage, name)) for name in names],
+        ignore_conflicts=True,
+    )
+    ImageBlob.objects.filter(name__in=names).update(refcount=F("refcount") + 1)
+
+
+def release(names):
+    """
+    Retire une référence à des fichiers et supprime, après validation de la
+    transaction, ceux qui ne sont plus référencés.
+
+    Args:
+        names: Les noms des fichiers qui ne sont plus désignés par un ticket
+    """
+    names = sorted(names)
+    if not names:
+        return
+    ImageBlob.objects.filter(name__in=names, refcount__gt=0).update(
+        refcount=F("refcount") - 1
+    )
+    transaction.on_commit(lambda: collect(names))
+
+
+def collect(names=None):
+    """
+    Supprime les fichiers sans référence.
+
+    La ligne est supprimée avant le fichier, dans une transaction qui vérifie
+    que le compteur est toujours nul et que le fichier n'est pas réservé
+    (reserve) : une référence ou une réservation ajoutée entre-temps
+    conserve le fichier.
+
+    Args:
+        names: Les fichiers à examiner (tous les fichiers sans référence si
+            None)
+
+    Returns:
+        tuple: (nombre de fichiers supprimés, octets libérés)
+    """
+    unreferenced = ImageBlob.objects.filter(refcount=0)
+    if names is not None:
+        unreferenced = unreferenced.filter(name__in=names)
+    storage = image_storage()
+    deleted = freed = 0
+    for blob in unreferenced.iterator():
+        unreserved = Q(reserved_until__isnull=True) | Q(
+            reserved_until__lt=timezone.now()
+        )
+        with transaction.atomic():
+            if not ImageBlob.objects.filter(
+                unreserved, pk=blob.pk, refcount=0
+            ).delete()[0]:
+                continue
+            storage.delete(blob.name)
+        deleted += 1
+        freed += blob.size
+    return deleted, freed
+
+
+def references():
+    """
+    Compte les références aux fichiers à partir des tickets.
+
+    Returns:
+        Counter: {nom du fichier: nombre de tickets qui le désignent}
+    """
+    counts = Counter()
+    rows = (
+        Ticket.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .values_list("image", "renditions")
+    )
+    for image, renditions in rows.iterator():
+        counts.update(ticket_files(image, renditions))
+    return counts
+
+
+def rebuild():
+    """
+    Recalcule tous les compteurs de références à partir des tickets, puis
+    supprime les fichiers qui ne sont plus référencés.
+
+    Returns:
+        tuple: (nombre de fichiers supprimés, octets libérés)
+    """
+    counts = references()
+    storage = image_storage()
+    with transaction.atomic():
+        existing = dict(ImageBlob.objects.values_list("name", "refcount"))
+        ImageBlob.objects.bulk_create(
+            [
+                ImageBlob(name=name, size=_size(storage, name), refcount=count)
+                for name, count in counts.items()
+                if name not in existing
+            ],
+            batch_size=500,
+        )
+        for name, refcount in existing.items():
+            if counts[name] != refcount:
+                ImageBlob.objects.filter(name=name).update(refcount=counts[name])
+    return collect()
@@ -0,0 +1,324 @@
+"""
+Cache d'objets à deux niveaux de l'application LITRevu.
+
+Les mêmes données chaudes (relations, utilisateurs, sessions...) sont relues
+par chaque processus à chaque requête. Ce fichier les sert depuis :
+- un cache LRU propre au processus (L1), borné et à durée de vie courte
+- le cache Django partagé entre les processus (L2, LISTINGS_CACHE_ALIAS)
+- et, en dernier recours, la fonction qui relit la donnée en base
+
+Une entrée modifiée est retirée des deux niveaux du processus qui la modifie
+(delete) ; les autres processus la gardent au plus la durée de vie de leur
+cache local, choisie courte pour chaque cache.
+
+Ce fichier contient :
+- LRUCache : cache LRU borné, à durée de vie, propre au processus
+- TieredCache : cache à deux niveaux
+- stats : succès, échecs et expulsions de chaque cache et de chaque niveau
+- clear_local : vide le cache du processus de tous les caches
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+# Cache Django partagé entre les processus (L2)
+ALIAS = getattr(settings, "LISTINGS_CACHE_ALIAS", DEFAULT_CACHE_ALIAS)
+
+# Durée de vie d'une entrée dans le cache partagé (en secondes)
+TIMEOUT = getattr(settings, "LISTINGS_CACHE_TIMEOUT", 300)
+
+# Nombre d'entrées gardées dans le cache du processus, pour chaque cache
+LOCAL_SIZE = getattr(settings, "LISTINGS_CACHE_LOCAL_SIZE", 10000)
+
+# Durée de vie d'une entrée dans le cache du processus (en secondes)
+LOCAL_TIMEOUT = getattr(settings, "LISTINGS_CACHE_LOCAL_TIMEOUT", 5)
+
+_MISSING = object()
+
+# Caches à deux niveaux créés par l'application : {nom: TieredCache}
+_registry = {}
+
+
+class LRUCache:
+    """
+    Cache LRU borné et à durée de vie, propre au processus.
+
+    Les valeurs sont stockées sérialisées (pickle) : chaque lecture renvoie
+    une copie, qu'une requête peut modifier sans affecter les autres.
+
+    Args:
+        size: Le nombre maximal d'entrées
+        timeout: La durée de vie d'une entrée (en secondes)
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=None):
+        """Renvoie une copie de la valeur, ou default si absente ou expirée"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=None):
+        """
+        Enregistre une valeur.
+
+        Args:
+            key: La clé
+            value: La valeur (sérialisable par pickle)
+            timeout: Une durée de vie plus courte que celle du cache
+        """
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if timeout <= 0:
+            self.delete(key)
+            return
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (payload, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key):
+        """Retire une entrée"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Vide le cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Renvoie les compteurs du cache depuis le démarrage du processus.
+
+        Returns:
+            dict: Succès, échecs, expulsions (taille maximale atteinte),
+                expirations et nombre d'entrées
+        """
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+
+class TieredCache:
+    """
+    Cache à deux niveaux : cache du processus (L1) devant le cache Django
+    partagé (L2).
+
+    Les clés sont préfixées par le nom du cache. Une lecture dans le cache
+    partagé qui échoue alors que ce processus y a écrit la même clé et que
+    sa durée de vie n'est pas écoulée est comptée comme une expulsion.
+
+    Args:
+        name: Le nom du cache (préfixe des clés, étiquette des statistiques)
+        timeout: La durée de vie d'une entrée dans le cache partagé
+        local_size: Le nombre d'entrées du cache du processus
+        local_timeout: La durée de vie d'une entrée dans le cache du processus
+        alias: L'alias du cache partagé
+    """
+
+    def __init__(
+        self,
+        name,
+        timeout=TIMEOUT,
+        local_size=LOCAL_SIZE,
+        local_timeout=LOCAL_TIMEOUT,
+        alias=ALIAS,
+    ):
+        self.name = name
+        self.timeout = timeout
+        self.alias = alias
+        self.local = LRUCache(local_size, local_timeout)
+        # Clés écrites par ce processus dans le cache partagé, jusqu'à leur
+        # expiration : une lecture qui les manque est une expulsion
+        self._written = LRUCache(local_size, timeout)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        _registry[name] = self
+
+    @property
+    def shared(self):
+        """Le cache Django partagé"""
+        return caches[self.alias]
+
+    def make_key(self, key):
+        """Construit la clé complète d'une entrée"""
+        return f"listings:{self.name}:{key}"
+
+    def _count(self, name):
+        """Incrémente un compteur du cache partagé"""
+        with self._lock:
+            self._stats[name] += 1
+
+    def _shared_result(self, full_key, value):
+        """Compte une lecture du cache partagé et remplit le cache du processus"""
+        if value is _MISSING:
+            self._count("misses")
+            if self._written.get(full_key) is not None:
+                self._written.delete(full_key)
+                self._count("evictions")
+            return
+        self._count("hits")
+        self.local.set(full_key, value)
+
+    def _stored(self, full_key, value, timeout):
+        """Enregistre dans le cache du processus une valeur écrite dans L2"""
+        timeout = self.timeout if timeout is None else timeout
+        self.local.set(full_key, value, timeout)
+        self._written.set(full_key, True, timeout)
+        return timeout
+
+    def get(self, key, default=None):
+        """
+        Lit une valeur dans le cache du processus, puis le cache partagé.
+
+        Args:
+            key: La clé (sans préfixe ni version)
+            default: La valeur renvoyée si la clé est absente
+
+        Returns:
+            La valeur en cache, ou default
+        """
+        full_key = self.make_key(key)
+        value = self.local.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(full_key, _MISSING)
+            self._shared_result(full_key, value)
+        return default if value is _MISSING else value
+
+    async def aget(self, key, default=None):
+        """Version asynchrone de get"""
+        full_key = self.make_key(key)
+        value = self.local.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = await self.shared.aget(full_key, _MISSING)
+            self._shared_result(full_key, value)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, timeout=None):
+        """
+        Enregistre une valeur dans les deux niveaux.
+
+        Args:
+            key: La clé (sans préfixe ni version)
+            value: La valeur (sérialisable par pickle)
+            timeout: La durée de vie dans le cache partagé (par défaut celle du
+                cache)
+        """
+        full_key = self.make_key(key)
+        self.shared.set(full_key, value, self._stored(full_key, value, timeout))
+
+    async def aset(self, key, value, timeout=None):
+        """Version asynchrone de set"""
+        full_key = self.make_key(key)
+        await self.shared.aset(full_key, value, self._stored(full_key, value, timeout))
+
+    def get_or_set(self, key, default, timeout=None):
+        """
+        Lit une valeur, ou la calcule et l'enregistre si elle est absente.
+
+        Args:
+            key: La clé (sans préfixe ni version)
+            default: La fonction qui calcule la valeur (lecture en base)
+            timeout: La durée de vie dans le cache partagé
+
+        Returns:
+            La valeur en cache ou calculée
+        """
+        full_key = self.make_key(key)
+        value = self.local.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(full_key, _MISSING)
+            self._shared_result(full_key, value)
+        if value is _MISSING:
+            value = default()
+            self.shared.set(full_key, value, self._stored(full_key, value, timeout))
+        return value
+
+    async def aget_or_set(self, key, default, timeout=None):
+        """
+        Version asynchrone de get_or_set : default est une coroutine.
+        """
+        full_key = self.make_key(key)
+        value = self.local.get(full_key, _MISSING)
+        if value is _MISSING:
+            value = await self.shared.aget(full_key, _MISSING)
+            self._shared_result(full_key, value)
+        if value is _MISSING:
+            value = await default()
+            timeout = self._stored(full_key, value, timeout)
+            await self.shared.aset(full_key, value, timeout)
+        return value
+
+    def delete(self, key):
+        """
+        Retire une entrée des deux niveaux.
+
+        Les autres processus peuvent la garder dans leur cache au plus
+        local_timeout secondes.
+
+        Args:
+            key: La clé (sans préfixe ni version)
+        """
+        full_key = self.make_key(key)
+        self.local.delete(full_key)
+        self._written.delete(full_key)
+        self.shared.delete(full_key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def stats(self):
+        """
+        Renvoie les compteurs des deux niveaux pour ce processus.
+
+        Returns:
+            dict: {"local": compteurs du cache du processus,
+                "shared": succès, échecs et expulsions du cache partagé}
+        """
+        with self._lock:
+            shared = dict(self._stats)
+        return {"local": self.local.stats(), "shared": shared}
+
+
+def stats():
+    """
+    Renvoie les compteurs de tous les caches à deux niveaux du processus.
+
+    Returns:
+        dict: {nom du cache: statistiques (voir TieredCache.stats)}
+    """
+    return {name: tiered.stats() for name, tiered in sorted(_registry.items())}
+
+
+def clear_local():
+    """
+    Vide le cache du processus (L1) de tous les caches à deux niveaux.
+
+    Le cache partagé n'est pas modifié : à utiliser avec cache.clear(), par
+    exemple entre deux tests qui réutilisent les mêmes identifiants.
+    """
+    for tiered in _registry.values():
+        tiered.local.clear()
+        tiered._written.clear()
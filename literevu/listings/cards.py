@@ -0,0 +1,106 @@
+"""
+Cache des cartes de publications de l'application LITRevu.
+
+Les cartes des tickets et des critiques (templates listings/partials/) sont
+mises en cache par le tag {% cache %}. La clé d'un fragment contient
+l'identifiant de la publication et sa date de modification, si bien qu'une
+publication modifiée n'est jamais servie depuis une ancienne entrée. Ce
+fichier supprime explicitement les fragments devenus inutiles lors d'une
+modification ou d'une suppression :
+- invalidate_ticket : cartes d'un ticket et des critiques qui l'affichent
+- invalidate_tickets : même chose pour plusieurs tickets (suppression d'un
+  compte)
+- invalidate_review : cartes d'une critique
+- invalidate_reviews : cartes de plusieurs critiques (suppression par lots)
+"""
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from .models import Review
+
+# Valeurs possibles des paramètres show_author et is_owner des cartes
+FLAGS = (True, False)
+
+
+def _ticket_keys(ticket_id, time_edited):
+    """Construit les clés de toutes les variantes de la carte d'un ticket"""
+    return [
+        make_template_fragment_key(
+            "ticket_card", [ticket_id, time_edited.isoformat(), show_author, is_owner]
+        )
+        for show_author in FLAGS
+        for is_owner in FLAGS
+    ]
+
+
+def _review_keys(review_id, time_edited, ticket_time_edited):
+    """Construit les clés de toutes les variantes de la carte d'une critique"""
+    return [
+        make_template_fragment_key(
+            "review_card",
+            [
+                review_id,
+                time_edited.isoformat(),
+                ticket_time_edited.isoformat(),
+                show_author,
+            ],
+        )
+        for show_author in FLAGS
+    ]
+
+
+def invalidate_ticket(ticket, time_edited=None):
+    """
+    Supprime les cartes d'un ticket et celles des critiques qui l'affichent.
+
+    Args:
+        ticket: Le ticket modifié ou supprimé
+        time_edited: La date de modification avant l'écriture (par défaut
+            celle de l'instance)
+    """
+    time_edited = time_edited or ticket.time_edited
+    keys = _ticket_keys(ticket.id, time_edited)
+    reviews = Review.objects.filter(ticket=ticket).values_list("id", "time_edited")
+    for review_id, review_edited in reviews:
+        keys += _review_keys(review_id, review_edited, time_edited)
+    cache.delete_many(keys)
+
+
+def invalidate_tickets(tickets):
+    """
+    Supprime les cartes de plusieurs tickets et des critiques qui les
+    affichent, en deux requêtes.
+
+    Args:
+        tickets: Les tickets supprimés (QuerySet)
+    """
+    keys = []
+    for ticket_id, time_edited in tickets.values_list("id", "time_edited"):
+        keys += _ticket_keys(ticket_id, time_edited)
+    cache.delete_many(keys)
+    invalidate_reviews(Review.objects.filter(ticket__in=tickets.values("pk")))
+
+
+def invalidate_review(review, time_edited=None):
+    """
+    Supprime les cartes d'une critique.
+
+    Args:
+        review: La critique modifiée ou supprimée
+        time_edited: La date de modification avant l'écriture (par défaut
+            celle de l'instance)
+    """
+    time_edited = time_edited or review.time_edited
+    cache.delete_many(_review_keys(review.id, time_edited, review.ticket.time_edited))
+
+
+def invalidate_reviews(reviews):
+    """
+    Supprime les cartes de plusieurs critiques, en une requête.
+
+    Args:
+        reviews: Les critiques supprimées (QuerySet)
+    """
+    rows = reviews.order_by().values_list("id", "time_edited", "ticket__time_edited")
+    cache.delete_many([key for row in rows for key in _review_keys(*row)])
@@ -0,0 +1,154 @@
+"""
+Réglages des connexions SQLite et répartition des lectures.
+
+Avec le profil de production (literevu/settings_production.py), chaque
+nouvelle connexion SQLite reçoit les PRAGMA du profil "production" (journal
+WAL, mmap, cache, délai d'attente des verrous, synchronisation) ;
+en mode WAL, les lecteurs ne bloquent plus l'écrivain ni l'inverse. Les
+pages en lecture seule (flux, posts) lisent par une connexion séparée,
+ouverte en lecture seule sur le même fichier ou sur une copie répliquée ;
+toutes les écritures vont à la base principale. Ce fichier contient :
+- PROFILES : PRAGMA de chaque profil (LISTINGS_SQLITE_PROFILE)
+- configure_connection : applique les PRAGMA à une nouvelle connexion
+- apply_pragmas : applique des PRAGMA par un curseur SQLite
+- ReadReplicaRouter : routeur de base de données lecture / écriture
+- replica_reads / reading_from_replica : vues et blocs dont les lectures vont
+  à la réplique
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# PRAGMA de chaque profil : {profil: {nom: valeur}}
+PROFILES = {
+    # Réglages par défaut de SQLite (journal de retour arrière)
+    "default": {},
+    "production": {
+        "journal_mode": "wal",  # Lecteurs et écrivain ne se bloquent plus
+        "synchronous": "normal",  # Sûr en WAL, sans fsync à chaque validation
+        "busy_timeout": 5000,  # Attente d'un verrou (en millisecondes)
+        "cache_size": -64000,  # 64 Mo de cache de pages par connexion
+        "mmap_size": 268435456,  # Lecture du fichier par mmap (256 Mo)
+        "temp_store": "memory",  # Tables temporaires (tris) en mémoire
+    },
+}
+
+# PRAGMA appliqués à chaque nouvelle connexion SQLite : ceux du profil
+# LISTINGS_SQLITE_PROFILE, complétés ou remplacés par LISTINGS_SQLITE_PRAGMAS
+PRAGMAS = {
+    **PROFILES[getattr(settings, "LISTINGS_SQLITE_PROFILE", "default")],
+    **getattr(settings, "LISTINGS_SQLITE_PRAGMAS", {}),
+}
+
+# Alias de la connexion en lecture seule
+READ_ALIAS = getattr(settings, "LISTINGS_READ_DATABASE", "replica")
+
+# PRAGMA qui modifient le fichier, ignorés sur une connexion en lecture seule
+WRITE_PRAGMAS = {"journal_mode", "auto_vacuum", "page_size"}
+
+_replica_reads = ContextVar("listings_replica_reads", default=False)
+
+
+def apply_pragmas(cursor, pragmas, read_only=False):
+    """
+    Applique des PRAGMA par un curseur SQLite.
+
+    Args:
+        cursor: Un curseur sur une connexion SQLite
+        pragmas: Les PRAGMA à appliquer {nom: valeur}
+        read_only: True pour une connexion en lecture seule (les PRAGMA qui
+            modifient le fichier sont ignorés et `query_only` est activé)
+    """
+    for name, value in pragmas.items():
+        if read_only and name in WRITE_PRAGMAS:
+            continue
+        cursor.execute(f"PRAGMA {name} = {value}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Applique les PRAGMA du profil à une nouvelle connexion SQLite"""
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return
+    read_only = connection.alias == READ_ALIAS
+    if not PRAGMAS and not read_only:
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, PRAGMAS, read_only)
+
+
+@contextmanager
+def reading_from_replica():
+    """Envoie à la réplique les lectures du bloc (voir ReadReplicaRouter)"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view):
+    """
+    Envoie à la réplique les lectures d'une vue synchrone ou asynchrone.
+
+    Le drapeau est une variable de contexte : il suit la vue dans les threads
+    de sync_to_async, qui exécutent les requêtes de l'ORM asynchrone.
+
+    Args:
+        view: La vue décorée
+
+    Returns:
+        function: La vue dont les lectures vont à la réplique
+    """
+    if iscoroutinefunction(view):
+
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with reading_from_replica():
+                return await view(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with reading_from_replica():
+                return view(*args, **kwargs)
+
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Routeur lecture / écriture (DATABASE_ROUTERS).
+
+    Les lectures des vues décorées par replica_reads vont à READ_ALIAS, si
+    cet alias est configuré et qu'aucune transaction n'est ouverte sur la
+    base principale (une lecture dans une transaction doit voir ses propres
+    écritures). Tout le reste, dont toutes les écritures et les migrations,
+    va à la base principale.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _replica_reads.get()
+            and READ_ALIAS in connections.settings
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return READ_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplique contient les mêmes lignes que la base principale
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,221 @@
+"""
+Génération d'un jeu de données synthétique pour les mesures de performance.
+
+Les volumes sont configurables et la popularité des utilisateurs suit une
+loi de puissance (loi de Zipf) : quelques comptes concentrent la plupart des
+abonnés et des publications, comme en production. Les lignes sont insérées
+par lots avec `bulk_create` ; les signaux n'étant pas envoyés, les données
+dérivées (flux matérialisé, index de recherche, statistiques des tickets)
+sont reconstruites à la fin. Ce fichier contient :
+- zipf_weights : poids de popularité par rang
+- generate : création des utilisateurs, relations et publications
+"""
+
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import ratings, relations, search, timeline
+from .models import Review, Ticket, UserBlocks, UserFollows
+
+
+def zipf_weights(count, alpha):
+    """
+    Calcule les poids d'une loi de Zipf.
+
+    Args:
+        count: Le nombre d'éléments
+        alpha: L'exposant (plus il est grand, plus la popularité est concentrée)
+
+    Returns:
+        list: Le poids de l'élément de rang i (à partir de 1) : 1 / i^alpha
+    """
+    return [1 / rank**alpha for rank in range(1, count + 1)]
+
+
+def _bulk_create(model, objects, batch_size):
+    """Insère des objets par lots et renvoie les objets créés"""
+    objects = iter(objects)
+    created = []
+    while batch := list(islice(objects, batch_size)):
+        created += model.objects.bulk_create(batch)
+    return created
+
+
+def _spread_dates(model, objects, dates, batch_size):
+    """
+    Répartit les dates de création des objets insérés.
+
+    `time_created` est renseigné automatiquement à l'insertion : les dates
+    choisies sont appliquées ensuite, par lots, avec `bulk_update`.
+    """
+    for obj, date in zip(objects, dates):
+        obj.time_created = date
+    model.objects.bulk_update(objects, ["time_created"], batch_size=batch_size)
+
+
+def generate(
+    users,
+    tickets,
+    reviews,
+    follows,
+    blocks,
+    alpha=1.1,
+    days=365,
+    prefix="user",
+    password="password",
+    batch_size=1000,
+    seed=None,
+    log=None,
+):
+    """
+    Crée un jeu de données synthétique.
+
+    Args:
+        users: Le nombre d'utilisateurs
+        tickets: Le nombre de tickets
+        reviews: Le nombre de critiques
+        follows: Le nombre moyen d'abonnements par utilisateur
+        blocks: Le nombre de blocages
+        alpha: L'exposant de la loi de popularité
+        days: La période couverte par les publications (en jours)
+        prefix: Le préfixe des noms d'utilisateur
+        password: Le mot de passe de tous les utilisateurs
+        batch_size: La taille des lots d'insertion
+        seed: La graine du générateur aléatoire (jeu reproductible)
+        log: Fonction appelée avec un message à chaque étape
+
+    Returns:
+        dict: Le nombre de lignes créées par modèle
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+
+    def random_date(after=None):
+        start = after or now - timedelta(days=days)
+        return start + (now - start) * rng.random()
+
+    with transaction.atomic():
+        log(f"{users} utilisateurs")
+        # Le mot de passe est haché une seule fois pour tous les comptes
+        hashed = make_password(password)
+        created_users = _bulk_create(
+            User,
+            (User(username=f"{prefix}{i:06d}", password=hashed) for i in range(users)),
+            batch_size,
+        )
+        user_ids = [user.id for user in created_users]
+        # Le rang de popularité de chaque utilisateur est tiré au hasard
+        popular = rng.sample(user_ids, len(user_ids))
+        cum_weights = []
+        total = 0.0
+        for weight in zipf_weights(len(popular), alpha):
+            total += weight
+            cum_weights.append(total)
+
+        def pick_popular():
+            return rng.choices(popular, cum_weights=cum_weights)[0]
+
+        log(f"{blocks} blocages")
+        blocked_pairs = set()
+        while len(blocked_pairs) < min(blocks, users * (users - 1) // 2):
+            user_id, other_id = rng.sample(user_ids, 2)
+            if (other_id, user_id) not in blocked_pairs:
+                blocked_pairs.add((user_id, other_id))
+        _bulk_create(
+            UserBlocks,
+            (UserBlocks(user_id=u, blocked_user_id=b) for u, b in blocked_pairs),
+            batch_size,
+        )
+
+        log(f"environ {follows} abonnements par utilisateur")
+        follow_pairs = set()
+        for user_id in user_ids:
+            # Nombre d'abonnements tiré autour de la moyenne (loi exponentielle)
+            wanted = min(
+                users - 1, round(rng.expovariate(1 / follows)) if follows else 0
+            )
+            for _ in range(wanted * 2):
+                if wanted <= 0:
+                    break
+                followed_id = pick_popular()
+                pair = (user_id, followed_id)
+                if (
+                    followed_id == user_id
+                    or pair in follow_pairs
+                    or pair in blocked_pairs
+                    or (followed_id, user_id) in blocked_pairs
+                ):
+                    continue
+                follow_pairs.add(pair)
+                wanted -= 1
+        _bulk_create(
+            UserFollows,
+            (UserFollows(user_id=u, followed_user_id=f) for u, f in follow_pairs),
+            batch_size,
+        )
+
+        log(f"{tickets} tickets")
+        created_tickets = _bulk_create(
+            Ticket,
+            (
+                Ticket(
+                    title=f"Livre {i}",
+                    description=f"Description du livre {i}",
+                    user_id=pick_popular(),
+                )
+                for i in range(tickets)
+            ),
+            batch_size,
+        )
+        ticket_dates = [random_date() for _ in created_tickets]
+        _spread_dates(Ticket, created_tickets, ticket_dates, batch_size)
+
+        log(f"{reviews} critiques")
+        created_reviews = []
+        review_dates = []
+        if created_tickets:
+            targets = [rng.randrange(len(created_tickets)) for _ in range(reviews)]
+            created_reviews = _bulk_create(
+                Review,
+                (
+                    Review(
+                        ticket_id=created_tickets[index].id,
+                        headline=f"Critique {i}",
+                        body=f"Avis sur le livre {index}",
+                        rating=rng.randint(0, 5),
+                        user_id=pick_popular(),
+                    )
+                    for i, index in enumerate(targets)
+                ),
+                batch_size,
+            )
+            review_dates = [random_date(ticket_dates[index]) for index in targets]
+            _spread_dates(Review, created_reviews, review_dates, batch_size)
+
+        log("statistiques des tickets")
+        ticket_ids = iter([ticket.id for ticket in created_tickets])
+        while batch := list(islice(ticket_ids, batch_size)):
+            ratings.repair(batch)
+
+    log("flux matérialisés")
+    for user in User.objects.filter(username__startswith=prefix).iterator():
+        relations.forget(user.id)
+        timeline.rebuild_user(user)
+
+    log("index de recherche")
+    search.rebuild()
+
+    return {
+        "users": len(user_ids),
+        "follows": len(follow_pairs),
+        "blocks": len(blocked_pairs),
+        "tickets": len(created_tickets),
+        "reviews": len(created_reviews),
+    }
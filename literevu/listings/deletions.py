@@ -0,0 +1,289 @@
+"""
+Suppression en arrière-plan des tickets et des comptes.
+
+Supprimer un ticket ou un utilisateur par l'ORM charge toutes les lignes liées
+(critiques, entrées des flux, abonnements...) avant la cascade, et verrouille
+la base pendant toute la suppression. Ici, la demande ne fait que masquer le
+ticket ou le compte : il disparaît aussitôt des flux, des posts et de la
+recherche, et ses cartes sont retirées du cache (cards.py). La tâche
+deletions.run supprime ensuite les lignes liées par lots d'au plus BATCH_SIZE
+lignes, chacun dans sa propre transaction courte, puis le ticket ou
+l'utilisateur lui-même par l'ORM (ses signaux retirent alors les références
+aux fichiers d'images, voir blobs.py). Ce fichier contient :
+- delete_ticket / delete_account : masquage et mise en file de la suppression
+- run : exécution de la suppression, reprise là où elle s'est arrêtée
+
+L'avancement (étape, lignes supprimées) est enregistré dans Deletion et
+affiché dans l'administration.
+"""
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import backends, blobs, cards, jobs, ratings, relations, search, versions
+from .models import Deletion, Review, Ticket, TimelineEntry, UserBlocks, UserFollows
+
+# Nombre maximal de lignes supprimées par lot
+BATCH_SIZE = getattr(settings, "LISTINGS_DELETION_BATCH_SIZE", 500)
+
+# Nombre de lots exécutés par une tâche avant de remettre la suite en file, pour
+# rester dans le délai de visibilité des tâches (jobs.py)
+BATCHES_PER_JOB = getattr(settings, "LISTINGS_DELETION_BATCHES_PER_JOB", 200)
+
+
+def _schedule(kind, object_id, label):
+    """Enregistre une suppression et met sa tâche en file"""
+    deletion = Deletion.objects.create(kind=kind, object_id=object_id, label=label)
+    jobs.enqueue("deletions.run", deletion_id=deletion.id)
+    return deletion
+
+
+def delete_ticket(ticket):
+    """
+    Masque un ticket et met sa suppression en file.
+
+    Args:
+        ticket: Le ticket à supprimer
+
+    Returns:
+        Deletion: La suppression enregistrée
+    """
+    with transaction.atomic():
+        cards.invalidate_ticket(ticket)
+        Ticket.objects.filter(pk=ticket.pk).update(hidden=True)
+        deletion = _schedule(Deletion.TICKET, ticket.pk, ticket.title[:150])
+        versions.bump_post(ticket)
+    return deletion
+
+
+def delete_account(user):
+    """
+    Désactive un compte, masque ses publications et met sa suppression en file.
+
+    Le compte désactivé ne peut plus se connecter et ses sessions ouvertes
+    sont refusées (voir backends.py). Les publications sont masquées par deux
+    requêtes UPDATE sur les index (user, time_created), sans lecture.
+
+    Args:
+        user: L'utilisateur à supprimer
+
+    Returns:
+        Deletion: La suppression enregistrée
+    """
+    with transaction.atomic():
+        cards.invalidate_tickets(Ticket.objects.filter(user=user))
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        Ticket.objects.filter(user=user).update(hidden=True)
+        Review.objects.filter(user=user).update(hidden=True)
+        deletion = _schedule(Deletion.ACCOUNT, user.pk, user.get_username())
+        # Tickets de l'utilisateur et tickets auxquels répondent ses critiques
+        versions.bump_tickets(
+            Ticket.objects.filter(
+                Q(user=user)
+                | Q(pk__in=Review.objects.filter(user=user).values("ticket_id"))
+            ),
+            author_ids={user.pk},
+        )
+    backends.invalidate_user(user.pk)
+    return deletion
+
+
+def _raw_delete(queryset):
+    """
+    Supprime un lot de lignes d'une requête par un seul DELETE.
+
+    Les lignes sont supprimées sans chargement, sans signaux ni cascade : les
+    données qui en dépendent sont traitées par l'étape qui appelle cette
+    fonction.
+
+    Args:
+        queryset: Les lignes à supprimer
+
+    Returns:
+        list: Les clés primaires des lignes supprimées (BATCH_SIZE au plus)
+    """
+    model = queryset.model
+    ids = list(queryset.order_by().values_list("pk", flat=True)[:BATCH_SIZE])
+    if ids:
+        model.objects.filter(pk__in=ids)._raw_delete(router.db_for_write(model))
+    return ids
+
+
+def _timeline_batch(post_type, posts):
+    """Étape : entrées des flux qui affichent des publications"""
+
+    def batch():
+        return len(
+            _raw_delete(
+                TimelineEntry.objects.filter(
+                    post_type=post_type, post_id__in=posts.values("pk")
+                )
+            )
+        )
+
+    return batch
+
+
+def _reviews_batch(reviews):
+    """
+    Étape : critiques, leurs cartes en cache, leur indexation et les
+    statistiques de leurs tickets
+    """
+
+    def batch():
+        rows = list(reviews.order_by().values_list("pk", "ticket_id")[:BATCH_SIZE])
+        if not rows:
+            return 0
+        ids = [pk for pk, _ in rows]
+        cards.invalidate_reviews(Review.objects.filter(pk__in=ids))
+        Review.objects.filter(pk__in=ids)._raw_delete(router.db_for_write(Review))
+        search.remove_posts(TimelineEntry.REVIEW, ids)
+        ticket_ids = {ticket_id for _, ticket_id in rows}
+        ratings.repair(ticket_ids)
+        versions.bump_tickets(Ticket.objects.filter(pk__in=ticket_ids))
+        return len(ids)
+
+    return batch
+
+
+def _rows_batch(queryset):
+    """Étape : lignes sans dépendances"""
+
+    def batch():
+        return len(_raw_delete(queryset))
+
+    return batch
+
+
+def _relations_batch(queryset, other_field):
+    """
+    Étape : abonnements ou blocages ; les relations en cache des deux
+    utilisateurs de chaque ligne sont retirées
+    """
+
+    def batch():
+        rows = list(
+            queryset.order_by().values_list("pk", "user_id", other_field)[:BATCH_SIZE]
+        )
+        if not rows:
+            return 0
+        queryset.model.objects.filter(pk__in=[pk for pk, _, _ in rows])._raw_delete(
+            router.db_for_write(queryset.model)
+        )
+        for user_id in {user_id for _, *pair in rows for user_id in pair}:
+            relations.forget(user_id)
+        return len(rows)
+
+    return batch
+
+
+def _ticket_steps(deletion, ticket_id):
+    """
+    Étapes de la suppression d'un ticket : (nom, lot), un lot renvoyant le
+    nombre de lignes supprimées.
+    """
+    reviews = Review.objects.filter(ticket_id=ticket_id)
+    tickets = Ticket.objects.filter(pk=ticket_id)
+    yield "Flux : critiques du ticket", _timeline_batch(TimelineEntry.REVIEW, reviews)
+    yield "Critiques du ticket", _reviews_batch(reviews)
+    yield "Flux : ticket", _timeline_batch(TimelineEntry.TICKET, tickets)
+
+    def delete():
+        # Plus aucune ligne ne dépend du ticket : la suppression par l'ORM est
+        # immédiate, et ses signaux retirent les références aux fichiers
+        ticket = tickets.first()
+        if ticket is None:
+            return 0
+        files = len(blobs.ticket_files(ticket.image, ticket.renditions))
+        ticket.delete()
+        Deletion.objects.filter(pk=deletion.pk).update(
+            files_released=F("files_released") + files
+        )
+        return 1
+
+    yield "Ticket", delete
+
+
+def _account_steps(deletion, user_id):
+    """Étapes de la suppression d'un compte (voir _ticket_steps)"""
+    tickets = Ticket.objects.filter(user_id=user_id).order_by("pk")
+    while True:
+        ticket_id = tickets.values_list("pk", flat=True).first()
+        if ticket_id is None:
+            break
+        yield from _ticket_steps(deletion, ticket_id)
+
+    reviews = Review.objects.filter(user_id=user_id)
+    yield "Flux : critiques", _timeline_batch(TimelineEntry.REVIEW, reviews)
+    yield "Critiques", _reviews_batch(reviews)
+    yield "Flux de l'utilisateur", _rows_batch(
+        TimelineEntry.objects.filter(user_id=user_id)
+    )
+    yield "Flux : publications restantes", _rows_batch(
+        TimelineEntry.objects.filter(author_id=user_id)
+    )
+    yield "Abonnements", _relations_batch(
+        UserFollows.objects.filter(user_id=user_id), "followed_user_id"
+    )
+    yield "Abonnés", _relations_batch(
+        UserFollows.objects.filter(followed_user_id=user_id), "followed_user_id"
+    )
+    yield "Blocages", _relations_batch(
+        UserBlocks.objects.filter(user_id=user_id), "blocked_user_id"
+    )
+    yield "Blocages reçus", _relations_batch(
+        UserBlocks.objects.filter(blocked_user_id=user_id), "blocked_user_id"
+    )
+
+    def delete():
+        # Ne restent que quelques lignes (journal de l'administration,
+        # groupes) : l'ORM les supprime avec l'utilisateur
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return 0
+        user.delete()
+        return 1
+
+    yield "Compte", delete
+
+
+def run(deletion_id):
+    """
+    Exécute une suppression, lot par lot.
+
+    Chaque lot est validé avec l'avancement dans sa propre transaction : une
+    tâche interrompue reprend à la première ligne restante. Après
+    BATCHES_PER_JOB lots non vides, la suite est remise en file.
+
+    Args:
+        deletion_id: L'identifiant de la suppression (Deletion)
+    """
+    deletion = Deletion.objects.filter(pk=deletion_id, time_finished=None).first()
+    if deletion is None:
+        return
+    if deletion.kind == Deletion.TICKET:
+        steps = _ticket_steps(deletion, deletion.object_id)
+    else:
+        steps = _account_steps(deletion, deletion.object_id)
+
+    budget = BATCHES_PER_JOB
+    for step, batch in steps:
+        deleted = BATCH_SIZE
+        while deleted >= BATCH_SIZE:
+            if budget == 0:
+                jobs.enqueue("deletions.run", deletion_id=deletion.id)
+                return
+            with transaction.atomic():
+                deleted = batch()
+                Deletion.objects.filter(pk=deletion.pk).update(
+                    step=step, rows_deleted=F("rows_deleted") + deleted
+                )
+            # Les étapes déjà terminées, parcourues de nouveau à la reprise,
+            # ne consomment pas de lot
+            budget -= deleted > 0
+    Deletion.objects.filter(pk=deletion.pk).update(
+        step="Terminée", time_finished=timezone.now()
+    )
@@ -0,0 +1,186 @@
+"""
+Export des publications d'un utilisateur de l'application LITRevu.
+
+Les tickets et critiques sont lus par lots avec un curseur côté serveur
+(`.iterator(chunk_size=...)`) puis fusionnés par date : la mémoire utilisée
+ne dépend pas du nombre de publications exportées. Les données du ticket
+associé à une critique sont lues par jointure, dans la même requête.
+- rows : publications de l'utilisateur, sous forme de dictionnaires
+- ndjson_lines / csv_lines : sérialisation ligne par ligne
+- arows / andjson_lines / acsv_lines : versions asynchrones, pour ASGI
+
+Sous ASGI, StreamingHttpResponse lit un générateur synchrone en entier avant
+d'envoyer la première ligne : les versions asynchrones (`.aiterator()`)
+gardent une mémoire constante.
+"""
+
+import csv
+import heapq
+import json
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from . import feeds
+
+# Nombre de lignes lues par aller-retour avec la base de données
+CHUNK_SIZE = getattr(settings, "LISTINGS_EXPORT_CHUNK_SIZE", 2000)
+
+# Colonnes exportées, dans l'ordre du fichier CSV
+COLUMNS = [
+    "type",
+    "id",
+    "time_created",
+    "title",
+    "description",
+    "image",
+    "headline",
+    "rating",
+    "body",
+    "ticket_id",
+    "ticket_title",
+    "ticket_author",
+]
+
+
+def _querysets(user):
+    """Requêtes des tickets et critiques exportés, par ordre chronologique"""
+    tickets, reviews = feeds.posts_querysets(user)
+    tickets = tickets.order_by("time_created", "id").values(
+        "id", "time_created", "title", "description", "image"
+    )
+    reviews = reviews.order_by("time_created", "id").values(
+        "id",
+        "time_created",
+        "headline",
+        "rating",
+        "body",
+        "ticket_id",
+        ticket_title=F("ticket__title"),
+        ticket_author=F("ticket__user__username"),
+    )
+    return tickets, reviews
+
+
+def _row(content_type, row):
+    """Complète une ligne lue avec son type et les colonnes absentes"""
+    row = {"type": content_type, **row}
+    return {column: row.get(column, "") for column in COLUMNS}
+
+
+def rows(user):
+    """
+    Génère les publications d'un utilisateur par ordre chronologique.
+
+    Args:
+        user: L'utilisateur dont on exporte les publications
+
+    Yields:
+        dict: Une publication par ligne, avec les colonnes de COLUMNS
+    """
+    tickets, reviews = _querysets(user)
+    yield from heapq.merge(
+        (_row(feeds.TICKET, row) for row in tickets.iterator(CHUNK_SIZE)),
+        (_row(feeds.REVIEW, row) for row in reviews.iterator(CHUNK_SIZE)),
+        key=itemgetter("time_created"),
+    )
+
+
+async def _amerge(iterators, key):
+    """Équivalent de heapq.merge pour des itérateurs asynchrones"""
+    heads = []
+    for index, iterator in enumerate(iterators):
+        row = await anext(iterator, None)
+        if row is not None:
+            heads.append((key(row), index, row))
+    heapq.heapify(heads)
+    while heads:
+        _, index, row = heads[0]
+        yield row
+        following = await anext(iterators[index], None)
+        if following is None:
+            heapq.heappop(heads)
+        else:
+            heapq.heapreplace(heads, (key(following), index, following))
+
+
+async def _arows(content_type, queryset):
+    """Lit les lignes d'une requête par lots, de façon asynchrone"""
+    async for row in queryset.aiterator(CHUNK_SIZE):
+        yield _row(content_type, row)
+
+
+async def arows(user):
+    """
+    Version asynchrone de rows.
+
+    Args:
+        user: L'utilisateur dont on exporte les publications
+
+    Yields:
+        dict: Une publication par ligne, avec les colonnes de COLUMNS
+    """
+    tickets, reviews = _querysets(user)
+    async for row in _amerge(
+        [_arows(feeds.TICKET, tickets), _arows(feeds.REVIEW, reviews)],
+        key=itemgetter("time_created"),
+    ):
+        yield row
+
+
+def _ndjson(row):
+    """Sérialise une publication en une ligne NDJSON"""
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def ndjson_lines(user):
+    """
+    Sérialise les publications d'un utilisateur au format NDJSON.
+
+    Args:
+        user: L'utilisateur dont on exporte les publications
+
+    Yields:
+        str: Un objet JSON par ligne
+    """
+    for row in rows(user):
+        yield _ndjson(row)
+
+
+async def andjson_lines(user):
+    """Version asynchrone de ndjson_lines"""
+    async for row in arows(user):
+        yield _ndjson(row)
+
+
+class _Echo:
+    """Pseudo-fichier qui renvoie ce qu'on lui écrit (écriture CSV en flux)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(user):
+    """
+    Sérialise les publications d'un utilisateur au format CSV.
+
+    Args:
+        user: L'utilisateur dont on exporte les publications
+
+    Yields:
+        str: L'en-tête puis une ligne CSV par publication
+    """
+    writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    for row in rows(user):
+        yield writer.writerow(row)
+
+
+async def acsv_lines(user):
+    """Version asynchrone de csv_lines"""
+    writer = csv.DictWriter(_Echo(), fieldnames=COLUMNS)
+    yield writer.writeheader()
+    async for row in arows(user):
+        yield writer.writerow(row)
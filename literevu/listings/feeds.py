@@ -0,0 +1,458 @@
+"""
+Construction des flux paginés de l'application LITRevu.
+
+Ce fichier regroupe les requêtes utilisées par les pages « Flux » et « Posts » :
+- feed_querysets / posts_querysets : tickets et critiques visibles
+- page_keys : fusion des tickets et critiques triée directement en base
+  (UNION ALL) avec une pagination par curseur (keyset)
+- timeline_keys / timeline_page_keys : lecture d'une page du flux matérialisé
+  (TimelineEntry)
+- timeline_newer : entrées du flux plus récentes qu'un curseur (nouvelles
+  publications signalées par l'interrogation périodique)
+- hydrate : chargement des publications affichées sur une page (colonnes
+  affichées seulement, voir records.py)
+- atimeline_page_keys / apage_keys / anewer_keys / ahydrate : versions
+  asynchrones pour les vues async (ORM asynchrone de Django)
+- as_dict : représentation JSON d'une publication (API du flux)
+- encode_cursor / decode_cursor : sérialisation du curseur `?before=`
+
+L'ordre d'affichage est (time_created, content_type, id) décroissant : la
+pagination reste donc stable même si deux publications ont la même date.
+"""
+
+import asyncio
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import CharField, Q, Value
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import records, relations
+from .models import Review, Ticket, TimelineEntry
+
+TICKET = TimelineEntry.TICKET
+REVIEW = TimelineEntry.REVIEW
+
+# Nombre de publications affichées par page
+PAGE_SIZE = getattr(settings, "LISTINGS_FEED_PAGE_SIZE", 20)
+
+
+def feed_querysets(user):
+    """
+    Construit les requêtes des tickets et critiques visibles dans le flux.
+
+    Le flux contient les publications de l'utilisateur et des personnes qu'il
+    suit, ainsi que les critiques répondant à ses tickets, en excluant les
+    publications masquées (deletions.py) et les utilisateurs bloqués ou qui
+    le bloquent. Les relations sont lues dans le cache des relations.
+
+    Args:
+        user: L'utilisateur dont on construit le flux
+
+    Returns:
+        tuple: (tickets, reviews) sous forme de QuerySet non évalués
+    """
+    followed_users = relations.following_ids(user.id)
+    excluded_users = relations.excluded_ids(user.id)
+
+    tickets = Ticket.objects.filter(
+        Q(user__in=followed_users) | Q(user=user), hidden=False
+    ).exclude(user__in=excluded_users)
+
+    # Le sous-select sur les tickets garde les deux conditions sur des colonnes
+    # indexées de la table des critiques (pas de parcours complet)
+    reviews = Review.objects.filter(
+        Q(user__in=followed_users)
+        | Q(user=user)
+        | Q(ticket__in=Ticket.objects.filter(user=user).values("id")),
+        hidden=False,
+    ).exclude(user__in=excluded_users)
+
+    return tickets, reviews
+
+
+def posts_querysets(user):
+    """
+    Construit les requêtes des tickets et critiques publiés par l'utilisateur,
+    hors publications masquées.
+
+    Args:
+        user: L'utilisateur dont on affiche les posts
+
+    Returns:
+        tuple: (tickets, reviews) sous forme de QuerySet non évalués
+    """
+    return (
+        Ticket.objects.filter(user=user, hidden=False),
+        Review.objects.filter(user=user, hidden=False),
+    )
+
+
+def encode_cursor(key):
+    """
+    Sérialise la clé d'une publication en curseur utilisable dans une URL.
+
+    Args:
+        key: Tuple (time_created, content_type, id)
+
+    Returns:
+        str: Le curseur encodé en base64 compatible URL
+    """
+    time_created, content_type, pk = key
+    raw = f"{time_created.isoformat()}|{content_type}|{pk}"
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor.
+
+    Args:
+        cursor: Le curseur reçu dans le paramètre `before`
+
+    Returns:
+        tuple: (time_created, content_type, id), ou None si le curseur est
+            absent ou invalide
+    """
+    if not cursor:
+        return None
+    try:
+        raw = force_str(urlsafe_base64_decode(cursor))
+        time_created, content_type, pk = raw.split("|")
+        if content_type not in (TICKET, REVIEW):
+            return None
+        return datetime.fromisoformat(time_created), content_type, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _before(queryset, content_type, cursor):
+    """
+    Restreint une requête aux publications situées après le curseur.
+
+    Args:
+        queryset: Les tickets ou les critiques à filtrer
+        content_type: Le type de publication de la requête (TICKET ou REVIEW)
+        cursor: Le curseur décodé de la dernière publication affichée
+
+    Returns:
+        QuerySet: La requête filtrée
+    """
+    time_created, cursor_type, pk = cursor
+    older = Q(time_created__lt=time_created)
+    if content_type == cursor_type:
+        return queryset.filter(older | Q(time_created=time_created, id__lt=pk))
+    if content_type < cursor_type:
+        # À date égale, ce type est trié après celui du curseur
+        return queryset.filter(older | Q(time_created=time_created))
+    return queryset.filter(older)
+
+
+def keys_queryset(tickets, reviews, cursor=None):
+    """
+    Fusionne les tickets et critiques en une seule requête triée.
+
+    Les deux requêtes sont réduites à leur clé de tri puis réunies par un
+    UNION ALL ordonné en base.
+
+    Args:
+        tickets: Les tickets visibles
+        reviews: Les critiques visibles
+        cursor: Le curseur décodé de la dernière publication déjà affichée
+
+    Returns:
+        QuerySet: Les clés (time_created, content_type, id) triées
+    """
+    branches = []
+    for queryset, content_type in ((tickets, TICKET), (reviews, REVIEW)):
+        if cursor is not None:
+            queryset = _before(queryset, content_type, cursor)
+        branches.append(
+            queryset.order_by()
+            .annotate(content_type=Value(content_type, CharField()))
+            .values_list("time_created", "content_type", "id")
+        )
+    union = branches[0].union(branches[1], all=True)
+    return union.order_by("-time_created", "-content_type", "-id")
+
+
+def page_keys(tickets, reviews, cursor=None, page_size=PAGE_SIZE):
+    """
+    Fusionne et trie les tickets et critiques en base et renvoie une page.
+
+    Seules les clés de la page sont lues, quel que soit le nombre total de
+    publications.
+
+    Args:
+        tickets: Les tickets visibles
+        reviews: Les critiques visibles
+        cursor: Le curseur décodé de la dernière publication déjà affichée
+        page_size: Le nombre de publications par page
+
+    Returns:
+        tuple: (clés de la page, curseur de la page suivante ou None)
+    """
+    return _paginate(keys_queryset(tickets, reviews, cursor), page_size)
+
+
+def timeline_keys(user, cursor=None):
+    """
+    Construit la requête des clés du flux matérialisé d'un utilisateur.
+
+    La requête suit l'index (user, time_created, post_type, post_id) : le coût
+    d'une page ne dépend ni du nombre d'abonnements ni de la taille des tables
+    de tickets et de critiques.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+        cursor: Le curseur décodé de la dernière publication déjà affichée
+
+    Returns:
+        QuerySet: Les clés (time_created, post_type, post_id) triées
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    if cursor is not None:
+        time_created, post_type, pk = cursor
+        entries = entries.filter(
+            Q(time_created__lt=time_created)
+            | Q(time_created=time_created, post_type__lt=post_type)
+            | Q(time_created=time_created, post_type=post_type, post_id__lt=pk)
+        )
+    return entries.order_by("-time_created", "-post_type", "-post_id").values_list(
+        "time_created", "post_type", "post_id"
+    )
+
+
+def timeline_newer(user, cursor=None):
+    """
+    Construit la requête des clés du flux plus récentes qu'un curseur.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+        cursor: Le curseur décodé de la publication la plus récente affichée
+            (None : tout le flux)
+
+    Returns:
+        QuerySet: Les clés (time_created, post_type, post_id), de la plus
+            récente à la plus ancienne
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    if cursor is not None:
+        time_created, post_type, pk = cursor
+        entries = entries.filter(
+            Q(time_created__gt=time_created)
+            | Q(time_created=time_created, post_type__gt=post_type)
+            | Q(time_created=time_created, post_type=post_type, post_id__gt=pk)
+        )
+    return entries.order_by("-time_created", "-post_type", "-post_id").values_list(
+        "time_created", "post_type", "post_id"
+    )
+
+
+def timeline_page_keys(user, cursor=None, page_size=PAGE_SIZE):
+    """
+    Lit une page du flux matérialisé d'un utilisateur.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+        cursor: Le curseur décodé de la dernière publication déjà affichée
+        page_size: Le nombre de publications par page
+
+    Returns:
+        tuple: (clés de la page, curseur de la page suivante ou None)
+    """
+    return _paginate(timeline_keys(user, cursor), page_size)
+
+
+def _paginate(keys, page_size):
+    """
+    Lit une page de clés triées et calcule le curseur de la page suivante.
+
+    Args:
+        keys: La requête des clés (time_created, content_type, id) triée
+        page_size: Le nombre de publications par page
+
+    Returns:
+        tuple: (clés de la page, curseur de la page suivante ou None)
+    """
+    keys = list(keys[: page_size + 1])
+    next_cursor = encode_cursor(keys[page_size - 1]) if len(keys) > page_size else None
+    return keys[:page_size], next_cursor
+
+
+async def _apaginate(keys, page_size):
+    """Version asynchrone de _paginate"""
+    keys = [key async for key in keys[: page_size + 1]]
+    next_cursor = encode_cursor(keys[page_size - 1]) if len(keys) > page_size else None
+    return keys[:page_size], next_cursor
+
+
+async def atimeline_page_keys(user, cursor=None, page_size=PAGE_SIZE):
+    """Version asynchrone de timeline_page_keys"""
+    return await _apaginate(timeline_keys(user, cursor), page_size)
+
+
+async def apage_keys(tickets, reviews, cursor=None, page_size=PAGE_SIZE):
+    """Version asynchrone de page_keys"""
+    return await _apaginate(keys_queryset(tickets, reviews, cursor), page_size)
+
+
+async def anewer_keys(user, cursor=None, limit=PAGE_SIZE):
+    """
+    Lit les clés du flux plus récentes qu'un curseur, dans la limite de `limit`.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+        cursor: Le curseur décodé de la publication la plus récente affichée
+        limit: Le nombre maximal de clés lues
+
+    Returns:
+        tuple: (clés, de la plus récente à la plus ancienne ; True s'il existe
+            d'autres publications au-delà de la limite)
+    """
+    keys = [key async for key in timeline_newer(user, cursor)[: limit + 1]]
+    return keys[:limit], len(keys) > limit
+
+
+def _hydrate_querysets(ticket_ids, review_ids):
+    """
+    Requêtes des colonnes affichées des tickets et critiques d'une page.
+
+    Les publications masquées en attente de suppression (deletions.py), et
+    les critiques d'un ticket masqué, ne sont pas chargées : elles
+    disparaissent de la page avant que leurs entrées des flux soient
+    supprimées.
+    """
+    return (
+        records.ticket_records(Ticket.objects.filter(pk__in=ticket_ids, hidden=False)),
+        records.review_records(
+            Review.objects.filter(pk__in=review_ids, hidden=False, ticket__hidden=False)
+        ),
+    )
+
+
+def _split_ids(keys):
+    """Sépare les identifiants des tickets et des critiques d'une page"""
+    ticket_ids = [pk for _, content_type, pk in keys if content_type == TICKET]
+    review_ids = [pk for _, content_type, pk in keys if content_type == REVIEW]
+    return ticket_ids, review_ids
+
+
+def _build(keys, ticket_rows, review_rows):
+    """Construit les publications d'une page à partir de leurs lignes"""
+    authors = {}
+    objects = {
+        TICKET: records.build_tickets(ticket_rows, authors),
+        REVIEW: records.build_reviews(review_rows, authors),
+    }
+    return _ordered(keys, objects)
+
+
+def hydrate(keys):
+    """
+    Charge les tickets et critiques correspondant aux clés d'une page.
+
+    Deux requêtes au plus sont exécutées, quelle que soit la taille de la page.
+    Seules les colonnes affichées sont lues, dans des objets légers
+    (records.py) ; chacun reçoit un attribut `content_type` utilisé par les
+    templates.
+
+    Args:
+        keys: Les clés (time_created, content_type, id) de la page
+
+    Returns:
+        list: Les publications (TicketRecord, ReviewRecord) dans l'ordre des
+            clés
+    """
+    ticket_ids, review_ids = _split_ids(keys)
+    tickets, reviews = _hydrate_querysets(ticket_ids, review_ids)
+    return _build(
+        keys,
+        list(tickets) if ticket_ids else [],
+        list(reviews) if review_ids else [],
+    )
+
+
+async def ahydrate(keys):
+    """
+    Version asynchrone de hydrate : les tickets et les critiques sont lus
+    simultanément.
+
+    Args:
+        keys: Les clés (time_created, content_type, id) de la page
+
+    Returns:
+        list: Les publications dans l'ordre des clés
+    """
+    ticket_ids, review_ids = _split_ids(keys)
+    tickets, reviews = _hydrate_querysets(ticket_ids, review_ids)
+
+    async def rows(queryset, ids):
+        return [row async for row in queryset] if ids else []
+
+    ticket_rows, review_rows = await asyncio.gather(
+        rows(tickets, ticket_ids), rows(reviews, review_ids)
+    )
+    return _build(keys, ticket_rows, review_rows)
+
+
+def _ordered(keys, objects):
+    """
+    Range les publications chargées dans l'ordre des clés de la page.
+
+    Args:
+        keys: Les clés (time_created, content_type, id) de la page
+        objects: {type de publication: {id: objet}}
+
+    Returns:
+        list: Les publications, avec leur attribut `content_type`
+    """
+    posts = []
+    for _, content_type, pk in keys:
+        post = objects[content_type].get(pk)
+        if post is None:
+            # Publication supprimée entre la lecture des clés et le chargement
+            continue
+        post.content_type = content_type
+        posts.append(post)
+    return posts
+
+
+def _ticket_dict(ticket):
+    """Représente un ticket par un dictionnaire sérialisable en JSON"""
+    return {
+        "id": ticket.id,
+        "author": ticket.user.username,
+        "title": ticket.title,
+        "description": ticket.description,
+        "image": ticket.image_url if ticket.image else None,
+        "review_count": ticket.review_count,
+        "average_rating": ticket.average_rating,
+        "last_review_at": ticket.last_review_at,
+        "time_created": ticket.time_created,
+    }
+
+
+def as_dict(post):
+    """
+    Représente une publication hydratée par un dictionnaire sérialisable.
+
+    Args:
+        post: Un ticket ou une critique renvoyé par hydrate (records.py)
+
+    Returns:
+        dict: Les champs affichés dans les cartes, avec le type de publication
+    """
+    if post.content_type == TICKET:
+        return {"type": TICKET, **_ticket_dict(post)}
+    return {
+        "type": REVIEW,
+        "id": post.id,
+        "author": post.user.username,
+        "headline": post.headline,
+        "rating": post.rating,
+        "body": post.body,
+        "time_created": post.time_created,
+        "ticket": _ticket_dict(post.ticket),
+    }
@@ -8,8 +8,9 @@ Ce fichier définit les formulaires utilisés dans l'application :
 """
 
 from django import forms
-from django.contrib.auth.models import User
 from . import models
+from . import relations
+from . import usersearch
 
 
 class TicketForm(forms.ModelForm):
@@ -21,9 +22,21 @@ class TicketForm(forms.ModelForm):
     - Ajouter une description détaillée
     - Télécharger une image de couverture
 
-    Tous les champs utilisent les classes Bootstrap pour le style.
+    Tous les champs utilisent les classes Bootstrap pour le style. Une image
+    refusée pendant sa réception (uploads.py) n'arrive pas jusqu'au
+    formulaire : son motif est transmis par `upload_errors`.
     """
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            self.add_error(field if field in self.fields else None, message)
+        return cleaned_data
+
     class Meta:
         model = models.Ticket
         fields = ["title", "description", "image"]
@@ -42,7 +55,10 @@ class TicketForm(forms.ModelForm):
                 }
             ),
             "image": forms.FileInput(
-                attrs={"class": "form-control", "accept": "image/*"}
+                attrs={
+                    "class": "form-control",
+                    "accept": "image/jpeg,image/png,image/webp,image/gif",
+                }
             ),
         }
 
@@ -88,24 +104,28 @@ class UserFollowsForm(forms.Form):
     Formulaire pour suivre un nouvel utilisateur.
 
     Ce formulaire permet aux utilisateurs de :
-    - Voir la liste des utilisateurs qu'ils peuvent suivre
-    - Sélectionner un utilisateur à suivre
+    - Saisir le nom (ou l'identifiant) de l'utilisateur à suivre
+    - Choisir parmi les suggestions de l'API de recherche (autocomplétion)
 
     Caractéristiques :
-    - Exclut l'utilisateur courant de la liste
-    - Exclut les utilisateurs déjà suivis
-    - Utilise un menu déroulant avec autocomplétion
+    - Ne charge aucune liste d'utilisateurs : seule la valeur saisie est
+      recherchée en base
+    - Refuse l'utilisateur courant et les utilisateurs déjà suivis
     """
 
-    followed_user = forms.ModelChoiceField(
-        queryset=User.objects.all(),
+    followed_user = forms.CharField(
         label="Utilisateur à suivre",
-        help_text="Sélectionnez l'utilisateur que vous souhaitez suivre",
-        widget=forms.Select(
-            attrs={"class": "form-control", "placeholder": "Choisir un utilisateur"}
+        max_length=150,
+        help_text="Saisissez le nom de l'utilisateur que vous souhaitez suivre",
+        widget=forms.TextInput(
+            attrs={
+                "class": "form-control",
+                "placeholder": "Nom d'utilisateur",
+                "autocomplete": "off",
+                "list": "user-suggestions",
+            }
         ),
         error_messages={
-            "invalid_choice": "Cet utilisateur n'existe pas.",
             "required": "Veuillez sélectionner un utilisateur à suivre.",
         },
     )
@@ -114,37 +134,32 @@ class UserFollowsForm(forms.Form):
         """
         Initialisation du formulaire.
 
-        Personnalise la liste des utilisateurs disponibles en :
-        - Excluant l'utilisateur courant
-        - Excluant les utilisateurs déjà suivis
-
         Args:
             user: L'utilisateur courant
         """
         self.user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
-        if self.user:
-            # Récupère la liste des utilisateurs déjà suivis
-            followed_users = self.user.following.values_list("followed_user", flat=True)
-            # Exclut l'utilisateur courant et les utilisateurs déjà suivis
-            exclude_ids = [self.user.id] + list(followed_users)
-            self.fields["followed_user"].queryset = User.objects.exclude(
-                id__in=exclude_ids
-            )
 
     def clean_followed_user(self):
         """
         Validation du champ followed_user.
 
-        Vérifie que l'utilisateur ne tente pas de se suivre lui-même.
+        Résout le nom ou l'identifiant saisi et vérifie que l'utilisateur ne
+        tente pas de se suivre lui-même ni de suivre un utilisateur déjà suivi.
 
         Returns:
             User: L'utilisateur à suivre
 
         Raises:
-            ValidationError: Si l'utilisateur tente de se suivre lui-même
+            ValidationError: Si l'utilisateur n'existe pas, est l'utilisateur
+                courant ou est déjà suivi
         """
-        followed_user = self.cleaned_data["followed_user"]
-        if followed_user == self.user:
-            raise forms.ValidationError("Vous ne pouvez pas vous suivre vous-même.")
+        followed_user = usersearch.resolve(self.cleaned_data["followed_user"])
+        if followed_user is None:
+            raise forms.ValidationError("Cet utilisateur n'existe pas.")
+        if self.user:
+            if followed_user.id == self.user.id:
+                raise forms.ValidationError("Vous ne pouvez pas vous suivre vous-même.")
+            if followed_user.id in relations.following_ids(self.user.id):
+                raise forms.ValidationError("Vous suivez déjà cet utilisateur.")
         return followed_user
@@ -0,0 +1,124 @@
+"""
+Génération des déclinaisons (renditions) des images de couverture.
+
+Chaque image envoyée avec un ticket est déclinée avec Pillow en plusieurs
+largeurs fixes, en JPEG et en WebP lorsque Pillow le supporte. Les fichiers
+produits sont enregistrés dans Ticket.renditions et servis par les templates
+via l'attribut `srcset` :
+- build_renditions : produit les déclinaisons d'un ticket
+- refresh_renditions : remplace les déclinaisons après un changement d'image
+
+Les déclinaisons sont stockées par adresse de contenu, comme les originaux
+(storage.py) : la même couverture envoyée avec plusieurs tickets produit les
+mêmes fichiers, écrits une seule fois. Ils sont supprimés avec leur dernière
+référence (blobs.py), jamais directement.
+"""
+
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Largeurs produites (en pixels), sans jamais agrandir l'original
+WIDTHS = getattr(settings, "LISTINGS_IMAGE_WIDTHS", (320, 640, 1024))
+
+# Qualité de compression des déclinaisons
+QUALITY = getattr(settings, "LISTINGS_IMAGE_QUALITY", 80)
+
+# Formats produits : {format Pillow: (extension, options d'enregistrement)}
+FORMATS = {"JPEG": ("jpg", {"quality": QUALITY, "optimize": True, "progressive": True})}
+if features.check("webp"):
+    FORMATS["WEBP"] = ("webp", {"quality": QUALITY, "method": 4})
+
+# Répertoire des déclinaisons dans le stockage des médias
+RENDITIONS_DIR = "tickets/renditions"
+
+
+def _target_widths(width):
+    """Renvoie les largeurs à produire pour une image de largeur donnée"""
+    widths = [target for target in sorted(WIDTHS) if target < width]
+    # L'original sert de plus grande déclinaison s'il est plus petit que la
+    # largeur maximale
+    if len(widths) < len(WIDTHS):
+        widths.append(width)
+    return widths
+
+
+def _open(ticket):
+    """
+    Ouvre l'image d'un ticket, orientée et convertie en RGB.
+
+    Args:
+        ticket: Le ticket dont on ouvre l'image
+
+    Returns:
+        Image: L'image chargée en mémoire
+    """
+    with ticket.image.open("rb") as file:
+        image = Image.open(file)
+        # Pour un JPEG, décode directement à une taille proche de la plus
+        # grande déclinaison au lieu de la pleine résolution
+        image.draft("RGB", (max(WIDTHS), max(WIDTHS) * 4))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.load()
+    return image
+
+
+def build_renditions(ticket):
+    """
+    Produit les déclinaisons de l'image d'un ticket et les enregistre.
+
+    Args:
+        ticket: Le ticket dont l'image doit être déclinée
+
+    Returns:
+        dict: {format: {largeur: nom du fichier}} enregistré dans le ticket
+    """
+    if not ticket.image:
+        return {}
+
+    storage = ticket.image.storage
+    stem = posixpath.splitext(posixpath.basename(ticket.image.name))[0]
+    image = _open(ticket)
+    renditions = {}
+    for width in _target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for image_format, (extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = storage.save(
+                f"{RENDITIONS_DIR}/{stem}_{width}w.{extension}",
+                ContentFile(buffer.getvalue()),
+            )
+            renditions.setdefault(extension, {})[str(width)] = name
+
+    ticket.renditions = renditions
+    ticket.save(update_fields=["renditions", "time_edited"])
+    return renditions
+
+
+def refresh_renditions(ticket):
+    """
+    Remplace les déclinaisons d'un ticket après un changement d'image.
+
+    Les anciennes déclinaisons perdent leur référence à l'enregistrement du
+    ticket et sont supprimées si aucun autre ticket ne les désigne.
+
+    Args:
+        ticket: Le ticket dont l'image a changé
+    """
+    ticket.renditions = {}
+    if ticket.image:
+        build_renditions(ticket)
+    else:
+        ticket.save(update_fields=["renditions", "time_edited"])
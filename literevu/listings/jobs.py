@@ -0,0 +1,201 @@
+"""
+File de tâches d'arrière-plan de l'application LITRevu.
+
+Les traitements lourds déclenchés par une écriture (déclinaisons d'images,
+diffusion dans les flux, etc.) ne sont pas exécutés pendant la requête : ils
+sont enregistrés dans la table Job et exécutés par la commande run_jobs.
+Ce fichier contient :
+- task : décorateur qui enregistre une fonction comme tâche
+- enqueue : création d'une tâche après validation de la transaction
+- claim : prise en charge des tâches disponibles par un worker
+- execute : exécution d'une tâche, avec nouvel essai différé en cas d'erreur
+- stats : profondeur de la file par état
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Délai de visibilité d'une tâche prise en charge (en secondes)
+VISIBILITY_TIMEOUT = getattr(settings, "LISTINGS_JOBS_VISIBILITY_TIMEOUT", 300)
+
+# Délai de base avant un nouvel essai, doublé à chaque échec (en secondes)
+RETRY_DELAY = getattr(settings, "LISTINGS_JOBS_RETRY_DELAY", 10)
+
+_registry = {}
+
+
+def task(name):
+    """
+    Enregistre une fonction comme tâche d'arrière-plan.
+
+    Args:
+        name: Le nom sous lequel la tâche est mise en file
+
+    Returns:
+        function: Le décorateur
+    """
+
+    def decorator(function):
+        _registry[name] = function
+        return function
+
+    return decorator
+
+
+def enqueue(name, max_attempts=5, **payload):
+    """
+    Met une tâche en file une fois la transaction en cours validée.
+
+    Si la transaction est annulée, la tâche n'est jamais créée. En dehors
+    d'une transaction, elle est créée immédiatement.
+
+    Args:
+        name: Le nom de la tâche enregistrée
+        max_attempts: Le nombre d'essais autorisés
+        **payload: Les arguments de la tâche (sérialisables en JSON)
+    """
+    if name not in _registry:
+        raise ValueError(f"Tâche inconnue : {name}")
+    transaction.on_commit(
+        lambda: Job.objects.create(
+            name=name, payload=payload, max_attempts=max_attempts
+        )
+    )
+
+
+def _available(now):
+    """Condition des tâches disponibles ou dont le délai de visibilité a expiré"""
+    return Q(status=Job.PENDING, available_at__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lt=now
+    )
+
+
+def claim(limit, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Prend en charge des tâches disponibles pour le worker courant.
+
+    Chaque tâche est réservée par une mise à jour conditionnelle : si un autre
+    worker l'a réservée entre-temps, elle est ignorée. L'échéance de la
+    réservation sert de jeton : execute ne modifie la tâche que si elle est
+    toujours réservée avec cette échéance.
+
+    Args:
+        limit: Le nombre maximal de tâches à prendre en charge
+        visibility_timeout: Le délai de visibilité (en secondes)
+
+    Returns:
+        list: Les réservations (identifiant, échéance) des tâches
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=visibility_timeout)
+    candidates = (
+        Job.objects.filter(_available(now))
+        .order_by("available_at")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in list(candidates):
+        reserved = Job.objects.filter(_available(now), pk=job_id).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_until=locked_until,
+        )
+        if reserved:
+            claimed.append((job_id, locked_until))
+    return claimed
+
+
+def _held(job_id, locked_until):
+    """Tâche toujours réservée par le worker qui a reçu cette échéance"""
+    return Job.objects.filter(pk=job_id, status=Job.RUNNING, locked_until=locked_until)
+
+
+def execute(job_id, locked_until):
+    """
+    Exécute une tâche réservée et enregistre son résultat.
+
+    En cas d'erreur, la tâche est remise en file avec un délai qui double à
+    chaque essai, ou marquée en échec si tous les essais sont épuisés.
+
+    Une tâche exécutée au-delà de son délai de visibilité a pu être reprise
+    par un autre worker : son résultat est alors ignoré, pour ne pas écraser
+    l'état de la nouvelle réservation.
+
+    Args:
+        job_id: L'identifiant de la tâche réservée
+        locked_until: L'échéance de la réservation, renvoyée par claim
+
+    Returns:
+        bool: True si la tâche s'est terminée sans erreur
+    """
+    try:
+        job = _held(job_id, locked_until).first()
+        if job is None:
+            return False
+        try:
+            function = _registry[job.name]
+            function(**job.payload)
+        except Exception:
+            return _retry_or_fail(job, locked_until, traceback.format_exc())
+        finished = _held(job.pk, locked_until).update(
+            status=Job.DONE, locked_until=None, time_finished=timezone.now()
+        )
+        if not finished:
+            logger.warning(
+                "Tâche %s reprise par un autre worker : résultat ignoré", job
+            )
+        return bool(finished)
+    finally:
+        close_old_connections()
+
+
+def _retry_or_fail(job, locked_until, error):
+    """
+    Remet une tâche en file ou la marque en échec après une erreur, si elle
+    est toujours réservée ; renvoie toujours False
+    """
+    logger.warning("Tâche %s en erreur (essai %s) :\n%s", job, job.attempts, error)
+    if job.attempts >= job.max_attempts:
+        changes = {"status": Job.FAILED, "time_finished": timezone.now()}
+    else:
+        delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+        changes = {
+            "status": Job.PENDING,
+            "available_at": timezone.now() + timedelta(seconds=delay),
+        }
+    updated = _held(job.pk, locked_until).update(
+        locked_until=None, last_error=error, **changes
+    )
+    if not updated:
+        logger.warning("Tâche %s reprise par un autre worker : erreur ignorée", job)
+    return False
+
+
+def stats():
+    """
+    Calcule la profondeur de la file de tâches.
+
+    Returns:
+        dict: Nombre de tâches par état, nombre de tâches prêtes et âge (en
+            secondes) de la plus ancienne tâche prête
+    """
+    now = timezone.now()
+    counts = dict(
+        Job.objects.values_list("status").annotate(total=Count("id")).order_by()
+    )
+    ready = Job.objects.filter(_available(now))
+    oldest = ready.aggregate(oldest=Min("available_at"))["oldest"]
+    result = {status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES}
+    result["ready"] = ready.count()
+    result["oldest_ready_age"] = (now - oldest).total_seconds() if oldest else 0.0
+    return result
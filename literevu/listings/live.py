@@ -0,0 +1,181 @@
+"""
+Flux en direct : nouvelles publications poussées par Server-Sent Events.
+
+Le navigateur ouvre un EventSource sur /feed/stream/ ; chaque ticket ou
+critique publié (pubsub.py) par un utilisateur suivi, ou en réponse à un
+ticket de l'utilisateur, lui est signalé par un évènement `post`.
+
+Une connexion peut rester ouverte des heures : elle est donc servie au
+niveau ASGI, devant Django (voir asgi.py), et non par une vue. Sous le
+gestionnaire ASGI de Django, chaque requête en cours garde un thread dédié
+jusqu'à la fin de sa réponse ; ici, l'utilisateur et ses relations sont lus
+en une seule fois dans un thread, puis la connexion n'est plus qu'une file
+asyncio en attente. Sous WSGI, la vue feed_stream répond 204 et la page
+revient à l'interrogation périodique (feed_updates). Ce fichier contient :
+- LiveFeedRouter : application ASGI qui sert le flux et délègue le reste
+- subscriber : utilisateur et relations d'une connexion
+- events : évènements envoyés sur une connexion
+"""
+
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http import HttpRequest
+from django.urls import reverse
+
+from . import pubsub, relations
+
+# Intervalle des commentaires envoyés sur une connexion inactive (en secondes),
+# qui empêchent les proxys de la fermer
+HEARTBEAT = getattr(settings, "LISTINGS_LIVE_HEARTBEAT", 20)
+
+# Durée maximale d'une connexion (en secondes) : le navigateur se reconnecte
+# ensuite et les relations de l'utilisateur sont relues
+MAX_AGE = getattr(settings, "LISTINGS_LIVE_MAX_AGE", 600)
+
+# Délai de reconnexion indiqué au navigateur (en secondes)
+RETRY = getattr(settings, "LISTINGS_LIVE_RETRY", 5)
+
+
+def subscriber(session_key):
+    """
+    Lit l'utilisateur d'une session et ses relations.
+
+    Args:
+        session_key: La valeur du cookie de session
+
+    Returns:
+        tuple: (id de l'utilisateur, sujets suivis, utilisateurs exclus), ou
+            None si la session n'est pas celle d'un utilisateur connecté
+    """
+    try:
+        request = HttpRequest()
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(session_key)
+        user = get_user(request)
+        if not user.is_authenticated:
+            return None
+        topics = [f"user:{pk}" for pk in relations.following_ids(user.id)]
+        topics.append(f"owner:{user.id}")
+        return user.id, topics, relations.excluded_ids(user.id)
+    finally:
+        close_old_connections()
+
+
+def _event(name, data):
+    """Formate un évènement Server-Sent Events"""
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def events(subscription, user_id, excluded, max_age=MAX_AGE):
+    """
+    Produit les évènements d'une connexion jusqu'à sa fermeture.
+
+    Args:
+        subscription: L'abonnement aux sujets du flux de l'utilisateur
+        user_id: L'identifiant de l'utilisateur
+        excluded: Les utilisateurs bloqués ou qui le bloquent
+        max_age: La durée maximale de la connexion (en secondes)
+
+    Yields:
+        str: Les évènements et commentaires à envoyer
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age
+    yield f"retry: {RETRY * 1000}\n\n"
+    while (remaining := deadline - loop.time()) > 0:
+        try:
+            message = await subscription.get(min(HEARTBEAT, remaining))
+        except TimeoutError:
+            yield ": ping\n\n"
+            continue
+        if message is pubsub.CLOSED:
+            return
+        if message["author_id"] == user_id or message["author_id"] in excluded:
+            continue
+        yield _event("post", message)
+
+
+class LiveFeedRouter:
+    """
+    Application ASGI placée devant celle de Django : sert le flux en direct
+    et transmet toutes les autres requêtes à Django.
+
+    Args:
+        application: L'application ASGI de Django
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self._path = None
+
+    @property
+    def path(self):
+        """Chemin du flux (résolu à la première requête)"""
+        if self._path is None:
+            self._path = reverse("feed-stream")
+        return self._path
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and scope["method"] == "GET"
+            and scope["path"] == self.path
+        ):
+            await self.stream(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
+
+    async def stream(self, scope, receive, send):
+        """Sert le flux d'une connexion"""
+        cookie = SimpleCookie()
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookie.load(value.decode("latin-1"))
+        session = cookie.get(settings.SESSION_COOKIE_NAME)
+        found = session and await sync_to_async(subscriber, thread_sensitive=False)(
+            session.value
+        )
+        if not found:
+            await send({"type": "http.response.start", "status": 403, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        user_id, topics, excluded = found
+        async with pubsub.get_broker().subscribe(topics) as subscription:
+
+            async def wait_for_disconnect():
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+                subscription.close()
+
+            listener = asyncio.ensure_future(wait_for_disconnect())
+            try:
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [
+                            (b"content-type", b"text/event-stream; charset=utf-8"),
+                            (b"cache-control", b"no-cache"),
+                            (b"x-accel-buffering", b"no"),
+                        ],
+                    }
+                )
+                async for chunk in events(subscription, user_id, excluded):
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk.encode(),
+                            "more_body": True,
+                        }
+                    )
+                await send({"type": "http.response.body", "body": b""})
+            finally:
+                listener.cancel()
@@ -0,0 +1,152 @@
+"""
+Commande de mesure des performances des pages principales.
+
+Usage :
+    python manage.py benchmark                           # benchmark.json
+    python manage.py benchmark --users 20 --requests 50 --output avant.json
+    python manage.py benchmark --compare avant.json apres.json
+
+Chaque page (flux, posts, abonnements) est appelée par le client de test
+pour un échantillon d'utilisateurs ; les temps de réponse (percentiles) et
+le nombre de requêtes SQL sont enregistrés dans un fichier JSON. Le mode
+--compare échoue si le second fichier présente une régression.
+"""
+
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from listings import benchmarks
+from listings.models import Review, Ticket, UserFollows
+
+
+class Command(BaseCommand):
+    """
+    Mesure les pages flux, posts et abonnements, ou compare deux mesures.
+    """
+
+    help = (
+        "Mesure les temps de réponse et le nombre de requêtes SQL des pages "
+        "principales, ou compare deux mesures (--compare)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10, help="Nombre d'utilisateurs échantillonnés"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=20,
+            help="Requêtes mesurées par utilisateur et par page",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=1,
+            help="Requêtes non mesurées avant les mesures (caches chauds)",
+        )
+        parser.add_argument(
+            "--page",
+            action="append",
+            dest="pages",
+            choices=list(benchmarks.PAGES),
+            help="Limite la mesure à cette page (option répétable)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument(
+            "--compare",
+            nargs=2,
+            metavar=("REFERENCE", "CANDIDAT"),
+            help="Compare deux fichiers de résultats au lieu de mesurer",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Hausse de temps tolérée par --compare (0.2 = 20 %%)",
+        )
+
+    def handle(self, *args, **options):
+        if options["compare"]:
+            self._compare(*options["compare"], options["threshold"])
+            return
+
+        try:
+            users = benchmarks.sample_users(options["users"], options["seed"])
+        except ValueError as error:
+            raise CommandError(error)
+        pages = {
+            name: url_name
+            for name, url_name in benchmarks.PAGES.items()
+            if not options["pages"] or name in options["pages"]
+        }
+        results = benchmarks.measure(
+            users, pages, requests=options["requests"], warmup=options["warmup"]
+        )
+        report = {"meta": self._meta(users, options), "results": results}
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+        for page, summary in results.items():
+            self.stdout.write(
+                f"{page:<14} p50 {summary['p50_ms']:7.1f} ms  "
+                f"p95 {summary['p95_ms']:7.1f} ms  "
+                f"p99 {summary['p99_ms']:7.1f} ms  "
+                f"requêtes SQL {summary['queries_min']}-{summary['queries_max']}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Résultats écrits dans {options['output']}.")
+        )
+
+    def _meta(self, users, options):
+        """Décrit les conditions de la mesure"""
+        return {
+            "time": timezone.now().isoformat(),
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "users_sampled": len(users),
+            "requests": options["requests"],
+            "warmup": options["warmup"],
+            "dataset": {
+                "users": User.objects.count(),
+                "tickets": Ticket.objects.count(),
+                "reviews": Review.objects.count(),
+                "follows": UserFollows.objects.count(),
+            },
+        }
+
+    def _compare(self, reference, candidate, threshold):
+        """Affiche les régressions du second fichier par rapport au premier"""
+        try:
+            old, new = (
+                json.loads(Path(path).read_text())["results"]
+                for path in (reference, candidate)
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Fichier de résultats illisible : {error}")
+
+        for page in new:
+            if page in old:
+                self.stdout.write(
+                    f"{page:<14} p50 {old[page]['p50_ms']:7.1f} -> "
+                    f"{new[page]['p50_ms']:7.1f} ms  "
+                    f"p95 {old[page]['p95_ms']:7.1f} -> {new[page]['p95_ms']:7.1f} ms"
+                )
+        regressions = benchmarks.compare(old, new, threshold)
+        for page, metric, before, after in regressions:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"RÉGRESSION {page} {metric} : {before:g} -> {after:g}"
+                )
+            )
+        if regressions:
+            raise CommandError(f"{len(regressions)} régression(s) détectée(s).")
+        self.stdout.write(self.style.SUCCESS("Aucune régression."))
@@ -0,0 +1,105 @@
+"""
+Commande de comparaison du débit des applications WSGI et ASGI.
+
+Usage :
+    python manage.py benchmark_concurrency
+    python manage.py benchmark_concurrency --concurrency 1 --concurrency 64 \
+        --page feed --requests 2000 --output concurrence.json
+
+Chaque page est appelée par l'application WSGI (un thread par requête
+simultanée) puis par l'application ASGI (vues async dans une boucle asyncio),
+pour chaque niveau de concurrence. Le débit (requêtes par seconde) et les
+percentiles des temps de réponse sont affichés et enregistrés en JSON.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from listings import benchmarks
+
+
+class Command(BaseCommand):
+    """
+    Compare le débit des pages sous WSGI et sous ASGI.
+    """
+
+    help = "Compare le débit des pages principales sous WSGI et sous ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10, help="Nombre d'utilisateurs connectés"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Nombre de requêtes par page, interface et niveau de concurrence",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            action="append",
+            help="Nombre de requêtes simultanées (option répétable ; 1, 16 et 64 "
+            "par défaut)",
+        )
+        parser.add_argument(
+            "--page",
+            action="append",
+            dest="pages",
+            choices=list(benchmarks.PAGES),
+            help="Limite la mesure à cette page (option répétable)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-concurrency.json")
+
+    def handle(self, *args, **options):
+        try:
+            users = benchmarks.sample_users(options["users"], options["seed"])
+        except ValueError as error:
+            raise CommandError(error)
+        cookies = benchmarks.session_cookies(users)
+        levels = options["concurrency"] or [1, 16, 64]
+        pages = options["pages"] or ["feed", "posts", "feed_updates"]
+
+        results = {}
+        for page in pages:
+            url = reverse(benchmarks.PAGES[page])
+            # Une requête par interface pour charger les applications et caches
+            for interface in benchmarks.INTERFACES:
+                benchmarks.throughput(interface, [url], cookies, 1, len(cookies))
+            results[page] = {}
+            for level in levels:
+                results[page][level] = {}
+                for interface in benchmarks.INTERFACES:
+                    summary = benchmarks.throughput(
+                        interface, [url], cookies, level, options["requests"]
+                    )
+                    results[page][level][interface] = summary
+                    self.stdout.write(
+                        f"{page:<13} {interface} x{level:<4} "
+                        f"{summary['requests_per_second']:8.1f} req/s  "
+                        f"p50 {summary['p50_ms']:7.1f} ms  "
+                        f"p99 {summary['p99_ms']:7.1f} ms"
+                        + (
+                            f"  erreurs {summary['errors']}"
+                            if summary["errors"]
+                            else ""
+                        )
+                    )
+
+        report = {
+            "meta": {
+                "time": timezone.now().isoformat(),
+                "users": len(users),
+                "requests": options["requests"],
+            },
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(f"Résultats écrits dans {options['output']}.")
+        )
@@ -0,0 +1,105 @@
+"""
+Commande de mesure de la contention de la base SQLite.
+
+Usage :
+    python manage.py benchmark_database
+    python manage.py benchmark_database --readers 16 --writers 2 --duration 10 \
+        --output base.json
+
+Pour chaque profil de PRAGMA (voir listings/database.py), une copie de la
+base est lue par des threads lecteurs (première page du flux) pendant que
+des threads écrivains la modifient. Les lectures et écritures par seconde,
+les percentiles des lectures et les erreurs de verrou sont affichés et
+enregistrés en JSON.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from listings import benchmarks, database
+
+
+class Command(BaseCommand):
+    """
+    Compare les profils SQLite sous lectures et écritures simultanées.
+    """
+
+    help = (
+        "Mesure les lectures du flux pendant des écritures pour chaque profil "
+        "de PRAGMA SQLite (par défaut et production)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            action="append",
+            dest="profiles",
+            choices=list(database.PROFILES),
+            help="Limite la mesure à ce profil (option répétable)",
+        )
+        parser.add_argument(
+            "--users", type=int, default=20, help="Nombre de flux lus tour à tour"
+        )
+        parser.add_argument(
+            "--readers", type=int, default=8, help="Nombre de threads lecteurs"
+        )
+        parser.add_argument(
+            "--writers", type=int, default=2, help="Nombre de threads écrivains"
+        )
+        parser.add_argument(
+            "--batch",
+            type=int,
+            default=50,
+            help="Nombre de tickets modifiés par transaction d'écriture",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=5.0, help="Durée par profil (s)"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-database.json")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Cette mesure porte sur une base SQLite.")
+        try:
+            users = benchmarks.sample_users(options["users"], options["seed"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        results = {}
+        for profile in options["profiles"] or list(database.PROFILES):
+            summary = benchmarks.contention(
+                profile,
+                users,
+                options["readers"],
+                options["writers"],
+                options["duration"],
+                options["batch"],
+            )
+            results[profile] = summary
+            self.stdout.write(
+                f"{profile:<11} {summary['reads_per_second']:9.1f} lectures/s  "
+                f"{summary['writes_per_second']:7.1f} écritures/s  "
+                f"p50 {summary['read_p50_ms'] or 0:6.2f} ms  "
+                f"p99 {summary['read_p99_ms'] or 0:7.2f} ms  "
+                f"erreurs de verrou {summary['lock_errors']}"
+            )
+
+        report = {
+            "meta": {
+                "time": timezone.now().isoformat(),
+                "readers": options["readers"],
+                "writers": options["writers"],
+                "batch": options["batch"],
+                "duration": options["duration"],
+            },
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(f"Résultats écrits dans {options['output']}.")
+        )
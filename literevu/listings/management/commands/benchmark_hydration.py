@@ -0,0 +1,78 @@
+"""
+Commande de mesure du chargement des publications affichées dans les listes.
+
+Usage :
+    python manage.py benchmark_hydration
+    python manage.py benchmark_hydration --count 10000 --output hydration.json
+
+Les dernières publications sont chargées en instances de modèles
+(select_related) puis en objets légers (listings/records.py, utilisés par
+le flux, les posts et la recherche). Le temps et la mémoire par publication
+de chaque méthode, et leur rapport, sont affichés et enregistrés en JSON.
+"""
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from listings import benchmarks
+
+
+class Command(BaseCommand):
+    """
+    Compare le chargement des publications en modèles et en objets légers.
+    """
+
+    help = (
+        "Mesure le temps et la mémoire par publication du chargement des "
+        "dernières publications, en instances de modèles et en objets légers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count", type=int, default=10000, help="Nombre de publications"
+        )
+        parser.add_argument(
+            "--page", type=int, default=500, help="Nombre de clés par chargement"
+        )
+        parser.add_argument(
+            "--rounds", type=int, default=3, help="Nombre de passages chronométrés"
+        )
+        parser.add_argument("--output", default="benchmark-hydration.json")
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmarks.hydration(
+                options["count"], options["page"], options["rounds"]
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        for name in ("models", "records"):
+            summary = results[name]
+            self.stdout.write(
+                f"{name:<8} {summary['posts']:6d} publications  "
+                f"{summary['ms_per_post'] * 1000:8.1f} µs/publication  "
+                f"{summary['bytes_per_post']:8.0f} octets/publication"
+            )
+        ratio = results["ratio"]
+        self.stdout.write(
+            f"rapport  temps x{ratio['ms_per_post']:.1f}  "
+            f"mémoire x{ratio['bytes_per_post']:.1f}"
+        )
+
+        report = {
+            "meta": {
+                "time": timezone.now().isoformat(),
+                "count": options["count"],
+                "page": options["page"],
+                "rounds": options["rounds"],
+            },
+            "results": results,
+        }
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(f"Résultats écrits dans {options['output']}.")
+        )
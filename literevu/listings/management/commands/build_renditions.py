@@ -0,0 +1,45 @@
+"""
+Commande de génération des déclinaisons des images existantes.
+
+Usage :
+    python manage.py build_renditions           # tickets sans déclinaisons
+    python manage.py build_renditions --force   # régénère toutes les images
+"""
+
+from django.core.management.base import BaseCommand
+
+from listings import images
+from listings.models import Ticket
+
+
+class Command(BaseCommand):
+    """
+    Produit les déclinaisons des images de couverture déjà enregistrées.
+    """
+
+    help = "Génère les déclinaisons (largeurs et formats) des images de tickets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Régénère aussi les déclinaisons existantes",
+        )
+
+    def handle(self, *args, **options):
+        tickets = Ticket.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            tickets = tickets.filter(renditions={})
+
+        done = failed = 0
+        for ticket in tickets.order_by("id").iterator():
+            try:
+                images.refresh_renditions(ticket)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f"Ticket {ticket.id} ({ticket.image.name}) : {error}")
+            else:
+                done += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"{done} image(s) déclinée(s), {failed} en échec.")
+        )
@@ -0,0 +1,88 @@
+"""
+Commande de vérification des plans d'exécution des requêtes fréquentes.
+
+Usage :
+    python manage.py check_query_plans
+    python manage.py check_query_plans --verbose-plans
+
+La commande échoue (code de sortie non nul) si une requête du flux, des posts
+ou des abonnements effectue un parcours complet de table.
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from listings import feeds, relations
+from listings.models import Review, Ticket, UserBlocks, UserFollows
+from listings.queryplans import full_table_scans, hot_querysets
+
+
+class Command(BaseCommand):
+    """
+    Exécute EXPLAIN QUERY PLAN sur les requêtes construites par les vues et
+    signale toute requête qui parcourt une table entière.
+    """
+
+    help = (
+        "Vérifie par EXPLAIN QUERY PLAN que les requêtes du flux, des posts et "
+        "des abonnements utilisent des index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Affiche le plan d'exécution de chaque requête",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Cette vérification ne concerne que SQLite.")
+
+        # Les requêtes sont construites sur un petit jeu de données annulé en
+        # fin de vérification, pour que leur forme soit celle d'un vrai flux
+        # (abonnements et blocages non vides).
+        with transaction.atomic():
+            user, other, blocked = self._sample_data()
+            cursor = feeds.decode_cursor(
+                feeds.encode_cursor(feeds.timeline_keys(user)[0])
+            )
+            failures = self._check(hot_querysets(user, other, cursor), options)
+            transaction.set_rollback(True)
+        for sample_user in (user, other, blocked):
+            relations.forget(sample_user.id)
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} requête(s) parcourent une table entière : "
+                + ", ".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes utilisent un index."))
+
+    def _sample_data(self):
+        """Crée des utilisateurs liés par un abonnement, un blocage et des posts"""
+        user = User.objects.create_user("query-plan-user")
+        other = User.objects.create_user("query-plan-other")
+        blocked = User.objects.create_user("query-plan-blocked")
+        UserFollows.objects.create(user=user, followed_user=other)
+        UserBlocks.objects.create(user=user, blocked_user=blocked)
+        ticket = Ticket.objects.create(title="Ticket", user=other)
+        Review.objects.create(ticket=ticket, rating=3, headline="Critique", user=user)
+        return user, other, blocked
+
+    def _check(self, catalog, options):
+        """Analyse chaque requête du catalogue et renvoie celles en échec"""
+        failures = []
+        for name, queryset in catalog.items():
+            tables, plan = full_table_scans(queryset)
+            if tables:
+                failures.append(name)
+                self.stdout.write(
+                    self.style.ERROR(f"ÉCHEC {name} : parcours de {', '.join(tables)}")
+                )
+            else:
+                self.stdout.write(f"OK    {name}")
+            if tables or options["verbose_plans"]:
+                self.stdout.write(plan)
+        return failures
@@ -0,0 +1,178 @@
+"""
+Commande de conversion des images existantes au stockage par contenu.
+
+Usage :
+    python manage.py dedupe_images                    # convertit les images
+    python manage.py dedupe_images --dry-run          # estime le gain seulement
+    python manage.py dedupe_images --delete-orphans   # supprime aussi les
+                                                      # fichiers sans ticket
+"""
+
+import hashlib
+import posixpath
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from listings import blobs
+from listings.models import Ticket
+from listings.storage import image_storage, is_content_addressed
+
+# Répertoire des images dans le stockage des médias
+IMAGES_DIR = "tickets"
+
+
+def _walk(storage, path):
+    """Noms de tous les fichiers sous un répertoire du stockage"""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from _walk(storage, posixpath.join(path, directory))
+
+
+def _digest(storage, name):
+    """Empreinte SHA-256 d'un fichier, lue par morceaux"""
+    digest = hashlib.sha256()
+    with storage.open(name, "rb") as file:
+        for chunk in file.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    """
+    Recopie les images et déclinaisons des tickets, encore nommées d'après le
+    fichier envoyé, dans le stockage par adresse de contenu, met à jour les
+    tickets, recalcule les références (ImageBlob) et supprime les anciens
+    fichiers. Le rapport indique l'espace disque libéré.
+    """
+
+    help = (
+        "Convertit les images des tickets au stockage par adresse de contenu "
+        "(un fichier par contenu distinct) et affiche l'espace libéré."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Calcule les doublons et l'espace récupérable sans rien modifier",
+        )
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Supprime aussi les fichiers d'images désignés par aucun ticket",
+        )
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        tickets = (
+            Ticket.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .values_list("id", "image", "renditions")
+        )
+        legacy = set()
+        for _, image, renditions in tickets.iterator():
+            legacy.update(
+                name
+                for name in blobs.ticket_files(image, renditions)
+                if not is_content_addressed(name)
+            )
+
+        if options["dry_run"]:
+            self.estimate(storage, legacy)
+            return
+
+        before = self.disk_usage(storage)
+        converted = self.convert(storage, tickets, legacy)
+        collected, _ = blobs.rebuild()
+        for name in converted:
+            storage.delete(name)
+        orphans = self.delete_orphans(storage) if options["delete_orphans"] else 0
+        after = self.disk_usage(storage)
+
+        self.stdout.write(
+            f"{len(converted)} fichier(s) converti(s), {collected} fichier(s) "
+            f"sans référence et {orphans} fichier(s) orphelin(s) supprimé(s)."
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Espace disque : {filesizeformat(before)} avant, "
+                f"{filesizeformat(after)} après, "
+                f"{filesizeformat(max(0, before - after))} libéré(s)."
+            )
+        )
+
+    def disk_usage(self, storage):
+        """Taille totale des fichiers du répertoire des images"""
+        return sum(storage.size(name) for name in _walk(storage, IMAGES_DIR))
+
+    def estimate(self, storage, legacy):
+        """Affiche les doublons parmi les fichiers à convertir"""
+        groups = defaultdict(list)
+        for name in sorted(legacy):
+            try:
+                groups[_digest(storage, name)].append(storage.size(name))
+            except OSError as error:
+                self.stderr.write(f"{name} : {error}")
+        total = sum(sum(sizes) for sizes in groups.values())
+        kept = sum(sizes[0] for sizes in groups.values())
+        self.stdout.write(
+            f"{sum(map(len, groups.values()))} fichier(s) à convertir, "
+            f"{len(groups)} contenu(s) distinct(s)."
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Espace récupérable : {filesizeformat(total - kept)} "
+                f"sur {filesizeformat(total)}."
+            )
+        )
+
+    def convert(self, storage, tickets, legacy):
+        """
+        Recopie les fichiers à convertir et met à jour les tickets.
+
+        Returns:
+            list: Les anciens noms des fichiers convertis
+        """
+        renamed = {}
+        for name in sorted(legacy):
+            try:
+                with storage.open(name, "rb") as file:
+                    renamed[name] = storage.save(name, file)
+            except OSError as error:
+                self.stderr.write(f"{name} : {error}")
+
+        for ticket_id, image, renditions in tickets.iterator():
+            new_image = renamed.get(image, image)
+            new_renditions = {
+                extension: {
+                    width: renamed.get(name, name) for width, name in widths.items()
+                }
+                for extension, widths in renditions.items()
+            }
+            if new_image != image or new_renditions != renditions:
+                # update() ne déclenche pas les signaux : les références sont
+                # recalculées ensuite par blobs.rebuild()
+                Ticket.objects.filter(pk=ticket_id).update(
+                    image=new_image, renditions=new_renditions
+                )
+        return list(renamed)
+
+    def delete_orphans(self, storage):
+        """
+        Supprime les fichiers d'images désignés par aucun ticket (anciennes
+        images remplacées, envois abandonnés). Un envoi en cours est un
+        orphelin jusqu'à l'enregistrement de son ticket : à lancer hors trafic.
+        """
+        referenced = blobs.references()
+        deleted = 0
+        for name in list(_walk(storage, IMAGES_DIR)):
+            if name not in referenced:
+                storage.delete(name)
+                deleted += 1
+        return deleted
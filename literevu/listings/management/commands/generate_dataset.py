@@ -0,0 +1,89 @@
+"""
+Commande de génération d'un jeu de données synthétique.
+
+Usage :
+    python manage.py generate_dataset
+    python manage.py generate_dataset --users 10000 --tickets 50000 \\
+        --reviews 100000 --follows 50 --blocks 500 --seed 42
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import datasets
+
+
+class Command(BaseCommand):
+    """
+    Crée des utilisateurs, abonnements, blocages, tickets et critiques dont
+    la répartition suit une loi de puissance, pour reproduire localement la
+    forme des données de production.
+    """
+
+    help = "Génère un jeu de données synthétique (utilisateurs, relations, posts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--tickets", type=int, default=5000)
+        parser.add_argument("--reviews", type=int, default=10000)
+        parser.add_argument(
+            "--follows",
+            type=int,
+            default=20,
+            help="Nombre moyen d'abonnements par utilisateur",
+        )
+        parser.add_argument("--blocks", type=int, default=100)
+        parser.add_argument(
+            "--alpha",
+            type=float,
+            default=1.1,
+            help="Exposant de la loi de popularité (abonnés et publications)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Période couverte par les publications (en jours)",
+        )
+        parser.add_argument(
+            "--prefix", default="user", help="Préfixe des noms d'utilisateur"
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Mot de passe de tous les utilisateurs générés",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--seed", type=int, help="Graine aléatoire (jeu de données reproductible)"
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("Il faut au moins deux utilisateurs.")
+        if User.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(
+                f"Des utilisateurs « {options['prefix']}... » existent déjà : "
+                "choisissez un autre --prefix."
+            )
+
+        start = time.perf_counter()
+        counts = datasets.generate(
+            users=options["users"],
+            tickets=options["tickets"],
+            reviews=options["reviews"],
+            follows=options["follows"],
+            blocks=options["blocks"],
+            alpha=options["alpha"],
+            days=options["days"],
+            prefix=options["prefix"],
+            password=options["password"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            log=lambda message: self.stdout.write(f"Génération : {message}"),
+        )
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{total} {name}" for name, total in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Créé en {elapsed:.1f} s : {summary}."))
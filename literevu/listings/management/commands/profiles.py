@@ -0,0 +1,119 @@
+"""
+Commande de consultation des profils de requêtes enregistrés.
+
+Usage :
+    python manage.py profiles                    # liste des profils
+    python manage.py profiles --show <id>        # résumé d'un profil
+    python manage.py profiles --show <id> --sort tottime --limit 40
+    python manage.py profiles --clear            # supprime tous les profils
+"""
+
+import io
+import pstats
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import profiling
+
+
+class Command(BaseCommand):
+    """
+    Liste et résume les profils produits par ProfilerMiddleware.
+    """
+
+    help = "Liste et résume les profils de requêtes enregistrés."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--show", metavar="ID", help="Résume ce profil")
+        parser.add_argument(
+            "--sort",
+            default="cumulative",
+            help="Tri des fonctions d'un profil cProfile (cumulative, tottime...)",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=25, help="Nombre de lignes affichées"
+        )
+        parser.add_argument(
+            "--clear", action="store_true", help="Supprime tous les profils"
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            removed = 0
+            if profiling.PROFILE_DIR.is_dir():
+                for path in profiling.PROFILE_DIR.iterdir():
+                    path.unlink()
+                    removed += 1
+            self.stdout.write(self.style.SUCCESS(f"{removed} fichier(s) supprimé(s)."))
+        elif options["show"]:
+            self._show(options["show"], options)
+        else:
+            self._list()
+
+    def _list(self):
+        """Affiche une ligne par profil, du plus récent au plus ancien"""
+        profiles = profiling.list_profiles()
+        if not profiles:
+            self.stdout.write(f"Aucun profil dans {profiling.PROFILE_DIR}.")
+            return
+        for meta in profiles:
+            self.stdout.write(
+                f"{meta['id']}  {meta['mode']:<8} {meta['user']:<15} "
+                f"{meta['duration_ms']:9.1f} ms  {meta['sql_count']:4} SQL "
+                f"({meta['sql_ms']:.1f} ms)  {meta['method']} {meta['path']}"
+            )
+
+    def _show(self, profile_id, options):
+        """Affiche le résumé d'un profil : fonctions et requêtes SQL"""
+        try:
+            meta, path = profiling.load(profile_id)
+        except (OSError, ValueError):
+            raise CommandError(f"Profil introuvable : {profile_id}")
+
+        self.stdout.write(
+            f"{meta['method']} {meta['path']} ({meta['view']}) par {meta['user']} "
+            f"le {meta['time']} : {meta['status']}, {meta['duration_ms']:.1f} ms"
+        )
+        self.stdout.write(
+            f"SQL : {meta['sql_count']} requête(s), {meta['sql_ms']:.1f} ms\n"
+        )
+
+        if meta["mode"] == "sample":
+            self._show_samples(path, options["limit"])
+        else:
+            output = io.StringIO()
+            stats = pstats.Stats(str(path), stream=output)
+            stats.strip_dirs().sort_stats(options["sort"]).print_stats(options["limit"])
+            self.stdout.write(output.getvalue())
+
+        self.stdout.write("Requêtes SQL les plus lentes :")
+        slowest = sorted(meta["queries"], key=lambda query: -query["ms"])
+        for query in slowest[: options["limit"]]:
+            self.stdout.write(f"{query['ms']:9.3f} ms  {query['sql'][:200]}")
+
+        repeated = Counter(query["sql"] for query in meta["queries"])
+        duplicates = [(sql, n) for sql, n in repeated.most_common() if n > 1]
+        if duplicates:
+            self.stdout.write("\nRequêtes SQL répétées (N+1 probables) :")
+            for sql, count in duplicates[: options["limit"]]:
+                self.stdout.write(f"{count:5} x  {sql[:200]}")
+
+    def _show_samples(self, path, limit):
+        """Affiche les fonctions les plus souvent présentes dans les piles"""
+        own, total, samples = Counter(), Counter(), 0
+        for line in path.read_text().splitlines():
+            stack, _, count = line.rpartition(" ")
+            frames = stack.split(";")
+            samples += int(count)
+            own[frames[-1]] += int(count)
+            for frame in set(frames):
+                total[frame] += int(count)
+        self.stdout.write(f"{samples} échantillon(s)\n")
+        self.stdout.write("En exécution (propre) :")
+        for frame, count in own.most_common(limit):
+            self.stdout.write(f"{100 * count / samples:6.1f} %  {frame}")
+        self.stdout.write("\nDans la pile (cumulé) :")
+        for frame, count in total.most_common(limit):
+            self.stdout.write(f"{100 * count / samples:6.1f} %  {frame}")
+        self.stdout.write("")
@@ -0,0 +1,26 @@
+"""
+Commande de reconstruction de l'index de recherche plein texte.
+
+Usage :
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from listings import search
+
+
+class Command(BaseCommand):
+    """
+    Recrée le contenu de la table FTS5 à partir des tickets et critiques
+    existants (données importées, index créé après coup, etc.).
+    """
+
+    help = "Reconstruit l'index de recherche plein texte des tickets et critiques."
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("L'index de recherche plein texte nécessite SQLite.")
+        total = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{total} publication(s) indexée(s)."))
@@ -0,0 +1,76 @@
+"""
+Commande de reconstruction du flux matérialisé.
+
+Usage :
+    python manage.py rebuild_timeline            # reconstruit tous les flux
+    python manage.py rebuild_timeline --check    # vérifie sans rien modifier
+    python manage.py rebuild_timeline --user user1
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import timeline
+
+
+class Command(BaseCommand):
+    """
+    Reconstruit la table TimelineEntry à partir des relations entre
+    utilisateurs, ou la compare au flux calculé par requêtes.
+    """
+
+    help = (
+        "Reconstruit le flux matérialisé de chaque utilisateur, ou le compare "
+        "au flux calculé à partir des abonnements et blocages (--check)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare le flux matérialisé au flux calculé sans le modifier",
+        )
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            metavar="USERNAME",
+            help="Limite le traitement à cet utilisateur (option répétable)",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        if options["check"]:
+            self._check(users)
+        else:
+            self._rebuild(users)
+
+    def _rebuild(self, users):
+        """Reconstruit le flux de chaque utilisateur"""
+        total = 0
+        for user in users.iterator():
+            total += timeline.rebuild_user(user)
+        self.stdout.write(self.style.SUCCESS(f"{total} entrées de flux écrites."))
+
+    def _check(self, users):
+        """Compare le flux matérialisé au flux calculé pour chaque utilisateur"""
+        drifted = 0
+        for user in users.iterator():
+            expected = set(timeline.expected_keys(user))
+            stored = timeline.stored_keys(user)
+            missing = len(expected - stored)
+            extra = len(stored - expected)
+            if missing or extra:
+                drifted += 1
+                self.stdout.write(
+                    f"{user.username} : {missing} manquante(s), {extra} en trop"
+                )
+        if drifted:
+            raise CommandError(
+                f"{drifted} flux divergent(s) du flux calculé. "
+                "Lancez rebuild_timeline pour les reconstruire."
+            )
+        self.stdout.write(self.style.SUCCESS("Tous les flux sont à jour."))
@@ -0,0 +1,58 @@
+"""
+Commande de vérification des statistiques de critiques des tickets.
+
+Usage :
+    python manage.py reconcile_ratings          # signale les écarts
+    python manage.py reconcile_ratings --fix    # corrige les tickets en écart
+"""
+
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import ratings
+
+
+class Command(BaseCommand):
+    """
+    Compare les colonnes review_count, rating_sum et last_review_at des
+    tickets aux critiques enregistrées, et les recalcule si demandé.
+    """
+
+    help = (
+        "Vérifie les statistiques de critiques dénormalisées dans les tickets "
+        "et corrige les écarts (--fix)."
+    )
+
+    # Nombre de tickets corrigés par requête
+    batch_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Recalcule les statistiques des tickets en écart",
+        )
+
+    def handle(self, *args, **options):
+        drifted = []
+        for ticket_id, stored, actual in ratings.drift():
+            drifted.append(ticket_id)
+            self.stdout.write(f"Ticket {ticket_id} : {stored} au lieu de {actual}")
+
+        if not drifted:
+            self.stdout.write(
+                self.style.SUCCESS("Toutes les statistiques sont à jour.")
+            )
+            return
+        if not options["fix"]:
+            raise CommandError(
+                f"{len(drifted)} ticket(s) en écart. "
+                "Lancez reconcile_ratings --fix pour les corriger."
+            )
+
+        fixed = 0
+        ticket_ids = iter(drifted)
+        while batch := list(islice(ticket_ids, self.batch_size)):
+            fixed += ratings.repair(batch)
+        self.stdout.write(self.style.SUCCESS(f"{fixed} ticket(s) corrigé(s)."))
@@ -0,0 +1,129 @@
+"""
+Commande d'exécution des tâches d'arrière-plan.
+
+Usage :
+    python manage.py run_jobs                        # 4 threads, en continu
+    python manage.py run_jobs --workers 8 --mode process
+    python manage.py run_jobs --once                 # vide la file puis s'arrête
+    python manage.py run_jobs --stats                # profondeur de la file
+"""
+
+import json
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import django
+from django.core.management.base import BaseCommand
+
+from listings import jobs
+
+
+class Command(BaseCommand):
+    """
+    Prend en charge les tâches disponibles et les exécute dans un pool de
+    threads ou de processus.
+    """
+
+    help = "Exécute les tâches d'arrière-plan de la table Job."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Nombre de tâches simultanées"
+        )
+        parser.add_argument(
+            "--mode",
+            choices=("thread", "process"),
+            default="thread",
+            help="Exécution dans un pool de threads ou de processus",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Délai entre deux recherches de tâches quand la file est vide",
+        )
+        parser.add_argument(
+            "--visibility-timeout",
+            type=int,
+            default=jobs.VISIBILITY_TIMEOUT,
+            help="Délai après lequel une tâche non terminée redevient disponible",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="S'arrête dès que la file est vide",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Affiche la profondeur de la file et s'arrête",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(jobs.stats(), indent=2))
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        workers = options["workers"]
+        if options["mode"] == "process":
+            # Les processus sont démarrés par « spawn » pour ne pas hériter des
+            # connexions à la base du processus parent
+            executor = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        else:
+            executor = ThreadPoolExecutor(workers, thread_name_prefix="job")
+
+        self.results = {True: 0, False: 0}
+        running = set()
+        with executor:
+            while not self.stopping:
+                if len(running) < workers:
+                    claimed = jobs.claim(
+                        workers - len(running), options["visibility_timeout"]
+                    )
+                    running |= {executor.submit(jobs.execute, *job) for job in claimed}
+
+                if not running:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                done, running = wait(
+                    running,
+                    timeout=options["poll_interval"],
+                    return_when=FIRST_COMPLETED,
+                )
+                self._record(done)
+
+            self._record(wait(running).done)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{self.results[True]} tâche(s) terminée(s), "
+                f"{self.results[False]} en erreur."
+            )
+        )
+
+    def _record(self, futures):
+        """Comptabilise le résultat des tâches terminées"""
+        for future in futures:
+            self.results[future.result()] += 1
+
+    def _stop(self, signum, frame):
+        """Termine les tâches en cours puis arrête le worker"""
+        self.stopping = True
@@ -0,0 +1,209 @@
+"""
+Métriques des requêtes HTTP de l'application LITRevu.
+
+Le middleware MetricsMiddleware (middleware.py) enregistre, pour chaque nom
+de vue, la durée de la requête, le nombre de requêtes SQL et le temps passé
+en SQL. Les mesures sont agrégées dans des histogrammes en mémoire, propres
+à chaque processus, et exposées au format texte de Prometheus :
+- Histogram : histogramme à seuils fixes
+- record : enregistre les mesures d'une requête
+- render : texte exposé par la vue /metrics/
+- reset : remet les histogrammes à zéro
+"""
+
+import threading
+
+from . import caching, jobs, pubsub, relations
+from .models import Job
+
+# Seuils des histogrammes de durée (en secondes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seuils de l'histogramme du nombre de requêtes SQL
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Histogrammes exposés : {nom: (description, seuils)}
+HISTOGRAMS = {
+    "litrevu_request_duration_seconds": (
+        "Durée des requêtes HTTP par vue",
+        DURATION_BUCKETS,
+    ),
+    "litrevu_request_sql_queries": (
+        "Nombre de requêtes SQL par requête HTTP",
+        QUERY_BUCKETS,
+    ),
+    "litrevu_request_sql_duration_seconds": (
+        "Temps passé en SQL par requête HTTP",
+        DURATION_BUCKETS,
+    ),
+}
+
+
+class Histogram:
+    """
+    Histogramme cumulatif à seuils fixes, au sens de Prometheus.
+
+    Attributes:
+        buckets: Les seuils, par ordre croissant
+        counts: Le nombre d'observations inférieures ou égales à chaque seuil
+        total: La somme des observations
+        count: Le nombre d'observations
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Ajoute une observation"""
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def record(view, duration, queries, sql_duration):
+    """
+    Enregistre les mesures d'une requête HTTP.
+
+    Args:
+        view: Le nom de la vue résolue
+        duration: La durée totale (en secondes)
+        queries: Le nombre de requêtes SQL
+        sql_duration: Le temps passé en SQL (en secondes)
+    """
+    values = zip(HISTOGRAMS, (duration, queries, sql_duration))
+    with _lock:
+        for name, value in values:
+            histogram = _histograms.get((name, view))
+            if histogram is None:
+                histogram = _histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+
+def reset():
+    """Remet tous les histogrammes à zéro"""
+    with _lock:
+        _histograms.clear()
+
+
+def _escape(value):
+    """Échappe la valeur d'une étiquette Prometheus"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name):
+    """Lignes d'un histogramme pour toutes les vues mesurées"""
+    with _lock:
+        series = sorted(
+            (
+                view,
+                histogram.buckets,
+                list(histogram.counts),
+                histogram.total,
+                histogram.count,
+            )
+            for (metric, view), histogram in _histograms.items()
+            if metric == name
+        )
+    for view, buckets, counts, total, count in series:
+        label = f'view="{_escape(view)}"'
+        for bound, cumulative in zip(buckets, counts):
+            yield f'{name}_bucket{{{label},le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{{label},le="+Inf"}} {count}'
+        yield f"{name}_sum{{{label}}} {total:g}"
+        yield f"{name}_count{{{label}}} {count}"
+
+
+def _metric(name, kind, description, samples):
+    """Lignes d'une métrique simple : samples est une liste de (étiquettes, valeur)"""
+    yield f"# HELP {name} {description}"
+    yield f"# TYPE {name} {kind}"
+    for labels, value in samples:
+        suffix = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        yield f"{name}{{{suffix}}} {value:g}" if suffix else f"{name} {value:g}"
+
+
+def render():
+    """
+    Produit les métriques au format texte de Prometheus.
+
+    Les histogrammes des requêtes sont complétés par les compteurs du cache
+    des relations et de chaque niveau des caches (caching.py), la profondeur
+    de la file de tâches et l'activité du flux en direct.
+
+    Returns:
+        str: Le texte exposé par la vue /metrics/
+    """
+    lines = []
+    for name, (description, _) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        lines += _histogram_lines(name)
+
+    cache = relations.stats()
+    lines += _metric(
+        "litrevu_relations_cache_requests_total",
+        "counter",
+        "Lectures du cache des relations depuis le démarrage du processus",
+        [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])],
+    )
+    tiers = [
+        (name, tier, counters)
+        for name, tiered in caching.stats().items()
+        for tier, counters in tiered.items()
+    ]
+    lines += _metric(
+        "litrevu_cache_requests_total",
+        "counter",
+        "Lectures de chaque niveau des caches depuis le démarrage du processus",
+        [
+            ({"cache": name, "tier": tier, "result": result}, counters[counter])
+            for name, tier, counters in tiers
+            for result, counter in (("hit", "hits"), ("miss", "misses"))
+        ],
+    )
+    lines += _metric(
+        "litrevu_cache_evictions_total",
+        "counter",
+        "Entrées expulsées de chaque niveau des caches avant leur expiration",
+        [
+            ({"cache": name, "tier": tier}, counters["evictions"])
+            for name, tier, counters in tiers
+        ],
+    )
+    queue = jobs.stats()
+    lines += _metric(
+        "litrevu_jobs",
+        "gauge",
+        "Nombre de tâches d'arrière-plan par état",
+        [({"status": status}, queue[status]) for status, _ in Job.STATUS_CHOICES]
+        + [({"status": "ready"}, queue["ready"])],
+    )
+    lines += _metric(
+        "litrevu_jobs_oldest_ready_age_seconds",
+        "gauge",
+        "Âge de la plus ancienne tâche prête",
+        [({}, queue["oldest_ready_age"])],
+    )
+    live = pubsub.get_broker().stats()
+    if "subscriptions" in live:
+        lines += _metric(
+            "litrevu_live_streams",
+            "gauge",
+            "Connexions ouvertes au flux en direct",
+            [({}, live["subscriptions"])],
+        )
+        lines += _metric(
+            "litrevu_live_messages_total",
+            "counter",
+            "Messages du flux en direct depuis le démarrage du processus",
+            [({"result": name}, live[name]) for name in ("delivered", "dropped")],
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+"""
+Middlewares de l'application LITRevu.
+
+- MetricsMiddleware : durée, nombre de requêtes SQL et temps SQL de chaque
+  requête HTTP, agrégés par vue dans metrics.py (synchrone et asynchrone)
+- ProfilerMiddleware : profil d'une requête demandé par l'équipe
+  (profiling.py)
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+# Nombre de requêtes SQL au-delà duquel une requête HTTP est journalisée
+# (None pour désactiver)
+QUERY_LOG_THRESHOLD = getattr(settings, "LISTINGS_METRICS_QUERY_LOG_THRESHOLD", 30)
+
+
+class _QueryTimer:
+    """
+    Compte les requêtes SQL d'une requête HTTP et cumule leur durée.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+# Chronomètre de la requête HTTP en cours. Une variable de contexte suit la
+# requête dans les threads de l'ORM asynchrone (sync_to_async), alors que
+# les connexions, elles, sont propres à chaque thread.
+_current_timer = ContextVar("listings_query_timer", default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    """
+    Enveloppe d'exécution SQL installée une fois pour toutes sur chaque
+    connexion : elle transmet la requête au chronomètre en cours, s'il y en a.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _install_timer(connection, **kwargs):
+    """Installe _timed_execute sur une connexion (signal connection_created)"""
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête HTTP et l'enregistre sous le nom de la vue résolue
+    (`feed`, `posts`, `admin:index`...), ou `unresolved` si aucune vue ne
+    correspond à l'URL.
+
+    Les requêtes SQL sont comptées sur toutes les connexions configurées ;
+    celles qui dépassent QUERY_LOG_THRESHOLD sont journalisées pour repérer
+    immédiatement les requêtes N+1. Le middleware est synchrone sous WSGI et
+    asynchrone sous ASGI : une vue async n'est pas renvoyée dans un thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_timer, dispatch_uid=__name__)
+        for connection in connections.all(initialized_only=True):
+            _install_timer(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = _QueryTimer()
+        token = _current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._record(request, timer, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        timer = _QueryTimer()
+        token = _current_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._record(request, timer, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, timer, duration):
+        """Enregistre les mesures et journalise les requêtes trop coûteuses"""
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        metrics.record(view, duration, timer.count, timer.duration)
+        if QUERY_LOG_THRESHOLD is not None and timer.count > QUERY_LOG_THRESHOLD:
+            logger.warning(
+                "%s %s (%s) : %s requêtes SQL en %.1f ms (requête en %.1f ms)",
+                request.method,
+                request.path,
+                view,
+                timer.count,
+                timer.duration * 1000,
+                duration * 1000,
+            )
+
+
+class ProfilerMiddleware:
+    """
+    Exécute la vue sous un profileur lorsque la requête le demande (en-tête
+    `X-Profile` ou paramètre `?_profile`, équipe uniquement). L'identifiant
+    du profil enregistré est renvoyé dans l'en-tête `X-Profile-Id`.
+
+    Désactivé par défaut : sans LISTINGS_PROFILER_ENABLED, Django le retire
+    de la chaîne des middlewares au démarrage (MiddlewareNotUsed).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "LISTINGS_PROFILER_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return None
+        if iscoroutinefunction(view_func):
+            # Coroutine : profiling.run profile aussi le thread de la boucle
+            # d'évènements qui l'exécute
+            async def view():
+                return await view_func(request, *view_args, **view_kwargs)
+
+        else:
+
+            def view():
+                return view_func(request, *view_args, **view_kwargs)
+
+        response, profile_id = profiling.run(request, view, mode)
+        response["X-Profile-Id"] = profile_id
+        return response
@@ -0,0 +1,589 @@
+# Generated by Django 5.0 on 2026-10-18 20:58
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import listings.models
+import listings.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Deletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("ticket", "Ticket"), ("account", "Compte")],
+                        help_text="Le type d'objet supprimé",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(
+                        help_text="L'identifiant du ticket ou de l'utilisateur"
+                    ),
+                ),
+                (
+                    "label",
+                    models.CharField(
+                        help_text="Le titre du ticket ou le nom de l'utilisateur",
+                        max_length=150,
+                    ),
+                ),
+                (
+                    "step",
+                    models.CharField(
+                        blank=True,
+                        help_text="L'étape en cours de la suppression",
+                        max_length=100,
+                    ),
+                ),
+                (
+                    "rows_deleted",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="Le nombre de lignes supprimées"
+                    ),
+                ),
+                (
+                    "files_released",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Le nombre de références aux fichiers d'images retirées",
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True, help_text="La date et l'heure de la demande"
+                    ),
+                ),
+                (
+                    "time_finished",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="La date et l'heure de fin de la suppression",
+                        null=True,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Le nom du fichier stocké",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "size",
+                    models.PositiveBigIntegerField(
+                        default=0, help_text="La taille du fichier (en octets)"
+                    ),
+                ),
+                (
+                    "refcount",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Le nombre de références au fichier"
+                    ),
+                ),
+                (
+                    "reserved_until",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="La fin de la réservation du fichier par un envoi en cours",
+                        null=True,
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="La date et l'heure du premier envoi",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(help_text="Le nom de la tâche", max_length=100),
+                ),
+                (
+                    "payload",
+                    models.JSONField(
+                        blank=True, default=dict, help_text="Les arguments de la tâche"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "En attente"),
+                            ("running", "En cours"),
+                            ("done", "Terminée"),
+                            ("failed", "En échec"),
+                        ],
+                        default="pending",
+                        help_text="L'état de la tâche",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, help_text="Le nombre d'essais effectués"
+                    ),
+                ),
+                (
+                    "max_attempts",
+                    models.PositiveSmallIntegerField(
+                        default=5, help_text="Le nombre d'essais autorisés"
+                    ),
+                ),
+                (
+                    "available_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="La date à partir de laquelle la tâche peut être exécutée",
+                    ),
+                ),
+                (
+                    "locked_until",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="La fin du délai de visibilité de la tâche en cours",
+                        null=True,
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, help_text="La dernière erreur"),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="La date et l'heure de création de la tâche",
+                    ),
+                ),
+                (
+                    "time_finished",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="La date et l'heure de fin de la tâche",
+                        null=True,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "available_at"], name="job_queue_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="Ticket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "title",
+                    models.CharField(
+                        help_text="Le titre du livre ou de l'article", max_length=128
+                    ),
+                ),
+                (
+                    "description",
+                    models.TextField(
+                        blank=True,
+                        help_text="La description du livre ou de l'article",
+                        max_length=2048,
+                    ),
+                ),
+                (
+                    "image",
+                    models.ImageField(
+                        blank=True,
+                        help_text="La couverture du livre ou une image de l'article",
+                        null=True,
+                        storage=listings.storage.image_storage,
+                        upload_to="tickets/",
+                    ),
+                ),
+                (
+                    "renditions",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Les déclinaisons de l'image par format et par largeur",
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="La date et l'heure de création du ticket",
+                    ),
+                ),
+                (
+                    "time_edited",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="La date et l'heure de dernière modification du ticket",
+                    ),
+                ),
+                (
+                    "review_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Le nombre de critiques en réponse au ticket",
+                    ),
+                ),
+                (
+                    "rating_sum",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="La somme des notes des critiques du ticket",
+                    ),
+                ),
+                (
+                    "last_review_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="La date et l'heure de la critique la plus récente",
+                        null=True,
+                    ),
+                ),
+                (
+                    "hidden",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Le ticket est masqué en attente de suppression",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui a créé le ticket",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            bases=(listings.models.TicketDisplayMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name="Review",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "rating",
+                    models.PositiveSmallIntegerField(
+                        help_text="La note attribuée (entre 0 et 5 étoiles)",
+                        validators=[
+                            django.core.validators.MinValueValidator(0),
+                            django.core.validators.MaxValueValidator(5),
+                        ],
+                    ),
+                ),
+                (
+                    "headline",
+                    models.CharField(
+                        help_text="Le titre de la critique", max_length=128
+                    ),
+                ),
+                (
+                    "body",
+                    models.TextField(
+                        blank=True,
+                        help_text="Le contenu détaillé de la critique",
+                        max_length=8192,
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="La date et l'heure de création de la critique",
+                    ),
+                ),
+                (
+                    "time_edited",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="La date et l'heure de dernière modification de la critique",
+                    ),
+                ),
+                (
+                    "hidden",
+                    models.BooleanField(
+                        default=False,
+                        help_text="La critique est masquée en attente de suppression",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui a écrit la critique",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "ticket",
+                    models.ForeignKey(
+                        help_text="Le ticket auquel cette critique répond",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="listings.ticket",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "post_type",
+                    models.CharField(
+                        choices=[("TICKET", "Ticket"), ("REVIEW", "Critique")],
+                        help_text="Le type de publication",
+                        max_length=6,
+                    ),
+                ),
+                (
+                    "post_id",
+                    models.PositiveBigIntegerField(
+                        help_text="L'identifiant du ticket ou de la critique"
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        help_text="La date et l'heure de création de la publication"
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        help_text="L'auteur de la publication",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur propriétaire du flux",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserBlocks",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "time_created",
+                    models.DateTimeField(
+                        auto_now_add=True, help_text="La date et l'heure du blocage"
+                    ),
+                ),
+                (
+                    "blocked_user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui est bloqué",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="blocked_by",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui bloque",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="blocking",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserFollows",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "followed_user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui est suivi",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="followed_by",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        help_text="L'utilisateur qui suit",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="following",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(
+                fields=["user", "time_created"], name="ticket_user_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticket",
+            index=models.Index(fields=["time_created"], name="ticket_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["user", "time_created"], name="review_user_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(fields=["time_created"], name="review_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "-time_created", "-post_type", "-post_id"],
+                name="timeline_user_time_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["user", "author"], name="timeline_user_author_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["post_type", "post_id"], name="timeline_post_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="timelineentry",
+            unique_together={("user", "post_type", "post_id")},
+        ),
+        migrations.AddIndex(
+            model_name="userblocks",
+            index=models.Index(
+                fields=["blocked_user", "user"], name="blocks_blocked_user_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="userblocks",
+            unique_together={("user", "blocked_user")},
+        ),
+        migrations.AddIndex(
+            model_name="userfollows",
+            index=models.Index(
+                fields=["followed_user", "user"], name="follows_followed_user_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="userfollows",
+            unique_together={("user", "followed_user")},
+        ),
+    ]
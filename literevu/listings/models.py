@@ -2,19 +2,80 @@
 Modèles de données pour l'application LITRevu.
 
 Ce fichier définit la structure de la base de données de l'application.
-Il contient quatre modèles principaux :
+Il contient les modèles suivants :
 - Ticket : pour les demandes de critique
 - Review : pour les critiques
 - UserFollows : pour les abonnements entre utilisateurs
 - UserBlocks : pour les blocages entre utilisateurs
+- TimelineEntry : pour le flux d'activité matérialisé de chaque utilisateur
+- Job : pour les tâches exécutées en arrière-plan après une écriture
+- ImageBlob : pour les fichiers d'images partagés entre tickets
+- Deletion : pour les suppressions de tickets et de comptes en arrière-plan
+
+TicketDisplayMixin regroupe les propriétés d'affichage d'un ticket, communes
+au modèle Ticket et aux tickets chargés pour les listes (records.py).
 """
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from .storage import image_storage
 
 
-class Ticket(models.Model):
+class TicketDisplayMixin:
+    """
+    Propriétés d'affichage d'un ticket (image, déclinaisons, note moyenne).
+
+    Elles ne lisent que les attributs image, renditions, review_count et
+    rating_sum, communs au modèle Ticket et à records.TicketRecord.
+    """
+
+    __slots__ = ()
+
+    def _srcset(self, extension):
+        """Construit l'attribut srcset des déclinaisons d'un format"""
+        storage = image_storage()
+        widths = self.renditions.get(extension, {})
+        return ", ".join(
+            f"{storage.url(widths[width])} {width}w"
+            for width in sorted(widths, key=int)
+        )
+
+    @property
+    def webp_srcset(self):
+        """Attribut srcset des déclinaisons WebP de l'image"""
+        return self._srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        """Attribut srcset des déclinaisons JPEG de l'image"""
+        return self._srcset("jpg")
+
+    @property
+    def average_rating(self):
+        """Note moyenne des critiques (une décimale), ou None sans critique"""
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def image_url(self):
+        """
+        URL de la plus grande déclinaison JPEG, ou de l'original à défaut.
+        `image` est un FieldFile pour le modèle et un nom de fichier pour les
+        tickets de records.py : str() donne le nom dans les deux cas.
+        """
+        widths = self.renditions.get("jpg")
+        if widths:
+            return image_storage().url(widths[max(widths, key=int)])
+        if not self.image:
+            return None
+        return image_storage().url(str(self.image))
+
+
+class Ticket(TicketDisplayMixin, models.Model):
     """
     Modèle représentant une demande de critique.
 
@@ -22,9 +83,15 @@ class Ticket(models.Model):
     livre ou un article. Il contient :
     - Un titre obligatoire
     - Une description optionnelle
-    - Une image de couverture optionnelle
+    - Une image de couverture optionnelle et ses déclinaisons (images.py),
+      stockées une seule fois par contenu (storage.py et blobs.py)
     - Une référence à l'utilisateur qui l'a créé
     - La date et l'heure de création
+    - La date et l'heure de dernière modification (clé du cache des cartes)
+    - Les statistiques de ses critiques, tenues à jour par ratings.py
+    - Un indicateur de masquage, posé dès la demande de suppression du ticket
+      ou de son auteur, en attendant la suppression en arrière-plan
+      (deletions.py)
     """
 
     title = models.CharField(
@@ -42,11 +109,47 @@ class Ticket(models.Model):
         null=True,
         blank=True,
         upload_to="tickets/",
+        storage=image_storage,
         help_text="La couverture du livre ou une image de l'article",
     )
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Les déclinaisons de l'image par format et par largeur",
+    )
     time_created = models.DateTimeField(
         auto_now_add=True, help_text="La date et l'heure de création du ticket"
     )
+    time_edited = models.DateTimeField(
+        auto_now=True, help_text="La date et l'heure de dernière modification du ticket"
+    )
+    review_count = models.PositiveIntegerField(
+        default=0, help_text="Le nombre de critiques en réponse au ticket"
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0, help_text="La somme des notes des critiques du ticket"
+    )
+    last_review_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="La date et l'heure de la critique la plus récente",
+    )
+    hidden = models.BooleanField(
+        default=False, help_text="Le ticket est masqué en attente de suppression"
+    )
+
+    class Meta:
+        """
+        Métadonnées du modèle.
+        L'index suit le tri par date des tickets d'un utilisateur (flux et posts) ;
+        l'index sur la seule date sert au tri et à la navigation par date de
+        l'administration.
+        """
+
+        indexes = [
+            models.Index(fields=["user", "time_created"], name="ticket_user_time_idx"),
+            models.Index(fields=["time_created"], name="ticket_time_idx"),
+        ]
 
     def __str__(self):
         """Représentation textuelle du ticket"""
@@ -65,6 +168,9 @@ class Review(models.Model):
     - Un contenu détaillé
     - Une référence à l'utilisateur qui l'a créée
     - La date et l'heure de création
+    - La date et l'heure de dernière modification (clé du cache des cartes)
+    - Un indicateur de masquage, posé dès la demande de suppression du compte
+      de son auteur (deletions.py)
     """
 
     ticket = models.ForeignKey(
@@ -88,6 +194,26 @@ class Review(models.Model):
     time_created = models.DateTimeField(
         auto_now_add=True, help_text="La date et l'heure de création de la critique"
     )
+    time_edited = models.DateTimeField(
+        auto_now=True,
+        help_text="La date et l'heure de dernière modification de la critique",
+    )
+    hidden = models.BooleanField(
+        default=False, help_text="La critique est masquée en attente de suppression"
+    )
+
+    class Meta:
+        """
+        Métadonnées du modèle.
+        L'index suit le tri par date des critiques d'un utilisateur (flux et posts) ;
+        l'index sur la seule date sert au tri et à la navigation par date de
+        l'administration.
+        """
+
+        indexes = [
+            models.Index(fields=["user", "time_created"], name="review_user_time_idx"),
+            models.Index(fields=["time_created"], name="review_time_idx"),
+        ]
 
     def __str__(self):
         """Représentation textuelle de la critique"""
@@ -123,9 +249,15 @@ class UserFollows(models.Model):
         """
         Métadonnées du modèle.
         Garantit qu'un utilisateur ne peut pas suivre plusieurs fois la même personne.
+        L'index inverse couvre la recherche des abonnés d'un utilisateur.
         """
 
         unique_together = ("user", "followed_user")
+        indexes = [
+            models.Index(
+                fields=["followed_user", "user"], name="follows_followed_user_idx"
+            ),
+        ]
 
     def __str__(self):
         """Représentation textuelle de la relation de suivi"""
@@ -168,10 +300,253 @@ class UserBlocks(models.Model):
         """
         Métadonnées du modèle.
         Garantit qu'un utilisateur ne peut pas bloquer plusieurs fois la même personne.
+        L'index inverse couvre la recherche des utilisateurs qui en bloquent un autre.
         """
 
         unique_together = ("user", "blocked_user")
+        indexes = [
+            models.Index(
+                fields=["blocked_user", "user"], name="blocks_blocked_user_idx"
+            ),
+        ]
 
     def __str__(self):
         """Représentation textuelle de la relation de blocage"""
         return f"{self.user} bloque {self.blocked_user}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Modèle représentant une publication présente dans le flux d'un utilisateur.
+
+    Le flux est matérialisé à l'écriture : chaque ticket ou critique est
+    recopié dans le flux de chaque utilisateur autorisé à le voir. La lecture
+    d'une page du flux devient ainsi un simple parcours d'index.
+
+    Attributs :
+    - user : l'utilisateur propriétaire du flux
+    - author : l'auteur de la publication
+    - post_type : le type de publication (ticket ou critique)
+    - post_id : l'identifiant du ticket ou de la critique
+    - time_created : la date de création de la publication
+    """
+
+    TICKET = "TICKET"
+    REVIEW = "REVIEW"
+    POST_TYPE_CHOICES = [(TICKET, "Ticket"), (REVIEW, "Critique")]
+
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        help_text="L'utilisateur propriétaire du flux",
+    )
+    author = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+        help_text="L'auteur de la publication",
+    )
+    post_type = models.CharField(
+        max_length=6,
+        choices=POST_TYPE_CHOICES,
+        help_text="Le type de publication",
+    )
+    post_id = models.PositiveBigIntegerField(
+        help_text="L'identifiant du ticket ou de la critique"
+    )
+    time_created = models.DateTimeField(
+        help_text="La date et l'heure de création de la publication"
+    )
+
+    class Meta:
+        """
+        Métadonnées du modèle.
+        Une publication n'apparaît qu'une fois dans un flux, et l'index suit
+        l'ordre d'affichage du flux pour la pagination par curseur.
+        """
+
+        unique_together = ("user", "post_type", "post_id")
+        indexes = [
+            models.Index(
+                fields=["user", "-time_created", "-post_type", "-post_id"],
+                name="timeline_user_time_idx",
+            ),
+            models.Index(fields=["user", "author"], name="timeline_user_author_idx"),
+            models.Index(fields=["post_type", "post_id"], name="timeline_post_idx"),
+        ]
+
+    def __str__(self):
+        """Représentation textuelle de l'entrée du flux"""
+        return f"{self.post_type} {self.post_id} dans le flux de {self.user}"
+
+
+class Job(models.Model):
+    """
+    Modèle représentant une tâche à exécuter en arrière-plan.
+
+    Les tâches sont créées par jobs.enqueue() après la validation de la
+    transaction qui les a déclenchées, puis prises en charge par la commande
+    run_jobs. Une tâche prise en charge est invisible pour les autres
+    workers jusqu'à `locked_until` : si le worker s'arrête avant de la
+    terminer, elle redevient disponible à l'expiration de ce délai.
+
+    Attributs :
+    - name : le nom de la tâche enregistrée (voir tasks.py)
+    - payload : les arguments de la tâche (JSON)
+    - status : l'état de la tâche
+    - attempts / max_attempts : le nombre d'essais effectués et autorisés
+    - available_at : la date à partir de laquelle la tâche peut être exécutée
+    - locked_until : la fin du délai de visibilité de la tâche en cours
+    - last_error : la dernière erreur rencontrée
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "En attente"),
+        (RUNNING, "En cours"),
+        (DONE, "Terminée"),
+        (FAILED, "En échec"),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Le nom de la tâche")
+    payload = models.JSONField(
+        default=dict, blank=True, help_text="Les arguments de la tâche"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        help_text="L'état de la tâche",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, help_text="Le nombre d'essais effectués"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5, help_text="Le nombre d'essais autorisés"
+    )
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="La date à partir de laquelle la tâche peut être exécutée",
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="La fin du délai de visibilité de la tâche en cours",
+    )
+    last_error = models.TextField(blank=True, help_text="La dernière erreur")
+    time_created = models.DateTimeField(
+        auto_now_add=True, help_text="La date et l'heure de création de la tâche"
+    )
+    time_finished = models.DateTimeField(
+        null=True, blank=True, help_text="La date et l'heure de fin de la tâche"
+    )
+
+    class Meta:
+        """
+        Métadonnées du modèle.
+        L'index couvre la recherche des tâches disponibles par les workers.
+        """
+
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="job_queue_idx"),
+        ]
+
+    def __str__(self):
+        """Représentation textuelle de la tâche"""
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class ImageBlob(models.Model):
+    """
+    Modèle représentant un fichier d'image stocké par adresse de contenu.
+
+    Une même image (original ou déclinaison) peut être désignée par
+    plusieurs tickets : le fichier n'est supprimé que lorsque plus aucun
+    ticket ne le désigne (voir blobs.py).
+
+    Attributs :
+    - name : le nom du fichier dans le stockage des images
+    - size : la taille du fichier (en octets)
+    - refcount : le nombre de références des tickets au fichier
+    - reserved_until : la fin de la réservation du fichier par un envoi qui
+      le réutilise, avant l'enregistrement du ticket qui le désigne
+    """
+
+    name = models.CharField(
+        max_length=255, unique=True, help_text="Le nom du fichier stocké"
+    )
+    size = models.PositiveBigIntegerField(
+        default=0, help_text="La taille du fichier (en octets)"
+    )
+    refcount = models.PositiveIntegerField(
+        default=0, help_text="Le nombre de références au fichier"
+    )
+    reserved_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="La fin de la réservation du fichier par un envoi en cours",
+    )
+    time_created = models.DateTimeField(
+        auto_now_add=True, help_text="La date et l'heure du premier envoi"
+    )
+
+    def __str__(self):
+        """Représentation textuelle du fichier"""
+        return f"{self.name} ({self.refcount} référence(s))"
+
+
+class Deletion(models.Model):
+    """
+    Modèle représentant la suppression d'un ticket ou d'un compte.
+
+    Le ticket ou le compte est masqué dès la demande ; ses lignes liées
+    (critiques, entrées des flux, abonnements...) sont ensuite supprimées par
+    lots bornés par la tâche deletions.run (voir deletions.py), qui tient à
+    jour l'avancement affiché dans l'administration.
+
+    Attributs :
+    - kind : le type d'objet supprimé (ticket ou compte)
+    - object_id : l'identifiant du ticket ou de l'utilisateur
+    - label : le titre du ticket ou le nom de l'utilisateur
+    - step : l'étape en cours
+    - rows_deleted : le nombre de lignes supprimées
+    - files_released : le nombre de références à des fichiers d'images retirées
+    - time_finished : la date de fin de la suppression
+    """
+
+    TICKET = "ticket"
+    ACCOUNT = "account"
+    KIND_CHOICES = [(TICKET, "Ticket"), (ACCOUNT, "Compte")]
+
+    kind = models.CharField(
+        max_length=10, choices=KIND_CHOICES, help_text="Le type d'objet supprimé"
+    )
+    object_id = models.PositiveBigIntegerField(
+        help_text="L'identifiant du ticket ou de l'utilisateur"
+    )
+    label = models.CharField(
+        max_length=150, help_text="Le titre du ticket ou le nom de l'utilisateur"
+    )
+    step = models.CharField(
+        max_length=100, blank=True, help_text="L'étape en cours de la suppression"
+    )
+    rows_deleted = models.PositiveBigIntegerField(
+        default=0, help_text="Le nombre de lignes supprimées"
+    )
+    files_released = models.PositiveIntegerField(
+        default=0, help_text="Le nombre de références aux fichiers d'images retirées"
+    )
+    time_created = models.DateTimeField(
+        auto_now_add=True, help_text="La date et l'heure de la demande"
+    )
+    time_finished = models.DateTimeField(
+        null=True, blank=True, help_text="La date et l'heure de fin de la suppression"
+    )
+
+    def __str__(self):
+        """Représentation textuelle de la suppression"""
+        return f"Suppression {self.get_kind_display().lower()} {self.label}"
@@ -0,0 +1,286 @@
+"""
+Profilage à la demande d'une requête HTTP précise.
+
+Un membre de l'équipe ajoute l'en-tête `X-Profile` ou le paramètre
+`?_profile` à une requête : la vue est alors exécutée sous cProfile (valeur
+par défaut) ou sous un échantillonneur de piles (`sample`), et les requêtes
+SQL sont chronométrées. Une vue async est profilée dans les deux threads où
+elle s'exécute : celui de la boucle d'évènements, qui exécute la coroutine,
+et le thread appelant, qui exécute ses appels synchrones (ORM, rendu). Le
+profil est enregistré dans PROFILE_DIR, dont seuls les KEEP profils les plus
+récents sont conservés. Ce fichier contient :
+- requested_mode : mode demandé par une requête, ou None
+- run : exécution d'une vue sous le profileur
+- list_profiles / load : lecture des profils enregistrés (commande profiles)
+
+Le middleware ProfilerMiddleware (middleware.py) n'est actif que si
+LISTINGS_PROFILER_ENABLED vaut True : sinon il est retiré de la chaîne des
+middlewares au démarrage et n'a aucun coût.
+"""
+
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Répertoire des profils enregistrés
+PROFILE_DIR = Path(
+    getattr(settings, "LISTINGS_PROFILE_DIR", settings.BASE_DIR / "profiles")
+)
+
+# Nombre de profils conservés (les plus anciens sont supprimés)
+KEEP = getattr(settings, "LISTINGS_PROFILE_KEEP", 50)
+
+# Intervalle de l'échantillonneur de piles (en secondes)
+SAMPLE_INTERVAL = getattr(settings, "LISTINGS_PROFILE_SAMPLE_INTERVAL", 0.005)
+
+HEADER = "X-Profile"
+PARAMETER = "_profile"
+MODES = ("cprofile", "sample")
+
+
+def requested_mode(request):
+    """
+    Renvoie le mode de profilage demandé par une requête.
+
+    Args:
+        request: La requête HTTP (utilisateur déjà authentifié)
+
+    Returns:
+        str: "cprofile" ou "sample", ou None si aucun profil n'est demandé ou
+            si l'utilisateur ne fait pas partie de l'équipe
+    """
+    value = request.headers.get(HEADER) or request.GET.get(PARAMETER)
+    if not value or not request.user.is_staff:
+        return None
+    return value if value in MODES else MODES[0]
+
+
+class _SqlRecorder:
+    """Enveloppe d'exécution SQL qui chronomètre chaque requête"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append({"sql": sql, "ms": round(duration, 3)})
+
+
+class _StackSampler(threading.Thread):
+    """
+    Échantillonneur de piles : relève périodiquement la pile de threads
+    donnés et compte les piles identiques (format « folded » des flame
+    graphs).
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.thread_ids = set()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_thread(self, thread_id):
+        """Ajoute un thread aux piles relevées"""
+        with self._lock:
+            self.thread_ids.add(thread_id)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                thread_ids = list(self.thread_ids)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Arrête l'échantillonnage et attend la fin du thread"""
+        self.stopped.set()
+        self.join()
+
+
+class _Profiler:
+    """
+    Profileur d'une requête, éventuellement sur plusieurs threads.
+
+    cProfile ne mesure que le thread où il est activé : chaque thread profilé
+    a le sien, et les mesures sont réunies à l'enregistrement.
+    L'échantillonneur, lui, relève les piles de tous les threads profilés.
+
+    Args:
+        mode: "cprofile" ou "sample"
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.profiles = []
+        self.sampler = _StackSampler(SAMPLE_INTERVAL) if mode == "sample" else None
+
+    def __enter__(self):
+        if self.sampler is not None:
+            self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    @contextmanager
+    def thread(self):
+        """Profile le thread courant pendant le bloc"""
+        if self.sampler is not None:
+            self.sampler.add_thread(threading.get_ident())
+            yield
+            return
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+
+    def dump(self, path):
+        """Enregistre le profil dans `path`.folded ou `path`.prof selon le mode"""
+        if self.sampler is not None:
+            path.with_name(f"{path.name}.folded").write_text(
+                "".join(
+                    f"{stack} {count}\n" for stack, count in self.sampler.stacks.items()
+                )
+            )
+        else:
+            pstats.Stats(*self.profiles).dump_stats(path.with_name(f"{path.name}.prof"))
+
+
+def _rotate():
+    """Supprime les profils les plus anciens au-delà de KEEP"""
+    for meta in list_profiles()[KEEP:]:
+        for path in PROFILE_DIR.glob(f"{meta['id']}.*"):
+            path.unlink(missing_ok=True)
+
+
+def run(request, view, mode):
+    """
+    Exécute une vue sous le profileur et enregistre le profil.
+
+    Une vue async (view coroutine) est exécutée par async_to_sync : la
+    coroutine est profilée dans le thread de la boucle d'évènements, et ses
+    appels synchrones (sync_to_async) dans le thread appelant. Les autres
+    tâches de la boucle exécutées pendant ce temps apparaissent aussi dans le
+    profil.
+
+    Args:
+        request: La requête HTTP
+        view: Fonction ou coroutine sans argument qui appelle la vue
+        mode: "cprofile" ou "sample"
+
+    Returns:
+        tuple: (réponse de la vue, identifiant du profil enregistré)
+    """
+    recorder = _SqlRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        profiler = stack.enter_context(_Profiler(mode))
+        if iscoroutinefunction(view):
+            coroutine = view
+
+            async def profiled():
+                with profiler.thread():
+                    return await coroutine()
+
+            view = async_to_sync(profiled)
+        stack.enter_context(profiler.thread())
+        start = time.perf_counter()
+        response = view()
+        # Une réponse différée (TemplateResponse) est rendue pendant le profil
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        duration = time.perf_counter() - start
+
+    now = timezone.now()
+    match = request.resolver_match
+    view_name = match.view_name if match else "unresolved"
+    profile_id = f"{now:%Y%m%dT%H%M%S%f}-{view_name.replace(':', '_')}"
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profiler.dump(PROFILE_DIR / profile_id)
+    meta = {
+        "id": profile_id,
+        "time": now.isoformat(),
+        "mode": mode,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": view_name,
+        "user": request.user.get_username(),
+        "status": response.status_code,
+        "duration_ms": round(duration * 1000, 3),
+        "sql_count": len(recorder.queries),
+        "sql_ms": round(sum(query["ms"] for query in recorder.queries), 3),
+        "queries": recorder.queries,
+    }
+    (PROFILE_DIR / f"{profile_id}.json").write_text(json.dumps(meta, indent=2))
+    _rotate()
+    return response, profile_id
+
+
+def list_profiles():
+    """
+    Liste les profils enregistrés, du plus récent au plus ancien.
+
+    Returns:
+        list: Les métadonnées de chaque profil (sans le détail des requêtes)
+    """
+    if not PROFILE_DIR.is_dir():
+        return []
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        meta.pop("queries", None)
+        profiles.append(meta)
+    return profiles
+
+
+def load(profile_id):
+    """
+    Charge les métadonnées complètes et le fichier d'un profil.
+
+    Args:
+        profile_id: L'identifiant du profil
+
+    Returns:
+        tuple: (métadonnées, chemin du fichier .prof ou .folded)
+
+    Raises:
+        FileNotFoundError: Si le profil n'existe pas
+    """
+    meta = json.loads((PROFILE_DIR / f"{profile_id}.json").read_text())
+    extension = "folded" if meta["mode"] == "sample" else "prof"
+    return meta, PROFILE_DIR / f"{profile_id}.{extension}"
@@ -0,0 +1,288 @@
+"""
+Publication et abonnement (pub/sub) des nouvelles publications.
+
+Chaque ticket ou critique créé est publié sur des sujets :
+- `user:<id>` : publications de l'utilisateur <id>
+- `owner:<id>` : critiques en réponse aux tickets de l'utilisateur <id>
+
+Le flux en direct (live.py) s'abonne aux sujets qui alimentent le flux de
+l'utilisateur connecté. Ce fichier contient :
+- Subscription : file d'attente asyncio d'un abonné
+- Broker : interface d'un courtier
+- InMemoryBroker : courtier en mémoire, limité à un processus
+- get_broker : courtier configuré par LISTINGS_PUBSUB_BACKEND
+- post_topics / post_message / publish_post : publication d'un post créé
+
+Un courtier partagé entre processus (Redis, PostgreSQL LISTEN/NOTIFY...)
+hérite d'InMemoryBroker : `publish` envoie le message au service partagé,
+et une tâche d'écoute propre à chaque processus appelle `deliver` pour le
+remettre aux abonnés locaux.
+"""
+
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import feeds
+from .models import Review, TimelineEntry
+
+# Classe du courtier utilisé par le processus
+BACKEND = getattr(settings, "LISTINGS_PUBSUB_BACKEND", "listings.pubsub.InMemoryBroker")
+
+# Nombre de messages en attente par abonné au-delà duquel ils sont perdus
+QUEUE_SIZE = getattr(settings, "LISTINGS_PUBSUB_QUEUE_SIZE", 100)
+
+# Message remis à un abonnement fermé (fin de la connexion)
+CLOSED = object()
+
+
+class Subscription:
+    """
+    Abonnement d'un client à des sujets.
+
+    Les messages sont déposés dans une file asyncio bornée, depuis n'importe
+    quel thread, et lus dans la boucle qui a créé l'abonnement. Un abonné
+    inactif ne coûte que sa file : aucun thread ni requête SQL.
+
+    Attributes:
+        topics: Les sujets suivis
+        active: False une fois l'abonnement retiré du courtier
+        dropped: Le nombre de messages perdus (file pleine)
+    """
+
+    def __init__(self, broker, topics, maxsize=QUEUE_SIZE):
+        self.broker = broker
+        self.topics = frozenset(topics)
+        self.active = True
+        self.dropped = 0
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        """Dépose un message (appelable depuis n'importe quel thread)"""
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Boucle fermée : l'abonnement est sur le point d'être retiré
+            pass
+
+    def _put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.broker.count("dropped")
+
+    def close(self):
+        """Réveille le lecteur pour qu'il termine (connexion fermée)"""
+        self._loop.call_soon_threadsafe(self._close)
+
+    def _close(self):
+        # CLOSED passe même si la file est pleine
+        while self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(CLOSED)
+
+    async def get(self, timeout=None):
+        """
+        Attend le prochain message.
+
+        Args:
+            timeout: Le délai maximal d'attente (en secondes)
+
+        Returns:
+            Le message, ou CLOSED si l'abonnement a été fermé
+
+        Raises:
+            TimeoutError: Si aucun message n'arrive dans le délai
+        """
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+
+class Broker(ABC):
+    """
+    Interface d'un courtier de messages.
+    """
+
+    @abstractmethod
+    def publish(self, topics, message):
+        """
+        Publie un message sur des sujets.
+
+        Args:
+            topics: Les sujets du message
+            message: Un dictionnaire sérialisable en JSON
+        """
+
+    @abstractmethod
+    def subscribe(self, topics):
+        """
+        Abonne la boucle asyncio courante à des sujets.
+
+        Args:
+            topics: Les sujets à suivre
+
+        Returns:
+            Subscription: L'abonnement, à utiliser avec `async with`
+        """
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        """Retire un abonnement"""
+
+    def count(self, name):
+        """Incrémente un compteur de statistiques (facultatif)"""
+
+    def stats(self):
+        """Renvoie les compteurs du courtier (voir InMemoryBroker.stats)"""
+        return {}
+
+
+class InMemoryBroker(Broker):
+    """
+    Courtier en mémoire : les messages ne sont remis qu'aux abonnés du
+    processus qui les publie.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._stats = {"subscriptions": 0, "published": 0, "delivered": 0, "dropped": 0}
+
+    def publish(self, topics, message):
+        self.deliver(topics, message)
+
+    def deliver(self, topics, message):
+        """
+        Remet un message aux abonnés locaux de ses sujets.
+
+        Un abonné qui suit plusieurs des sujets ne le reçoit qu'une fois.
+
+        Args:
+            topics: Les sujets du message
+            message: Le message
+        """
+        with self._lock:
+            recipients = set()
+            for topic in topics:
+                recipients.update(self._subscribers.get(topic, ()))
+            self._stats["published"] += 1
+            self._stats["delivered"] += len(recipients)
+        for subscription in recipients:
+            subscription.put(message)
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+            self._stats["subscriptions"] += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            self._stats["subscriptions"] -= 1
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """
+        Renvoie les compteurs du courtier pour ce processus.
+
+        Returns:
+            dict: Abonnements ouverts, sujets suivis, messages publiés,
+                remis et perdus
+        """
+        with self._lock:
+            return {"topics": len(self._subscribers), **self._stats}
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Renvoie le courtier du processus (créé au premier appel).
+
+    Returns:
+        Broker: Une instance de la classe LISTINGS_PUBSUB_BACKEND
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(BACKEND)()
+    return _broker
+
+
+def post_topics(post):
+    """
+    Renvoie les sujets sur lesquels une publication est publiée.
+
+    Args:
+        post: Le ticket ou la critique créé
+
+    Returns:
+        list: `user:<auteur>`, et `owner:<propriétaire du ticket>` pour une
+            critique
+    """
+    topics = [f"user:{post.user_id}"]
+    if isinstance(post, Review):
+        topics.append(f"owner:{post.ticket.user_id}")
+    return topics
+
+
+def post_message(post):
+    """
+    Construit le message publié pour une nouvelle publication.
+
+    Args:
+        post: Le ticket ou la critique créé
+
+    Returns:
+        dict: Type, identifiant, auteur, date et curseur de la publication
+    """
+    post_type = (
+        TimelineEntry.REVIEW if isinstance(post, Review) else TimelineEntry.TICKET
+    )
+    return {
+        "type": post_type,
+        "id": post.id,
+        "author_id": post.user_id,
+        "author": post.user.username,
+        "time_created": post.time_created.isoformat(),
+        "cursor": feeds.encode_cursor((post.time_created, post_type, post.id)),
+    }
+
+
+def publish_post(post):
+    """
+    Publie une nouvelle publication après la validation de la transaction.
+
+    Args:
+        post: Le ticket ou la critique créé
+    """
+    topics, message = post_topics(post), post_message(post)
+    transaction.on_commit(lambda: get_broker().publish(topics, message))
@@ -0,0 +1,79 @@
+"""
+Vérification des plans d'exécution des requêtes fréquentes de LITRevu.
+
+Ce fichier construit, à l'aide des mêmes fonctions que les vues, les requêtes
+exécutées à chaque affichage du flux, des posts ou des abonnements, puis les
+soumet à EXPLAIN QUERY PLAN (SQLite) :
+- hot_querysets : catalogue des requêtes à vérifier
+- full_table_scans : tables lues intégralement dans un plan d'exécution
+
+Il est utilisé par la commande check_query_plans.
+"""
+
+import re
+
+from . import feeds, relations, timeline, usersearch
+
+# Une ligne « SCAN table » sans « USING ... » est un parcours complet de table.
+# Les parcours de sous-requêtes, CTE et lignes constantes sont ignorés.
+FULL_SCAN = re.compile(r"\bSCAN (?P<table>[A-Za-z_][\w]*)(?P<rest>.*)$")
+IGNORED_TABLES = {"CONSTANT"}
+
+
+def hot_querysets(user, other, cursor):
+    """
+    Construit le catalogue des requêtes fréquentes pour un utilisateur donné.
+
+    Args:
+        user: L'utilisateur connecté
+        other: Un autre utilisateur (auteur suivi, bloqué, etc.)
+        cursor: Un curseur décodé de pagination
+
+    Returns:
+        dict: {nom de la requête: QuerySet}
+    """
+    tickets, reviews = feeds.feed_querysets(user)
+    own_tickets, own_reviews = feeds.posts_querysets(user)
+    catalog = {
+        "feed : première page du flux": feeds.timeline_keys(user),
+        "feed : page suivante du flux": feeds.timeline_keys(user, cursor),
+        "feed_updates : nouvelles publications": feeds.timeline_newer(user, cursor),
+        "posts : première page": feeds.keys_queryset(own_tickets, own_reviews),
+        "posts : page suivante": feeds.keys_queryset(own_tickets, own_reviews, cursor),
+        "rebuild_timeline : tickets du flux calculé": tickets,
+        "rebuild_timeline : critiques du flux calculé": reviews,
+        "rebuild_timeline : page du flux calculé": feeds.keys_queryset(
+            tickets, reviews, cursor
+        ),
+        "timeline : abonnés d'un auteur": timeline.follower_ids(other.id),
+        "timeline : purge après désabonnement": timeline.purge_queryset(user, other),
+        "user_search : noms par préfixe": usersearch.prefix_queryset("query-plan"),
+    }
+    for relation in relations.RELATIONS:
+        catalog[f"relations : {relation}"] = relations.relation_queryset(
+            relation, user.id
+        )
+    for name, queryset in relations.follow_lists(user).items():
+        catalog[f"follow_users : {name}"] = queryset
+    return catalog
+
+
+def full_table_scans(queryset):
+    """
+    Liste les tables parcourues intégralement par une requête.
+
+    Args:
+        queryset: La requête à analyser
+
+    Returns:
+        tuple: (tables parcourues intégralement, plan d'exécution brut)
+    """
+    plan = queryset.explain()
+    tables = []
+    for line in plan.splitlines():
+        match = FULL_SCAN.search(line)
+        if not match or match["table"] in IGNORED_TABLES:
+            continue
+        if "USING" not in match["rest"]:
+            tables.append(match["table"])
+    return tables, plan
@@ -0,0 +1,148 @@
+"""
+Statistiques des critiques d'un ticket, dénormalisées dans Ticket.
+
+Le nombre de critiques, la somme des notes et la date de la dernière
+critique sont stockés dans le ticket : les cartes les affichent sans
+agrégation sur Review. Chaque mise à jour est une seule requête UPDATE avec
+des expressions F(), sans lecture préalable du ticket, ce qui la rend sûre
+face aux écritures concurrentes :
+- review_added / review_changed / review_removed : appelés par les signaux
+- drift : tickets dont les statistiques ne correspondent plus aux critiques
+- repair : recalcule les statistiques de tickets donnés
+
+Chaque mise à jour change aussi `time_edited`, qui sert de clé aux cartes
+mises en cache.
+"""
+
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Review, Ticket
+
+
+def _latest_review():
+    """Sous-requête de la date de la critique la plus récente d'un ticket"""
+    return Subquery(
+        Review.objects.filter(ticket=OuterRef("pk"))
+        .order_by("-time_created")
+        .values("time_created")[:1]
+    )
+
+
+def review_added(review):
+    """
+    Ajoute une nouvelle critique aux statistiques de son ticket.
+
+    Args:
+        review: La critique créée
+    """
+    Ticket.objects.filter(pk=review.ticket_id).update(
+        review_count=F("review_count") + 1,
+        rating_sum=F("rating_sum") + review.rating,
+        last_review_at=review.time_created,
+        time_edited=timezone.now(),
+    )
+
+
+def review_changed(review, previous_rating, previous_ticket_id):
+    """
+    Reporte la modification d'une critique sur les statistiques.
+
+    Args:
+        review: La critique modifiée
+        previous_rating: La note avant la modification
+        previous_ticket_id: Le ticket avant la modification
+    """
+    if previous_ticket_id != review.ticket_id:
+        _remove(previous_ticket_id, previous_rating)
+        Ticket.objects.filter(pk=review.ticket_id).update(
+            review_count=F("review_count") + 1,
+            rating_sum=F("rating_sum") + review.rating,
+            last_review_at=_latest_review(),
+            time_edited=timezone.now(),
+        )
+    elif previous_rating != review.rating:
+        Ticket.objects.filter(pk=review.ticket_id).update(
+            rating_sum=F("rating_sum") + (review.rating - previous_rating),
+            time_edited=timezone.now(),
+        )
+
+
+def review_removed(review):
+    """
+    Retire une critique supprimée des statistiques de son ticket.
+
+    Args:
+        review: La critique supprimée
+    """
+    _remove(review.ticket_id, review.rating)
+
+
+def _remove(ticket_id, rating):
+    """Retire une critique des statistiques d'un ticket"""
+    Ticket.objects.filter(pk=ticket_id).update(
+        review_count=F("review_count") - 1,
+        rating_sum=F("rating_sum") - rating,
+        last_review_at=_latest_review(),
+        time_edited=timezone.now(),
+    )
+
+
+def _actual():
+    """Tickets annotés des statistiques recalculées à partir des critiques"""
+    return Ticket.objects.annotate(
+        actual_count=Count("review"),
+        actual_sum=Coalesce(Sum("review__rating"), Value(0)),
+        actual_last=Max("review__time_created"),
+    )
+
+
+def drift():
+    """
+    Recherche les tickets dont les statistiques stockées sont incorrectes.
+
+    Yields:
+        tuple: (id du ticket, statistiques stockées, statistiques réelles),
+            chaque statistique étant (nombre, somme des notes, dernière date)
+    """
+    rows = (
+        _actual()
+        .order_by("pk")
+        .values_list(
+            "pk",
+            "review_count",
+            "rating_sum",
+            "last_review_at",
+            "actual_count",
+            "actual_sum",
+            "actual_last",
+        )
+    )
+    for pk, *values in rows.iterator():
+        stored, actual = tuple(values[:3]), tuple(values[3:])
+        if stored != actual:
+            yield pk, stored, actual
+
+
+def repair(ticket_ids):
+    """
+    Recalcule les statistiques de tickets à partir de leurs critiques.
+
+    Args:
+        ticket_ids: Les identifiants des tickets à corriger
+
+    Returns:
+        int: Le nombre de tickets mis à jour
+    """
+    reviews = Review.objects.filter(ticket=OuterRef("pk")).order_by().values("ticket")
+    return Ticket.objects.filter(pk__in=ticket_ids).update(
+        review_count=Coalesce(
+            Subquery(reviews.annotate(total=Count("pk")).values("total")), Value(0)
+        ),
+        rating_sum=Coalesce(
+            Subquery(reviews.annotate(total=Sum("rating")).values("total")), Value(0)
+        ),
+        last_review_at=_latest_review(),
+        time_edited=timezone.now(),
+    )
@@ -0,0 +1,201 @@
+"""
+Projections légères des publications affichées dans les listes.
+
+Le flux, les posts et la recherche n'affichent qu'une partie des colonnes des
+tickets, des critiques et de leurs auteurs. Plutôt que des instances de
+modèles (état de l'ORM, toutes les colonnes dont le mot de passe des auteurs),
+ces pages chargent les seules colonnes affichées par values_list() dans des
+objets à __slots__, que les cartes affichent directement :
+- AuthorRecord : identifiant et nom de l'auteur, partagé par ses publications
+- TicketRecord : ticket affiché, avec les propriétés d'affichage de Ticket
+  (models.TicketDisplayMixin : image_url, srcset, note moyenne)
+- ReviewRecord : critique affichée et ticket auquel elle répond
+- ticket_records / review_records : requêtes des colonnes affichées
+- build_tickets / build_reviews : construction des objets d'une page
+"""
+
+from .models import TicketDisplayMixin
+
+# Colonnes chargées pour un ticket (les préfixes sont ajoutés pour le ticket
+# d'une critique)
+TICKET_FIELDS = (
+    "id",
+    "user_id",
+    "user__username",
+    "title",
+    "description",
+    "image",
+    "renditions",
+    "time_created",
+    "time_edited",
+    "review_count",
+    "rating_sum",
+    "last_review_at",
+)
+
+# Colonnes propres à une critique
+REVIEW_FIELDS = (
+    "id",
+    "user_id",
+    "user__username",
+    "headline",
+    "rating",
+    "body",
+    "time_created",
+    "time_edited",
+)
+
+
+class AuthorRecord:
+    """Auteur d'une publication : seuls l'identifiant et le nom sont affichés"""
+
+    __slots__ = ("id", "username")
+
+    def __init__(self, user_id, username):
+        self.id = user_id
+        self.username = username
+
+    def __str__(self):
+        return self.username
+
+
+class TicketRecord(TicketDisplayMixin):
+    """
+    Ticket affiché dans une liste.
+
+    Les attributs lus par les cartes portent les mêmes noms que ceux du modèle
+    Ticket, dont il partage les propriétés d'affichage (TicketDisplayMixin) ;
+    `image` est le nom du fichier dans le stockage.
+    """
+
+    __slots__ = (
+        "id",
+        "user_id",
+        "user",
+        "title",
+        "description",
+        "image",
+        "renditions",
+        "time_created",
+        "time_edited",
+        "review_count",
+        "rating_sum",
+        "last_review_at",
+        "content_type",
+    )
+
+    def __init__(self, row, authors):
+        (
+            self.id,
+            self.user_id,
+            username,
+            self.title,
+            self.description,
+            self.image,
+            self.renditions,
+            self.time_created,
+            self.time_edited,
+            self.review_count,
+            self.rating_sum,
+            self.last_review_at,
+        ) = row
+        self.user = _author(authors, self.user_id, username)
+        self.content_type = None
+
+
+class ReviewRecord:
+    """Critique affichée dans une liste, avec le ticket auquel elle répond"""
+
+    __slots__ = (
+        "id",
+        "user_id",
+        "user",
+        "headline",
+        "rating",
+        "body",
+        "time_created",
+        "time_edited",
+        "ticket_id",
+        "ticket",
+        "content_type",
+    )
+
+    def __init__(self, row, authors):
+        (
+            self.id,
+            self.user_id,
+            username,
+            self.headline,
+            self.rating,
+            self.body,
+            self.time_created,
+            self.time_edited,
+        ) = row[: len(REVIEW_FIELDS)]
+        self.user = _author(authors, self.user_id, username)
+        self.ticket = TicketRecord(row[len(REVIEW_FIELDS) :], authors)
+        self.ticket_id = self.ticket.id
+        self.content_type = None
+
+
+def _author(authors, user_id, username):
+    """Renvoie l'auteur d'une page, créé à sa première publication"""
+    author = authors.get(user_id)
+    if author is None:
+        author = authors[user_id] = AuthorRecord(user_id, username)
+    return author
+
+
+def ticket_records(tickets):
+    """
+    Restreint une requête de tickets aux colonnes affichées.
+
+    Args:
+        tickets: La requête des tickets
+
+    Returns:
+        QuerySet: Les lignes (TICKET_FIELDS) des tickets
+    """
+    return tickets.values_list(*TICKET_FIELDS)
+
+
+def review_records(reviews):
+    """
+    Restreint une requête de critiques aux colonnes affichées, ticket compris.
+
+    Args:
+        reviews: La requête des critiques
+
+    Returns:
+        QuerySet: Les lignes (REVIEW_FIELDS puis TICKET_FIELDS du ticket)
+    """
+    return reviews.values_list(
+        *REVIEW_FIELDS, *(f"ticket__{field}" for field in TICKET_FIELDS)
+    )
+
+
+def build_tickets(rows, authors):
+    """
+    Construit les tickets d'une page à partir de leurs lignes.
+
+    Args:
+        rows: Les lignes lues par ticket_records
+        authors: Les auteurs déjà rencontrés sur la page {id: AuthorRecord}
+
+    Returns:
+        dict: {id: TicketRecord}
+    """
+    return {row[0]: TicketRecord(row, authors) for row in rows}
+
+
+def build_reviews(rows, authors):
+    """
+    Construit les critiques d'une page à partir de leurs lignes.
+
+    Args:
+        rows: Les lignes lues par review_records
+        authors: Les auteurs déjà rencontrés sur la page {id: AuthorRecord}
+
+    Returns:
+        dict: {id: ReviewRecord}
+    """
+    return {row[0]: ReviewRecord(row, authors) for row in rows}
@@ -0,0 +1,218 @@
+"""
+Cache des relations entre utilisateurs de l'application LITRevu.
+
+Les abonnements et blocages d'un utilisateur sont lus à chaque affichage du
+flux ou de la page des abonnements. Ce fichier les sert sous forme
+d'ensembles d'identifiants stockés dans le cache à deux niveaux (caching.py),
+sous une clé propre à chaque utilisateur : un abonnement ou un blocage
+modifié ne retire du cache que les ensembles des deux utilisateurs concernés
+(invalidate). Les autres processus gardent leur copie locale au plus
+LISTINGS_RELATIONS_LOCAL_TIMEOUT secondes.
+- following_ids : utilisateurs suivis
+- blocked_ids : utilisateurs bloqués
+- blocked_by_ids : utilisateurs qui bloquent l'utilisateur
+- excluded_ids / is_blocked_between : raccourcis pour les blocages
+- afollowing_ids / aexcluded_ids : versions asynchrones (vues async)
+- follow_lists : listes affichées sur la page des abonnements
+- invalidate : appelé par les signaux de UserFollows et UserBlocks
+- forget : retire du cache les ensembles d'un utilisateur
+- stats : compteurs de succès et d'échecs du cache
+"""
+
+import asyncio
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import TieredCache
+from .models import UserBlocks, UserFollows
+
+# Durée de vie d'un ensemble en cache (en secondes)
+TIMEOUT = getattr(settings, "LISTINGS_RELATIONS_CACHE_TIMEOUT", 300)
+
+# Durée de vie d'un ensemble dans le cache du processus (en secondes) : délai
+# pendant lequel un autre processus peut lire un ensemble invalidé
+LOCAL_TIMEOUT = getattr(settings, "LISTINGS_RELATIONS_LOCAL_TIMEOUT", 1)
+
+# Pour chaque ensemble : (modèle, champ propriétaire, champ lu)
+RELATIONS = {
+    "following": (UserFollows, "user_id", "followed_user_id"),
+    "blocking": (UserBlocks, "user_id", "blocked_user_id"),
+    "blocked_by": (UserBlocks, "blocked_user_id", "user_id"),
+}
+
+# Un cache par ensemble, dont les clés sont les identifiants des utilisateurs
+_caches = {
+    relation: TieredCache(
+        f"relations:{relation}", timeout=TIMEOUT, local_timeout=LOCAL_TIMEOUT
+    )
+    for relation in RELATIONS
+}
+
+
+def _get(relation, user_id):
+    """
+    Renvoie un ensemble de relations depuis le cache ou la base de données.
+
+    Args:
+        relation: Le nom de l'ensemble (voir RELATIONS)
+        user_id: L'identifiant de l'utilisateur
+
+    Returns:
+        frozenset: Les identifiants des utilisateurs liés
+    """
+    return _caches[relation].get_or_set(
+        user_id, lambda: frozenset(relation_queryset(relation, user_id))
+    )
+
+
+async def _aget(relation, user_id):
+    """Version asynchrone de _get, pour les vues async"""
+
+    async def load():
+        return frozenset([pk async for pk in relation_queryset(relation, user_id)])
+
+    return await _caches[relation].aget_or_set(user_id, load)
+
+
+def relation_queryset(relation, user_id):
+    """
+    Construit la requête qui lit un ensemble de relations en base.
+
+    Args:
+        relation: Le nom de l'ensemble (voir RELATIONS)
+        user_id: L'identifiant de l'utilisateur
+
+    Returns:
+        QuerySet: Les identifiants des utilisateurs liés
+    """
+    model, owner_field, target_field = RELATIONS[relation]
+    return model.objects.filter(**{owner_field: user_id}).values_list(
+        target_field, flat=True
+    )
+
+
+def following_ids(user_id):
+    """Renvoie les identifiants des utilisateurs suivis"""
+    return _get("following", user_id)
+
+
+def blocked_ids(user_id):
+    """Renvoie les identifiants des utilisateurs bloqués"""
+    return _get("blocking", user_id)
+
+
+def blocked_by_ids(user_id):
+    """Renvoie les identifiants des utilisateurs qui bloquent l'utilisateur"""
+    return _get("blocked_by", user_id)
+
+
+def excluded_ids(user_id):
+    """Renvoie les identifiants des utilisateurs liés par un blocage"""
+    return blocked_ids(user_id) | blocked_by_ids(user_id)
+
+
+async def afollowing_ids(user_id):
+    """Version asynchrone de following_ids"""
+    return await _aget("following", user_id)
+
+
+async def aexcluded_ids(user_id):
+    """Version asynchrone de excluded_ids (ensembles lus simultanément)"""
+    blocking, blocked_by = await asyncio.gather(
+        _aget("blocking", user_id), _aget("blocked_by", user_id)
+    )
+    return blocking | blocked_by
+
+
+def is_blocked_between(user_id, other_id):
+    """Indique si l'un des deux utilisateurs a bloqué l'autre"""
+    return other_id in excluded_ids(user_id)
+
+
+def follow_lists(user):
+    """
+    Construit les listes affichées sur la page des abonnements.
+
+    Args:
+        user: L'utilisateur connecté
+
+    Returns:
+        dict: Les requêtes des abonnements, abonnés et utilisateurs bloqués
+    """
+    return {
+        "following": UserFollows.objects.select_related("followed_user").filter(
+            user=user
+        ),
+        "followers": UserFollows.objects.select_related("user").filter(
+            followed_user=user
+        ),
+        "blocked": UserBlocks.objects.select_related("blocked_user").filter(user=user),
+    }
+
+
+def _delete(entries):
+    """
+    Retire des ensembles du cache immédiatement, pour que la requête en cours
+    les relise, puis de nouveau après la validation de la transaction, pour
+    qu'une requête concurrente ne remette pas en cache l'ancien état.
+
+    Args:
+        entries: Les couples (ensemble, identifiant de l'utilisateur)
+    """
+    entries = list(entries)
+
+    def delete():
+        for relation, user_id in entries:
+            _caches[relation].delete(user_id)
+
+    delete()
+    transaction.on_commit(delete)
+
+
+def invalidate(instance):
+    """
+    Invalide les ensembles touchés par un abonnement ou un blocage modifié.
+
+    Args:
+        instance: L'objet UserFollows ou UserBlocks créé ou supprimé
+    """
+    if isinstance(instance, UserFollows):
+        _delete([("following", instance.user_id)])
+    else:
+        _delete(
+            [("blocking", instance.user_id), ("blocked_by", instance.blocked_user_id)]
+        )
+
+
+def forget(user_id):
+    """
+    Retire du cache tous les ensembles d'un utilisateur.
+
+    Args:
+        user_id: L'identifiant de l'utilisateur
+    """
+    _delete((relation, user_id) for relation in RELATIONS)
+
+
+def stats():
+    """
+    Renvoie les compteurs du cache des relations pour ce processus.
+
+    Une lecture servie par l'un des deux niveaux est un succès ; un échec est
+    une lecture en base.
+
+    Returns:
+        dict: Nombre de succès, d'échecs et taux de succès
+    """
+    hits = misses = 0
+    for tiered in _caches.values():
+        counters = tiered.stats()
+        hits += counters["local"]["hits"] + counters["shared"]["hits"]
+        misses += counters["shared"]["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else 0.0,
+    }
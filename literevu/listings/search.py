@@ -0,0 +1,228 @@
+"""
+Recherche plein texte dans les tickets et critiques de LITRevu (SQLite FTS5).
+
+Les textes des publications sont recopiés dans la table virtuelle FTS5
+`listings_search`, tenue à jour par les signaux de Ticket et Review. Ce
+fichier contient :
+- create_index : création de la table virtuelle (après les migrations)
+- index_post / remove_post : mise à jour d'une publication
+- remove_posts : retrait d'un lot de publications supprimées sans signaux
+- rebuild : reconstruction complète à partir des tables
+- match_expression : traduction d'une saisie en expression MATCH
+- search : page de résultats classés par pertinence (bm25)
+- matching_ids : sous-requête des publications trouvées (administration)
+
+Chaque ligne a pour rowid `2 * id` pour un ticket et `2 * id + 1` pour une
+critique : une publication est remplacée ou supprimée par sa clé, sans
+parcours de la table.
+"""
+
+import re
+from itertools import islice
+
+from django.db import connection, connections, transaction
+from django.db.models.expressions import RawSQL
+
+from . import feeds, relations
+from .models import Review, Ticket
+
+TABLE = "listings_search"
+
+# Poids des colonnes pour bm25 : user_id (non indexée), title, body
+WEIGHTS = (0.0, 10.0, 1.0)
+
+# Taille des lots d'insertion lors d'une reconstruction
+BATCH_SIZE = 1000
+
+_TERM = re.compile(r"\w+")
+
+_INSERT = f"INSERT INTO {TABLE} (rowid, user_id, title, body) VALUES (%s, %s, %s, %s)"
+
+
+def create_index(using="default"):
+    """
+    Crée la table virtuelle FTS5 si elle n'existe pas encore.
+
+    Args:
+        using: L'alias de la base de données
+    """
+    if connections[using].vendor != "sqlite":
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "user_id UNINDEXED, title, body, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def _rowid(post_type, post_id):
+    """Calcule le rowid d'une publication dans la table de recherche"""
+    return 2 * post_id + (post_type == feeds.REVIEW)
+
+
+def _key(rowid):
+    """Renvoie le couple (type, id) correspondant à un rowid"""
+    return (feeds.REVIEW if rowid % 2 else feeds.TICKET), rowid // 2
+
+
+def _row(post_type, post):
+    """Construit la ligne de recherche d'un ticket ou d'une critique"""
+    if post_type == feeds.REVIEW:
+        title, body = post.headline, post.body
+    else:
+        title, body = post.title, post.description
+    return (_rowid(post_type, post.id), post.user_id, title, body or "")
+
+
+def _post_type(post):
+    """Renvoie le type de publication d'un ticket ou d'une critique"""
+    return feeds.REVIEW if isinstance(post, Review) else feeds.TICKET
+
+
+def index_post(post):
+    """
+    Ajoute ou remplace une publication dans l'index de recherche.
+
+    Args:
+        post: Le ticket ou la critique enregistré
+    """
+    if connection.vendor != "sqlite":
+        return
+    row = _row(_post_type(post), post)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [row[0]])
+        cursor.execute(_INSERT, row)
+
+
+def remove_post(post):
+    """
+    Retire une publication supprimée de l'index de recherche.
+
+    Args:
+        post: Le ticket ou la critique supprimé
+    """
+    remove_posts(_post_type(post), [post.id])
+
+
+def remove_posts(post_type, post_ids):
+    """
+    Retire un lot de publications d'un même type de l'index de recherche.
+
+    Args:
+        post_type: Le type des publications (feeds.TICKET ou feeds.REVIEW)
+        post_ids: Les identifiants des publications supprimées
+    """
+    if connection.vendor != "sqlite" or not post_ids:
+        return
+    rowids = [_rowid(post_type, post_id) for post_id in post_ids]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rowids))})",
+            rowids,
+        )
+
+
+def rebuild():
+    """
+    Reconstruit entièrement l'index à partir des tickets et critiques.
+
+    Returns:
+        int: Le nombre de publications indexées
+    """
+    create_index()
+    querysets = (
+        (
+            feeds.TICKET,
+            Ticket.objects.values_list("id", "user_id", "title", "description"),
+        ),
+        (feeds.REVIEW, Review.objects.values_list("id", "user_id", "headline", "body")),
+    )
+    rows = (
+        (_rowid(post_type, pk), user_id, title, body or "")
+        for post_type, queryset in querysets
+        for pk, user_id, title, body in queryset.iterator()
+    )
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        while batch := list(islice(rows, BATCH_SIZE)):
+            cursor.executemany(_INSERT, batch)
+            total += len(batch)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def match_expression(text):
+    """
+    Traduit une saisie libre en expression MATCH FTS5.
+
+    Chaque mot est placé entre guillemets (la syntaxe FTS5 de la saisie est
+    ignorée) ; tous les mots doivent être présents.
+
+    Args:
+        text: La saisie de l'utilisateur
+
+    Returns:
+        str: L'expression MATCH, ou une chaîne vide si la saisie ne contient
+            aucun mot
+    """
+    return " ".join(f'"{term}"' for term in _TERM.findall(text))
+
+
+def search(user, text, page=1, page_size=feeds.PAGE_SIZE):
+    """
+    Recherche des publications, classées par pertinence.
+
+    Les publications des utilisateurs bloqués ou qui bloquent l'utilisateur
+    sont exclues, comme dans le flux.
+
+    Args:
+        user: L'utilisateur qui recherche
+        text: La saisie de l'utilisateur
+        page: Le numéro de page (à partir de 1)
+        page_size: Le nombre de résultats par page
+
+    Returns:
+        tuple: (publications de la page, True s'il existe une page suivante)
+    """
+    expression = match_expression(text)
+    if not expression:
+        return [], False
+
+    excluded = sorted(relations.excluded_ids(user.id))
+    exclusion = ""
+    if excluded:
+        exclusion = f"AND user_id NOT IN ({', '.join(['%s'] * len(excluded))})"
+    weights = ", ".join(str(weight) for weight in WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s {exclusion} "
+            f"ORDER BY bm25({TABLE}, {weights}) LIMIT %s OFFSET %s",
+            [expression, *excluded, page_size + 1, (page - 1) * page_size],
+        )
+        rowids = [rowid for (rowid,) in cursor.fetchall()]
+
+    keys = [(None, *_key(rowid)) for rowid in rowids[:page_size]]
+    return feeds.hydrate(keys), len(rowids) > page_size
+
+
+def matching_ids(model, text):
+    """
+    Construit la sous-requête des identifiants trouvés pour un modèle.
+
+    Utilisée par l'administration à la place d'un LIKE '%...%' sur les
+    colonnes de texte.
+
+    Args:
+        model: Ticket ou Review
+        text: La saisie de l'utilisateur
+
+    Returns:
+        RawSQL: Sous-requête utilisable dans un filtre `id__in`
+    """
+    parity = 1 if model is Review else 0
+    return RawSQL(
+        f"SELECT rowid / 2 FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% 2 = %s",
+        [match_expression(text), parity],
+    )
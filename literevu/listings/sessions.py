@@ -0,0 +1,68 @@
+"""
+Sessions servies par un cache en mémoire du processus, devant le cache
+partagé et la base de données.
+
+Chaque requête authentifiée lit sa session (table django_session) puis son
+utilisateur (table auth_user) avant même le début de la vue. Ce fichier et
+backends.py servent ces deux lectures sans requête SQL sur une requête
+« chaude » : SessionStore est un moteur de session (SESSION_ENGINE) qui lit
+dans un cache à deux niveaux (caching.TieredCache : cache du processus, puis
+cache SESSION_CACHE_ALIAS), puis dans la base de données, comme cached_db.
+
+Les écritures de session sont regroupées : une session marquée modifiée dont
+le contenu n'a pas changé (valeur réaffectée à l'identique, message ajouté
+puis lu dans la même requête...) n'est pas réécrite.
+
+Le cache du processus ne voit pas les suppressions faites par un autre
+processus : sa durée de vie (LISTINGS_SESSION_LOCAL_TIMEOUT) borne le délai
+pendant lequel une session fermée ailleurs y reste lisible.
+"""
+
+import pickle
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+from .caching import TieredCache
+
+# Nombre de sessions gardées dans le cache du processus
+LOCAL_SIZE = getattr(settings, "LISTINGS_SESSION_LOCAL_SIZE", 10000)
+
+# Durée de vie d'une session dans le cache du processus (en secondes)
+LOCAL_TIMEOUT = getattr(settings, "LISTINGS_SESSION_LOCAL_TIMEOUT", 5)
+
+_sessions = TieredCache(
+    "sessions",
+    local_size=LOCAL_SIZE,
+    local_timeout=LOCAL_TIMEOUT,
+    alias=settings.SESSION_CACHE_ALIAS,
+)
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    Moteur de session : cache du processus, puis cache partagé
+    (SESSION_CACHE_ALIAS), puis table django_session.
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = _sessions
+
+    def load(self):
+        data = super().load()
+        # Contenu tel que lu, pour ne pas réécrire une session inchangée
+        self._loaded = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and self.session_key is not None
+            and getattr(self, "_loaded", None) is not None
+            and not settings.SESSION_SAVE_EVERY_REQUEST
+            and pickle.dumps(self._session, pickle.HIGHEST_PROTOCOL) == self._loaded
+        ):
+            return
+        super().save(must_create)
+        self._loaded = pickle.dumps(self._session, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,183 @@
+"""
+Récepteurs de signaux de l'application LITRevu.
+
+Ce fichier maintient les données dérivées des publications :
+- le flux matérialisé (TimelineEntry) à la création et à la suppression
+  des tickets et des critiques (diffusion en arrière-plan, voir tasks.py)
+- le cache des relations (relations.py) des deux utilisateurs concernés par
+  un abonnement ou un blocage modifié
+- les jetons des versions des flux et des posts (versions.py) des auteurs
+  concernés par la création, la modification ou la suppression d'une
+  publication
+- l'index de recherche plein texte (search.py) des tickets et critiques
+- les statistiques des critiques de chaque ticket (ratings.py)
+- la publication des nouveaux tickets et critiques pour le flux en direct
+  (pubsub.py)
+- les références des tickets aux fichiers d'images partagés (blobs.py)
+- le cache des utilisateurs (backends.py) à chaque modification d'un
+  utilisateur (mot de passe, activation...) et à la déconnexion
+
+Les récepteurs sont connectés au démarrage par ListingsConfig.ready().
+"""
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    backends,
+    blobs,
+    jobs,
+    pubsub,
+    ratings,
+    relations,
+    search,
+    timeline,
+    versions,
+)
+from .models import Review, Ticket, TimelineEntry, UserBlocks, UserFollows
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    """
+    Ajoute une nouvelle publication au flux de ses destinataires.
+
+    L'auteur la voit immédiatement dans son propre flux ; la diffusion aux
+    autres destinataires est confiée à une tâche d'arrière-plan.
+    """
+    if created and not raw:
+        timeline.fan_out(instance, user_ids={instance.user_id})
+        jobs.enqueue(
+            "timeline.fan_out",
+            post_type=(
+                TimelineEntry.REVIEW if sender is Review else TimelineEntry.TICKET
+            ),
+            post_id=instance.id,
+        )
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+def publish_post(sender, instance, created, raw=False, **kwargs):
+    """Signale une nouvelle publication aux flux en direct ouverts"""
+    if created and not raw:
+        pubsub.publish_post(instance)
+
+
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Review)
+def remove_post(sender, instance, **kwargs):
+    """Retire une publication supprimée de tous les flux"""
+    timeline.remove(instance)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Review)
+def bump_post_versions(sender, instance, raw=False, **kwargs):
+    """Change la version des flux et des posts qui affichent la publication"""
+    if not raw:
+        versions.bump_post(instance)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Review)
+def index_post(sender, instance, **kwargs):
+    """Met à jour une publication dans l'index de recherche"""
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Ticket)
+@receiver(post_delete, sender=Review)
+def unindex_post(sender, instance, **kwargs):
+    """Retire une publication supprimée de l'index de recherche"""
+    search.remove_post(instance)
+
+
+@receiver(pre_save, sender=Review)
+def remember_rating(sender, instance, raw=False, **kwargs):
+    """Mémorise la note et le ticket d'une critique avant sa modification"""
+    if instance.pk is None or instance._state.adding or raw:
+        return
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk).values_list("rating", "ticket_id").first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_ratings(sender, instance, created, raw=False, **kwargs):
+    """Reporte une critique créée ou modifiée sur les statistiques du ticket"""
+    if raw:
+        return
+    if created:
+        ratings.review_added(instance)
+    elif getattr(instance, "_previous_rating", None):
+        ratings.review_changed(instance, *instance._previous_rating)
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating(sender, instance, **kwargs):
+    """Retire une critique supprimée des statistiques de son ticket"""
+    ratings.review_removed(instance)
+
+
+@receiver(pre_save, sender=Ticket)
+def remember_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mémorise les fichiers d'images d'un ticket avant sa modification"""
+    if instance.pk is None or instance._state.adding or raw:
+        return
+    if update_fields is not None and not {"image", "renditions"} & set(update_fields):
+        return
+    previous = (
+        Ticket.objects.filter(pk=instance.pk).values_list("image", "renditions").first()
+    )
+    instance._previous_files = blobs.ticket_files(*previous) if previous else set()
+
+
+@receiver(post_save, sender=Ticket)
+def update_files(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Reporte un changement d'image ou de déclinaisons sur les références"""
+    if raw:
+        return
+    if update_fields is not None and not {"image", "renditions"} & set(update_fields):
+        return
+    previous = set() if created else getattr(instance, "_previous_files", None)
+    if previous is None:
+        return
+    current = blobs.ticket_files(instance.image, instance.renditions)
+    blobs.acquire(current - previous)
+    blobs.release(previous - current)
+    instance._previous_files = current
+
+
+@receiver(post_delete, sender=Ticket)
+def release_files(sender, instance, **kwargs):
+    """Retire les références d'un ticket supprimé à ses fichiers d'images"""
+    blobs.release(blobs.ticket_files(instance.image, instance.renditions))
+
+
+@receiver(post_save, sender=UserFollows)
+@receiver(post_delete, sender=UserFollows)
+@receiver(post_save, sender=UserBlocks)
+@receiver(post_delete, sender=UserBlocks)
+def invalidate_relations(sender, instance, **kwargs):
+    """Retire du cache les relations des utilisateurs concernés"""
+    relations.invalidate(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user(sender, instance, **kwargs):
+    """Retire un utilisateur modifié ou supprimé du cache des utilisateurs"""
+    backends.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_user(sender, request, user, **kwargs):
+    """Retire l'utilisateur qui se déconnecte du cache des utilisateurs"""
+    if user is not None:
+        backends.invalidate_user(user.pk)
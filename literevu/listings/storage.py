@@ -0,0 +1,113 @@
+"""
+Stockage des images par adresse de contenu.
+
+Un fichier enregistré est nommé d'après l'empreinte SHA-256 de son contenu,
+calculée pendant sa copie, dans une arborescence répartie sur deux niveaux
+de sous-répertoires (`tickets/3f/a2/3fa2…c9.jpg`) : un même fichier envoyé
+plusieurs fois n'est écrit qu'une fois, et aucun répertoire ne contient plus
+qu'une petite fraction des fichiers. Le nombre de tickets qui désignent
+chaque fichier est tenu par blobs.py. Ce fichier contient :
+- ContentAddressedStorage : stockage des fichiers par empreinte
+- image_storage : stockage du champ Ticket.image
+- is_content_addressed : indique si un nom suit ce schéma
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Nom d'un fichier stocké par empreinte : <répertoire>/<ab>/<cd>/<empreinte><ext>
+CONTENT_ADDRESSED_NAME = re.compile(
+    r"(^|/)(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?P=a)(?P=b)[0-9a-f]{60}(\.\w+)?$"
+)
+
+# Extensions équivalentes ramenées à une seule, pour que le même contenu
+# produise le même nom
+EXTENSIONS = {".jpeg": ".jpg", ".jpe": ".jpg", ".tiff": ".tif"}
+
+
+def is_content_addressed(name):
+    """Indique si un nom de fichier désigne un fichier stocké par empreinte"""
+    return bool(CONTENT_ADDRESSED_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stockage local qui nomme chaque fichier d'après son contenu.
+
+    Le répertoire du nom demandé (par exemple `upload_to`) est conservé ;
+    seul le nom du fichier est remplacé par son empreinte. Le contenu est lu
+    par morceaux (jamais entièrement en mémoire) et copié dans un fichier
+    temporaire du même système de fichiers, puis renommé de façon atomique :
+    deux envois simultanés du même fichier donnent le même fichier final.
+    Un fichier déjà présent n'est pas réécrit ; il est d'abord réservé
+    (blobs.reserve) pour qu'une suppression simultanée de sa dernière
+    référence ne le retire pas avant l'enregistrement du ticket.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Le nom final dépend du contenu : un fichier existant portant ce nom
+        # a le même contenu et peut être réutilisé
+        return name
+
+    def _save(self, name, content):
+        # Import local : blobs.py dépend des modèles, qui utilisent ce stockage
+        from . import blobs
+
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        extension = EXTENSIONS.get(extension, extension)
+
+        tmp_dir = self.path(".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        tmp = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+        try:
+            with tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            final = posixpath.join(
+                directory, hexdigest[:2], hexdigest[2:4], f"{hexdigest}{extension}"
+            )
+            path = self.path(final)
+            # La réservation précède le test d'existence : un fichier supprimé
+            # par blobs.collect avant elle est réécrit, et aucun ne l'est après
+            # elle
+            blobs.reserve(final)
+            if not os.path.exists(path):
+                os.makedirs(
+                    os.path.dirname(path),
+                    self.directory_permissions_mode or 0o777,
+                    exist_ok=True,
+                )
+                os.replace(tmp.name, path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        finally:
+            # Fichier temporaire inutile (fichier final déjà présent) ou
+            # abandonné par une erreur de lecture, de réservation ou de
+            # renommage
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+        return final
+
+
+def image_storage():
+    """Stockage des images de couverture (champ Ticket.image)"""
+    return _image_storage
+
+
+_image_storage = ContentAddressedStorage()
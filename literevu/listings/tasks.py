@@ -0,0 +1,62 @@
+"""
+Tâches d'arrière-plan de l'application LITRevu.
+
+Ces fonctions sont enregistrées auprès de jobs.py et exécutées par la
+commande run_jobs. Elles ne reçoivent que des identifiants et relisent l'état
+courant de la base : une tâche exécutée en retard, ou plusieurs fois, reste
+correcte.
+- images.refresh : déclinaisons de l'image d'un ticket
+- timeline.fan_out : diffusion d'une publication dans les flux
+- timeline.backfill : rattrapage du flux après un abonnement
+- timeline.restore_unblocked : rattrapage du flux après un déblocage
+- deletions.run : suppression d'un ticket ou d'un compte par lots
+"""
+
+from django.contrib.auth.models import User
+
+from . import deletions, images, timeline
+from .jobs import task
+from .models import Review, Ticket, TimelineEntry, UserFollows
+
+
+@task("images.refresh")
+def refresh_renditions(ticket_id):
+    """Produit les déclinaisons de l'image actuelle d'un ticket"""
+    ticket = Ticket.objects.filter(pk=ticket_id).first()
+    if ticket is not None:
+        images.refresh_renditions(ticket)
+
+
+@task("timeline.fan_out")
+def fan_out(post_type, post_id):
+    """Diffuse une publication dans le flux de tous ses destinataires"""
+    model = Review if post_type == TimelineEntry.REVIEW else Ticket
+    post = model.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@task("timeline.backfill")
+def backfill(user_id, author_id):
+    """Recopie les publications d'un auteur si l'abonnement existe toujours"""
+    follow = (
+        UserFollows.objects.select_related("user", "followed_user")
+        .filter(user_id=user_id, followed_user_id=author_id)
+        .first()
+    )
+    if follow is not None:
+        timeline.backfill(follow.user, follow.followed_user)
+
+
+@task("timeline.restore_unblocked")
+def restore_unblocked(user_id, other_id):
+    """Rétablit les critiques croisées de deux utilisateurs débloqués"""
+    users = User.objects.in_bulk([user_id, other_id])
+    if len(users) == 2:
+        timeline.restore_unblocked(users[user_id], users[other_id])
+
+
+@task("deletions.run")
+def run_deletion(deletion_id):
+    """Supprime par lots les lignes d'un ticket ou d'un compte masqué"""
+    deletions.run(deletion_id)
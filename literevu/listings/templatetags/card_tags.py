@@ -0,0 +1,22 @@
+"""
+Filtres de template utilisés par les cartes de publications.
+"""
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def owned_by(post, user):
+    """
+    Indique si une publication appartient à l'utilisateur.
+
+    Args:
+        post: Le ticket ou la critique affiché
+        user: L'utilisateur connecté
+
+    Returns:
+        bool: True si l'utilisateur est l'auteur de la publication
+    """
+    return post.user_id == user.id
@@ -0,0 +1,743 @@
+"""
+Tests de l'application LITRevu.
+
+- ExportTests : export des posts en flux sous WSGI et sous ASGI
+- QueryPlanTests : requêtes fréquentes servies par des index (EXPLAIN)
+- DatabaseProfileTests : profil SQLite de production sous écritures
+  simultanées et répartition des lectures (ReadReplicaRouter)
+- AccountAdminTests : suppression des comptes depuis l'administration
+- StorageTests : fichiers temporaires du stockage par contenu
+- ProfilerTests : profil d'une vue async (flux) sous WSGI et sous ASGI
+- UploadTests : images refusées à la réception (format, dimensions, taille)
+- TimelineTests : flux matérialisé (diffusion, désabonnement, blocage,
+  rattrapage) comparé au flux calculé (rebuild_timeline --check)
+- DeletionTests : suppression d'un compte par lots, reprise et données
+  dérivées (statistiques, relations, références aux fichiers)
+- VersionTests : ETag du flux (304) et utilisateurs dont il change
+- RatingTests : statistiques des critiques dénormalisées dans les tickets
+"""
+
+import json
+import os
+from io import StringIO
+import pstats
+import tempfile
+import warnings
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from PIL import Image
+
+from . import (
+    benchmarks,
+    blobs,
+    caching,
+    database,
+    deletions,
+    export,
+    feeds,
+    jobs,
+    profiling,
+    queryplans,
+    ratings,
+    relations,
+    timeline,
+    uploads,
+    versions,
+    views,
+)
+from .storage import ContentAddressedStorage
+from .models import (
+    Deletion,
+    ImageBlob,
+    Job,
+    Review,
+    Ticket,
+    TimelineEntry,
+    UserBlocks,
+    UserFollows,
+)
+
+
+def clear_caches():
+    """Vide le cache partagé et le cache du processus (caching.py)"""
+    cache.clear()
+    caching.clear_local()
+
+
+class BackgroundJobsMixin:
+    """Exécution des tâches d'arrière-plan (jobs.py) dans un TestCase"""
+
+    def run_jobs(self):
+        """Exécute les tâches en file, puis celles qu'elles mettent en file"""
+        while claimed := jobs.claim(100):
+            for job in claimed:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertTrue(jobs.execute(*job))
+
+
+class ExportTests(TestCase):
+    """Export des posts : lecture en flux, sans chargement complet"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lecteur", password="password")
+        for index in range(5):
+            ticket = Ticket.objects.create(user=cls.user, title=f"Ticket {index}")
+            Review.objects.create(
+                user=cls.user, ticket=ticket, headline=f"Critique {index}", rating=3
+            )
+
+    def _export(self, factory, export_format="ndjson"):
+        request = factory.get("/posts/export/", {"format": export_format})
+        request.user = self.user
+        return views.posts_export(request)
+
+    def test_wsgi_export_is_a_sync_stream(self):
+        response = self._export(RequestFactory())
+        self.assertFalse(response.is_async)
+        lines = [json.loads(line) for line in response.streaming_content]
+        self.assertEqual(len(lines), 10)
+        self.assertEqual([line["type"] for line in lines[:2]], ["TICKET", "REVIEW"])
+
+    async def test_asgi_export_is_not_buffered(self):
+        # Sous ASGI, un itérateur synchrone serait lu en entier (avec un
+        # avertissement) avant l'envoi de la première ligne
+        with mock.patch.object(export, "CHUNK_SIZE", 2):
+            response = self._export(AsyncRequestFactory())
+            self.assertTrue(response.is_async)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                chunks = aiter(response)
+                first = json.loads(await anext(chunks))
+                rest = [json.loads(chunk) async for chunk in chunks]
+        self.assertEqual(first["title"], "Ticket 0")
+        self.assertEqual(len(rest), 9)
+        times = [first["time_created"]] + [line["time_created"] for line in rest]
+        self.assertEqual(times, sorted(times))
+
+    async def test_asgi_csv_export(self):
+        response = self._export(AsyncRequestFactory(), "csv")
+        content = b"".join([chunk async for chunk in response]).decode()
+        lines = content.splitlines()
+        self.assertEqual(lines[0], ",".join(export.COLUMNS))
+        self.assertEqual(len(lines), 11)
+
+
+class QueryPlanTests(TestCase):
+    """Aucune requête fréquente ne parcourt une table entière"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lecteur")
+        cls.other = User.objects.create_user("auteur")
+        blocked = User.objects.create_user("bloque")
+        UserFollows.objects.create(user=cls.user, followed_user=cls.other)
+        UserBlocks.objects.create(user=cls.user, blocked_user=blocked)
+        ticket = Ticket.objects.create(user=cls.other, title="Ticket")
+        Review.objects.create(user=cls.user, ticket=ticket, headline="Avis", rating=3)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN QUERY PLAN est propre à SQLite")
+        cursor = feeds.decode_cursor(
+            feeds.encode_cursor(feeds.timeline_keys(self.user)[0])
+        )
+        catalog = queryplans.hot_querysets(self.user, self.other, cursor)
+        for name, queryset in catalog.items():
+            with self.subTest(name):
+                tables, plan = queryplans.full_table_scans(queryset)
+                self.assertEqual(tables, [], plan)
+
+
+@override_settings(DATABASE_ROUTERS=["listings.database.ReadReplicaRouter"])
+class DatabaseProfileTests(TransactionTestCase):
+    """Profil de production : verrous et connexion en lecture seule"""
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user("lecteur")
+        author = User.objects.create_user("auteur")
+        UserFollows.objects.create(user=self.user, followed_user=author)
+        for index in range(20):
+            Ticket.objects.create(user=author, title=f"Ticket {index}")
+        # La connexion en lecture seule est déclarée comme dans
+        # settings_production.py ; seul son alias compte pour le routeur
+        patcher = mock.patch.dict(
+            connections.settings,
+            {database.READ_ALIAS: connections.settings[DEFAULT_DB_ALIAS]},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_production_pragmas_avoid_lock_errors(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Les PRAGMA concernent SQLite")
+        summary = benchmarks.contention(
+            "production", [self.user], readers=4, writers=2, duration=1, batch=10
+        )
+        self.assertEqual(summary["lock_errors"], 0)
+        self.assertGreater(summary["reads_per_second"], 0)
+        self.assertGreater(summary["writes_per_second"], 0)
+
+    def test_router_falls_back_to_default_in_atomic(self):
+        router = database.ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Ticket), DEFAULT_DB_ALIAS)
+        with database.reading_from_replica():
+            self.assertEqual(router.db_for_read(Ticket), database.READ_ALIAS)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Ticket), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_write(Ticket), DEFAULT_DB_ALIAS)
+
+    async def test_feed_and_posts_read_from_replica(self):
+        routed = []
+        db_for_read = database.ReadReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            # Les lectures sont faites sur la base principale : seule la
+            # décision du routeur est enregistrée
+            routed.append(db_for_read(router, model, **hints))
+            return DEFAULT_DB_ALIAS
+
+        await self.async_client.aforce_login(self.user)
+        for name in ("feed", "posts"):
+            with self.subTest(name):
+                routed.clear()
+                with mock.patch.object(
+                    database.ReadReplicaRouter, "db_for_read", record
+                ):
+                    response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(database.READ_ALIAS, routed)
+
+
+class AccountAdminTests(TestCase):
+    """Suppression d'un compte depuis l'administration"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="password")
+        cls.other = User.objects.create_user("lecteur")
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.admin)
+
+    def test_admin_cannot_delete_own_account(self):
+        url = reverse("admin:auth_user_delete", args=[self.admin.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.post(url, {"post": "yes"}).status_code, 403)
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.is_active)
+        self.assertFalse(Deletion.objects.exists())
+
+    def test_other_account_is_deleted_in_background(self):
+        url = reverse("admin:auth_user_delete", args=[self.other.pk])
+        response = self.client.post(url, {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.other.refresh_from_db()
+        self.assertFalse(self.other.is_active)
+        deletion = Deletion.objects.get()
+        self.assertEqual(
+            (deletion.kind, deletion.object_id), (Deletion.ACCOUNT, self.other.pk)
+        )
+
+
+class StorageTests(TestCase):
+    """Le stockage par contenu ne laisse aucun fichier temporaire"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+        self.tmp_dir = os.path.join(directory.name, ".tmp")
+
+    def test_identical_files_share_one_file(self):
+        first = self.storage.save("tickets/a.jpg", ContentFile(b"image"))
+        second = self.storage.save("tickets/b.jpg", ContentFile(b"image"))
+        self.assertEqual(first, second)
+        self.assertTrue(self.storage.exists(first))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_failed_save_removes_temporary_file(self):
+        with mock.patch.object(blobs, "reserve", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.storage.save("tickets/a.jpg", ContentFile(b"image"))
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+
+@override_settings(LISTINGS_PROFILER_ENABLED=True)
+class ProfilerTests(TestCase):
+    """Le profil d'une vue async contient le code de la vue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("equipe", is_staff=True)
+        Ticket.objects.create(user=cls.user, title="Ticket")
+
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(profiling, "PROFILE_DIR", Path(directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _functions(self, response):
+        """Noms des fonctions du profil cProfile d'une réponse"""
+        self.assertEqual(response.status_code, 200)
+        _, path = profiling.load(response["X-Profile-Id"])
+        return {name for _, _, name in pstats.Stats(str(path)).stats}
+
+    def test_wsgi_profile_contains_feed(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("feed"), {"_profile": "cprofile"})
+        self.assertIn("feed", self._functions(response))
+
+    async def test_asgi_profile_contains_feed(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("feed"), {"_profile": "cprofile"}
+        )
+        self.assertIn("feed", self._functions(response))
+
+
+class UploadTests(TestCase):
+    """
+    Une image refusée pour son format ou ses dimensions est ignorée et les
+    champs suivants sont lus ; une image trop lourde interrompt la requête
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lecteur")
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.user)
+
+    def _png(self, size=(20, 20)):
+        """Image PNG envoyée"""
+        buffer = BytesIO()
+        Image.new("RGB", size).save(buffer, "PNG")
+        return SimpleUploadedFile("image.png", buffer.getvalue(), "image/png")
+
+    def _post(self, image):
+        """Crée un ticket et sa critique ; l'image précède les autres champs"""
+        data = {
+            "image": image,
+            "title": "Titre",
+            "description": "",
+            "headline": "Critique",
+            "rating": 4,
+            "body": "",
+        }
+        response = self.client.post(reverse("review-create"), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Ticket.objects.exists())
+        return response.context["ticket_form"], response.context["review_form"]
+
+    def test_invalid_format_skips_the_file_only(self):
+        ticket_form, review_form = self._post(
+            SimpleUploadedFile("notes.txt", b"pas une image", "text/plain")
+        )
+        self.assertEqual(list(ticket_form.errors), ["image"])
+        self.assertIn("image valide", ticket_form.errors["image"][0])
+        self.assertTrue(review_form.is_valid())
+
+    def test_too_many_pixels_skips_the_file_only(self):
+        with mock.patch.object(uploads, "MAX_PIXELS", 100):
+            ticket_form, review_form = self._post(self._png())
+        self.assertEqual(list(ticket_form.errors), ["image"])
+        self.assertIn("20 × 20 pixels", ticket_form.errors["image"][0])
+        self.assertTrue(review_form.is_valid())
+
+    def test_too_large_file_stops_reading(self):
+        with mock.patch.object(uploads, "MAX_BYTES", 10):
+            ticket_form, review_form = self._post(self._png())
+        self.assertIn("taille maximale", ticket_form.errors["image"][0])
+        # Le corps de la requête n'est plus lu après l'image
+        self.assertIn("title", ticket_form.errors)
+        self.assertFalse(review_form.is_valid())
+
+
+class TimelineTests(BackgroundJobsMixin, TestCase):
+    """Le flux matérialisé suit les publications et les relations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user("alice")
+        cls.bob = User.objects.create_user("bob")
+        cls.carol = User.objects.create_user("carol")
+
+    def setUp(self):
+        clear_caches()
+
+    def _publish(self, model, **fields):
+        """Crée une publication et met sa diffusion en file"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return model.objects.create(**fields)
+
+    def _post(self, user, name, args=(), data=None):
+        """Envoie un formulaire des relations en tant qu'utilisateur"""
+        self.client.force_login(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name, args=args), data or {})
+        self.assertEqual(response.status_code, 302)
+
+    def _timeline(self, user):
+        """Publications du flux matérialisé : {(type, identifiant)}"""
+        return timeline.stored_keys(user)
+
+    def assertNoDrift(self):
+        """rebuild_timeline --check ne signale aucun flux divergent"""
+        output = StringIO()
+        call_command("rebuild_timeline", "--check", stdout=output)
+        self.assertIn("Tous les flux sont à jour.", output.getvalue())
+
+    def _ticket(self, user, title="Ticket"):
+        return self._publish(Ticket, user=user, title=title)
+
+    def _review(self, user, ticket):
+        return self._publish(
+            Review, user=user, ticket=ticket, headline="Critique", rating=4
+        )
+
+    def test_fan_out_to_followers(self):
+        UserFollows.objects.create(user=self.bob, followed_user=self.alice)
+        ticket = self._ticket(self.alice)
+        key = (TimelineEntry.TICKET, ticket.id)
+        # L'auteur voit sa publication aussitôt, ses abonnés après la diffusion
+        self.assertIn(key, self._timeline(self.alice))
+        self.assertNotIn(key, self._timeline(self.bob))
+        self.run_jobs()
+        self.assertIn(key, self._timeline(self.bob))
+        self.assertNotIn(key, self._timeline(self.carol))
+        # Une critique est aussi diffusée à l'auteur du ticket
+        review = self._review(self.carol, ticket)
+        self.run_jobs()
+        self.assertIn((TimelineEntry.REVIEW, review.id), self._timeline(self.alice))
+        self.assertNoDrift()
+
+    def test_unfollow_purges_author_posts(self):
+        UserFollows.objects.create(user=self.bob, followed_user=self.alice)
+        ticket = self._ticket(self.alice)
+        answer = self._review(self.alice, self._ticket(self.bob))
+        self.run_jobs()
+        self._post(self.bob, "unfollow", args=[self.alice.id])
+        stored = self._timeline(self.bob)
+        self.assertNotIn((TimelineEntry.TICKET, ticket.id), stored)
+        # La critique d'alice sur un ticket de bob reste visible
+        self.assertIn((TimelineEntry.REVIEW, answer.id), stored)
+        self.assertNoDrift()
+
+    def test_block_purges_both_timelines(self):
+        UserFollows.objects.create(user=self.bob, followed_user=self.alice)
+        UserFollows.objects.create(user=self.alice, followed_user=self.bob)
+        alice_ticket = self._ticket(self.alice)
+        bob_ticket = self._ticket(self.bob)
+        review = self._review(self.alice, bob_ticket)
+        self.run_jobs()
+        self._post(self.bob, "block", args=[self.alice.id])
+        self.run_jobs()
+        self.assertEqual(
+            self._timeline(self.bob), {(TimelineEntry.TICKET, bob_ticket.id)}
+        )
+        # Les publications d'alice restent dans son propre flux
+        self.assertEqual(
+            self._timeline(self.alice),
+            {
+                (TimelineEntry.TICKET, alice_ticket.id),
+                (TimelineEntry.REVIEW, review.id),
+            },
+        )
+        self.assertFalse(UserFollows.objects.exists())
+        self.assertNoDrift()
+
+    def test_follow_backfills_author_posts(self):
+        ticket = self._ticket(self.alice)
+        review = self._review(self.alice, self._ticket(self.carol))
+        self.run_jobs()
+        self._post(self.bob, "follow-users", data={"followed_user": "alice"})
+        self.assertNotIn((TimelineEntry.TICKET, ticket.id), self._timeline(self.bob))
+        self.run_jobs()
+        stored = self._timeline(self.bob)
+        self.assertIn((TimelineEntry.TICKET, ticket.id), stored)
+        self.assertIn((TimelineEntry.REVIEW, review.id), stored)
+        self.assertNoDrift()
+
+    def test_unblock_restores_cross_reviews(self):
+        bob_ticket = self._ticket(self.bob)
+        alice_ticket = self._ticket(self.alice)
+        on_bob = self._review(self.alice, bob_ticket)
+        on_alice = self._review(self.bob, alice_ticket)
+        self.run_jobs()
+        self._post(self.bob, "block", args=[self.alice.id])
+        self.assertNotIn((TimelineEntry.REVIEW, on_bob.id), self._timeline(self.bob))
+        self._post(self.bob, "unblock", args=[self.alice.id])
+        self.run_jobs()
+        self.assertIn((TimelineEntry.REVIEW, on_bob.id), self._timeline(self.bob))
+        self.assertIn((TimelineEntry.REVIEW, on_alice.id), self._timeline(self.alice))
+        self.assertNoDrift()
+
+    def test_check_reports_drift(self):
+        ticket = self._ticket(self.alice)
+        self.run_jobs()
+        TimelineEntry.objects.filter(post_id=ticket.id).delete()
+        with self.assertRaises(CommandError):
+            call_command("rebuild_timeline", "--check", stdout=StringIO())
+        call_command("rebuild_timeline", stdout=StringIO())
+        self.assertNoDrift()
+
+
+@mock.patch.object(deletions, "BATCH_SIZE", 2)
+@mock.patch.object(deletions, "BATCHES_PER_JOB", 3)
+class DeletionTests(BackgroundJobsMixin, TestCase):
+    """Suppression d'un compte en plusieurs tâches, par petits lots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.doomed = User.objects.create_user("supprime")
+        cls.reader = User.objects.create_user("lecteur")
+        cls.friend = User.objects.create_user("ami")
+        UserFollows.objects.create(user=cls.reader, followed_user=cls.doomed)
+        UserFollows.objects.create(user=cls.doomed, followed_user=cls.friend)
+        shared = Ticket.objects.create(
+            user=cls.doomed,
+            title="Partagé",
+            image="tickets/shared.jpg",
+            renditions={"jpg": {"320": "tickets/own-320.jpg"}},
+        )
+        own = Ticket.objects.create(
+            user=cls.doomed, title="Propre", image="tickets/own.jpg"
+        )
+        cls.friend_ticket = Ticket.objects.create(
+            user=cls.friend, title="Ami", image="tickets/shared.jpg"
+        )
+        for ticket in (shared, own):
+            for rating in (1, 2, 3):
+                Review.objects.create(
+                    user=cls.reader, ticket=ticket, headline="Avis", rating=rating
+                )
+        Review.objects.create(
+            user=cls.doomed, ticket=cls.friend_ticket, headline="Avis", rating=5
+        )
+        Review.objects.create(
+            user=cls.reader, ticket=cls.friend_ticket, headline="Avis", rating=2
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def _run_one_job(self):
+        """Exécute une seule tâche de suppression"""
+        (job,) = jobs.claim(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(jobs.execute(*job))
+
+    def test_job_requeues_itself_and_resumes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion = deletions.delete_account(self.doomed)
+        self._run_one_job()
+        deletion.refresh_from_db()
+        self.assertIsNone(deletion.time_finished)
+        self.assertGreater(deletion.rows_deleted, 0)
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+
+        self.run_jobs()
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.time_finished)
+        self.assertGreater(Job.objects.filter(name="deletions.run").count(), 2)
+        self.assertFalse(User.objects.filter(pk=self.doomed.pk).exists())
+        self.assertFalse(Ticket.objects.filter(user=self.doomed).exists())
+        self.assertFalse(Review.objects.filter(ticket__user=self.doomed).exists())
+        self.assertFalse(TimelineEntry.objects.filter(author=self.doomed).exists())
+
+    def test_ticket_stats_are_repaired_and_relations_forgotten(self):
+        # Relations lues une première fois : elles sont en cache
+        self.assertIn(self.doomed.id, relations.following_ids(self.reader.id))
+        self.assertEqual(relations.following_ids(self.doomed.id), {self.friend.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            deletions.delete_account(self.doomed)
+        self.run_jobs()
+        self.friend_ticket.refresh_from_db()
+        self.assertEqual(
+            (self.friend_ticket.review_count, self.friend_ticket.rating_sum), (1, 2)
+        )
+        self.assertEqual(relations.following_ids(self.reader.id), set())
+
+    def test_files_are_released(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            deletion = deletions.delete_account(self.doomed)
+        self.run_jobs()
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.files_released, 3)
+        # Le fichier encore désigné par le ticket de l'ami est conservé
+        self.assertEqual(
+            dict(ImageBlob.objects.values_list("name", "refcount")),
+            {"tickets/shared.jpg": 1},
+        )
+
+
+class VersionTests(BackgroundJobsMixin, TestCase):
+    """L'ETag du flux ne change que pour les utilisateurs concernés"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("lecteur")
+        cls.author = User.objects.create_user("auteur")
+        cls.stranger = User.objects.create_user("inconnu")
+        cls.bystander = User.objects.create_user("temoin")
+        UserFollows.objects.create(user=cls.reader, followed_user=cls.author)
+        cls.ticket = Ticket.objects.create(user=cls.author, title="Ticket")
+        Ticket.objects.create(user=cls.bystander, title="Autre")
+
+    def setUp(self):
+        clear_caches()
+        self.run_jobs()
+
+    def _feed_versions(self):
+        """Version du flux de chaque utilisateur : {nom: version}"""
+        return {
+            user.username: versions.feed_version(user)
+            for user in (self.reader, self.author, self.stranger, self.bystander)
+        }
+
+    def _changed(self, change):
+        """Noms des utilisateurs dont la version du flux change"""
+        before = self._feed_versions()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.run_jobs()
+        after = self._feed_versions()
+        return {name for name in before if before[name] != after[name]}
+
+    def test_unchanged_feed_returns_304(self):
+        self.client.force_login(self.reader)
+        # La première page pose le cookie CSRF, dont dépend l'ETag
+        self.client.get(reverse("feed"))
+        response = self.client.get(reverse("feed"))
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.client.get(reverse("feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Une publication d'un utilisateur non suivi ne change pas le flux
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(user=self.bystander, title="Nouveau")
+        response = self.client.get(reverse("feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.create(user=self.author, title="Nouveau")
+        self.run_jobs()
+        response = self.client.get(reverse("feed"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_stranger_review_on_followed_ticket(self):
+        # Le ticket de l'auteur, affiché dans le flux du lecteur, change de
+        # nombre de critiques et de note moyenne
+        changed = self._changed(
+            lambda: Review.objects.create(
+                user=self.stranger, ticket=self.ticket, headline="Avis", rating=4
+            )
+        )
+        self.assertEqual(changed, {"lecteur", "auteur", "inconnu"})
+
+    def test_block_and_unblock(self):
+        self.client.force_login(self.reader)
+        changed = self._changed(
+            lambda: self.client.post(reverse("block", args=[self.author.id]))
+        )
+        self.assertEqual(changed, {"lecteur", "auteur"})
+        changed = self._changed(
+            lambda: self.client.post(reverse("unblock", args=[self.author.id]))
+        )
+        self.assertEqual(changed, {"lecteur", "auteur"})
+
+
+class RatingTests(TestCase):
+    """Les statistiques des tickets suivent leurs critiques"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("lecteur")
+        cls.ticket = Ticket.objects.create(user=cls.user, title="Ticket")
+        cls.other = Ticket.objects.create(user=cls.user, title="Autre")
+
+    def _review(self, ticket, rating):
+        return Review.objects.create(
+            user=self.user, ticket=ticket, headline="Avis", rating=rating
+        )
+
+    def _stats(self, ticket):
+        """Statistiques stockées : (nombre, somme des notes, dernière date)"""
+        ticket.refresh_from_db()
+        return ticket.review_count, ticket.rating_sum, ticket.last_review_at
+
+    def assertNoDrift(self):
+        self.assertEqual(list(ratings.drift()), [])
+
+    def test_create(self):
+        self._review(self.ticket, 2)
+        latest = self._review(self.ticket, 5)
+        self.assertEqual(self._stats(self.ticket), (2, 7, latest.time_created))
+        self.assertEqual(self.ticket.average_rating, 3.5)
+        self.assertNoDrift()
+
+    def test_rating_edit(self):
+        review = self._review(self.ticket, 2)
+        self.ticket.refresh_from_db()
+        edited = self.ticket.time_edited
+        review.rating = 4
+        review.save()
+        self.assertEqual(self._stats(self.ticket), (1, 4, review.time_created))
+        # time_edited sert de clé aux cartes en cache
+        self.assertGreater(self.ticket.time_edited, edited)
+        self.assertNoDrift()
+
+    def test_move_to_another_ticket(self):
+        first = self._review(self.ticket, 2)
+        moved = self._review(self.ticket, 3)
+        moved.ticket = self.other
+        moved.rating = 5
+        moved.save()
+        self.assertEqual(self._stats(self.ticket), (1, 2, first.time_created))
+        self.assertEqual(self._stats(self.other), (1, 5, moved.time_created))
+        self.assertNoDrift()
+
+    def test_delete(self):
+        first = self._review(self.ticket, 2)
+        self._review(self.ticket, 3).delete()
+        self.assertEqual(self._stats(self.ticket), (1, 2, first.time_created))
+        first.delete()
+        self.assertEqual(self._stats(self.ticket), (0, 0, None))
+        self.assertIsNone(self.ticket.average_rating)
+        self.assertNoDrift()
+
+    def test_reconcile_fix(self):
+        self._review(self.ticket, 4)
+        Ticket.objects.filter(pk=self.ticket.pk).update(review_count=9, rating_sum=1)
+        with self.assertRaises(CommandError):
+            call_command("reconcile_ratings", stdout=StringIO())
+        output = StringIO()
+        call_command("reconcile_ratings", "--fix", stdout=output)
+        self.assertIn("1 ticket(s) corrigé(s)", output.getvalue())
+        self.assertEqual(self._stats(self.ticket)[:2], (1, 4))
+        self.assertNoDrift()
@@ -0,0 +1,312 @@
+"""
+Maintenance du flux d'activité matérialisé (fan-out à l'écriture).
+
+Chaque publication est recopiée dans la table TimelineEntry de tous les
+utilisateurs qui doivent la voir. Ce fichier regroupe les opérations qui
+gardent cette table synchronisée avec les relations entre utilisateurs :
+- fan_out / remove : publication créée ou supprimée
+- backfill / purge : abonnement créé ou supprimé
+- purge_blocked / restore_unblocked : blocage créé ou supprimé
+- expected_keys / rebuild_user : reconstruction à partir du flux calculé
+
+Les règles de visibilité sont celles de feeds.feed_querysets, qui reste la
+référence utilisée par la commande rebuild_timeline. Chaque opération change
+le jeton du flux des utilisateurs concernés (versions.py).
+"""
+
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import feeds, relations, versions
+from .models import Review, TimelineEntry, UserFollows
+
+# Taille des lots d'insertion
+BATCH_SIZE = 1000
+
+
+def _post_type(post):
+    """Renvoie le type de publication d'un ticket ou d'une critique"""
+    return TimelineEntry.REVIEW if isinstance(post, Review) else TimelineEntry.TICKET
+
+
+def _entry(user_id, post_type, post_id, author_id, time_created):
+    """Construit une entrée de flux non sauvegardée"""
+    return TimelineEntry(
+        user_id=user_id,
+        author_id=author_id,
+        post_type=post_type,
+        post_id=post_id,
+        time_created=time_created,
+    )
+
+
+def _insert(entries):
+    """
+    Insère des entrées de flux par lots en ignorant les doublons.
+
+    Les entrées sont consommées lot par lot pour que la mémoire utilisée ne
+    dépende pas du nombre de publications recopiées.
+
+    Args:
+        entries: Un itérable d'entrées TimelineEntry non sauvegardées
+    """
+    entries = iter(entries)
+    while batch := list(islice(entries, BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def recipients(post):
+    """
+    Calcule les utilisateurs dont le flux doit contenir une publication.
+
+    Il s'agit de l'auteur, de ses abonnés et, pour une critique, de l'auteur
+    du ticket, à l'exception des utilisateurs liés à l'auteur par un blocage.
+
+    Args:
+        post: Le ticket ou la critique publié
+
+    Returns:
+        set: Les identifiants des utilisateurs destinataires
+    """
+    author_id = post.user_id
+    user_ids = set(follower_ids(author_id))
+    user_ids.add(author_id)
+    if isinstance(post, Review):
+        user_ids.add(post.ticket.user_id)
+
+    return user_ids - relations.excluded_ids(author_id)
+
+
+def follower_ids(author_id):
+    """
+    Construit la requête des abonnés d'un auteur.
+
+    Args:
+        author_id: L'identifiant de l'auteur
+
+    Returns:
+        QuerySet: Les identifiants des abonnés
+    """
+    return UserFollows.objects.filter(followed_user_id=author_id).values_list(
+        "user_id", flat=True
+    )
+
+
+def fan_out(post, user_ids=None):
+    """
+    Ajoute une nouvelle publication au flux de ses destinataires.
+
+    Args:
+        post: Le ticket ou la critique publié
+        user_ids: Les destinataires (par défaut, tous ceux calculés par
+            recipients)
+    """
+    post_type = _post_type(post)
+    user_ids = recipients(post) if user_ids is None else set(user_ids)
+    _insert(
+        _entry(user_id, post_type, post.id, post.user_id, post.time_created)
+        for user_id in user_ids
+    )
+    versions.bump_timelines(user_ids)
+
+
+def remove(post):
+    """
+    Retire une publication supprimée de tous les flux.
+
+    Args:
+        post: Le ticket ou la critique supprimé
+    """
+    entries = TimelineEntry.objects.filter(post_type=_post_type(post), post_id=post.id)
+    versions.bump_timelines(entries.values_list("user_id", flat=True))
+    entries.delete()
+
+
+def _author_entries(user_id, author_id, reviews=None):
+    """
+    Génère les entrées de flux des publications d'un auteur.
+
+    Args:
+        user_id: L'utilisateur propriétaire du flux
+        author_id: L'auteur dont on recopie les publications
+        reviews: Les critiques à recopier (par défaut toutes celles de l'auteur)
+
+    Yields:
+        TimelineEntry: Les entrées non sauvegardées
+    """
+    if reviews is None:
+        tickets, reviews = feeds.posts_querysets(author_id)
+        for pk, time_created in tickets.values_list("id", "time_created").iterator():
+            yield _entry(user_id, TimelineEntry.TICKET, pk, author_id, time_created)
+    for pk, time_created in reviews.values_list("id", "time_created").iterator():
+        yield _entry(user_id, TimelineEntry.REVIEW, pk, author_id, time_created)
+
+
+def backfill(user, author):
+    """
+    Recopie les publications d'un auteur dans le flux d'un nouvel abonné.
+
+    Args:
+        user: L'utilisateur qui vient de s'abonner
+        author: L'utilisateur suivi
+    """
+    _insert(_author_entries(user.id, author.id))
+    versions.bump_timelines([user.id])
+
+
+def purge(user, author):
+    """
+    Retire les publications d'un auteur du flux d'un ancien abonné.
+
+    Les critiques de l'auteur sur les tickets de l'utilisateur restent
+    visibles, comme dans le flux calculé.
+
+    Args:
+        user: L'utilisateur qui s'est désabonné
+        author: L'utilisateur qui n'est plus suivi
+    """
+    purge_queryset(user, author).delete()
+    versions.bump_timelines([user.id])
+
+
+def purge_queryset(user, author):
+    """
+    Construit la requête des entrées retirées lors d'un désabonnement.
+
+    Args:
+        user: L'utilisateur qui s'est désabonné
+        author: L'utilisateur qui n'est plus suivi
+
+    Returns:
+        QuerySet: Les entrées du flux à supprimer
+    """
+    return TimelineEntry.objects.filter(user=user, author=author).exclude(
+        post_type=TimelineEntry.REVIEW,
+        post_id__in=Review.objects.filter(user=author, ticket__user=user).values("id"),
+    )
+
+
+def purge_blocked(user, other):
+    """
+    Retire des deux flux concernés les publications liées par un blocage.
+
+    Args:
+        user: L'utilisateur qui bloque
+        other: L'utilisateur bloqué
+    """
+    TimelineEntry.objects.filter(
+        Q(user=user, author=other) | Q(user=other, author=user)
+    ).delete()
+    versions.bump_timelines([user.id, other.id])
+
+
+def restore_unblocked(user, other):
+    """
+    Rétablit les critiques croisées après la levée d'un blocage.
+
+    Les abonnements ayant été supprimés lors du blocage, seules les critiques
+    de chacun sur les tickets de l'autre redeviennent visibles. Rien n'est
+    rétabli tant qu'un blocage subsiste dans l'autre sens.
+
+    Args:
+        user: L'utilisateur qui débloque
+        other: L'utilisateur débloqué
+    """
+    if relations.is_blocked_between(user.id, other.id):
+        return
+    for owner, author in ((user, other), (other, user)):
+        reviews = Review.objects.filter(user=author, ticket__user=owner)
+        _insert(_author_entries(owner.id, author.id, reviews=reviews))
+    versions.bump_timelines([user.id, other.id])
+
+
+def expected_keys(user):
+    """
+    Calcule le contenu attendu du flux d'un utilisateur à partir des relations.
+
+    Args:
+        user: L'utilisateur dont on calcule le flux
+
+    Returns:
+        dict: {(post_type, post_id): (author_id, time_created)}
+    """
+    tickets, reviews = feeds.feed_querysets(user)
+    keys = {}
+    for post_type, queryset in (
+        (TimelineEntry.TICKET, tickets),
+        (TimelineEntry.REVIEW, reviews),
+    ):
+        for pk, author_id, time_created in queryset.values_list(
+            "id", "user_id", "time_created"
+        ).iterator():
+            keys[(post_type, pk)] = (author_id, time_created)
+    return keys
+
+
+def stored_keys(user):
+    """
+    Lit le contenu actuel du flux matérialisé d'un utilisateur.
+
+    Args:
+        user: L'utilisateur dont on lit le flux
+
+    Returns:
+        set: Les couples (post_type, post_id) présents dans le flux
+    """
+    return set(
+        TimelineEntry.objects.filter(user=user)
+        .values_list("post_type", "post_id")
+        .iterator()
+    )
+
+
+def _insert_select(cursor, user, post_type, queryset):
+    """
+    Recopie des publications dans le flux par un seul INSERT ... SELECT.
+
+    Les lignes ne transitent pas par Python : le coût ne dépend que de la
+    base de données, quelle que soit la taille du flux.
+
+    Args:
+        cursor: Le curseur de la connexion
+        user: L'utilisateur propriétaire du flux
+        post_type: Le type des publications recopiées
+        queryset: Les tickets ou critiques à recopier
+
+    Returns:
+        int: Le nombre d'entrées écrites
+    """
+    sql, params = (
+        queryset.order_by()
+        .values_list("user_id", "id", "time_created")
+        .query.sql_with_params()
+    )
+    cursor.execute(
+        f"INSERT INTO {TimelineEntry._meta.db_table} "
+        "(user_id, author_id, post_type, post_id, time_created) "
+        "SELECT %s, posts.user_id, %s, posts.id, posts.time_created "
+        f"FROM ({sql}) posts",
+        [user.id, post_type, *params],
+    )
+    return cursor.rowcount
+
+
+def rebuild_user(user):
+    """
+    Reconstruit entièrement le flux matérialisé d'un utilisateur.
+
+    Args:
+        user: L'utilisateur dont on reconstruit le flux
+
+    Returns:
+        int: Le nombre d'entrées écrites
+    """
+    tickets, reviews = feeds.feed_querysets(user)
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.filter(user=user).delete()
+        written = _insert_select(cursor, user, TimelineEntry.TICKET, tickets)
+        written += _insert_select(cursor, user, TimelineEntry.REVIEW, reviews)
+    versions.bump_timelines([user.id])
+    return written
@@ -0,0 +1,198 @@
+"""
+Réception des images envoyées, limitée en taille et en dimensions.
+
+Le gestionnaire LimitedImageUploadHandler (FILE_UPLOAD_HANDLERS) écrit
+chaque fichier reçu dans un fichier temporaire, morceau par morceau : la
+mémoire utilisée par un envoi se limite à un morceau et à l'en-tête de
+l'image, quel que soit le nombre d'envois simultanés. L'envoi est refusé :
+- dès que la taille annoncée de la requête ou les octets reçus dépassent
+  MAX_BYTES, sans lire la suite du corps de la requête
+- dès que l'en-tête de l'image, lu avant tout décodage, annonce des
+  dimensions supérieures à MAX_DIMENSION ou MAX_PIXELS (bombes de
+  décompression)
+- si les premiers octets ne sont pas ceux d'une image d'un format accepté
+
+Le fichier refusé n'apparaît pas dans request.FILES ; le motif du refus est
+conservé dans la requête et affiché par le formulaire (voir errors et
+TicketForm). Seul le dépassement de taille interrompt la lecture de la
+requête (connexion fermée) : un fichier refusé pour son format ou ses
+dimensions est ignoré, et les champs qui le suivent sont lus normalement.
+Ce fichier contient :
+- LimitedImageUploadHandler : gestionnaire de réception des fichiers
+- errors : motifs des envois refusés d'une requête
+"""
+
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+# Taille maximale d'une image envoyée (en octets)
+MAX_BYTES = getattr(settings, "LISTINGS_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+
+# Largeur ou hauteur maximale d'une image envoyée (en pixels)
+MAX_DIMENSION = getattr(settings, "LISTINGS_UPLOAD_MAX_DIMENSION", 10000)
+
+# Nombre maximal de pixels d'une image envoyée
+MAX_PIXELS = getattr(settings, "LISTINGS_UPLOAD_MAX_PIXELS", 40_000_000)
+
+# Formats d'image acceptés (noms Pillow)
+FORMATS = getattr(settings, "LISTINGS_UPLOAD_FORMATS", ("JPEG", "PNG", "WEBP", "GIF"))
+
+# Taille maximale de l'en-tête lu pour identifier l'image (en octets) : au-delà,
+# le fichier est refusé sans avoir été identifié
+HEADER_BYTES = 256 * 1024
+
+# Marge accordée aux autres champs du formulaire dans la taille de la requête
+FORM_OVERHEAD = 64 * 1024
+
+
+def errors(request):
+    """
+    Renvoie les motifs des envois refusés d'une requête.
+
+    Args:
+        request: La requête HTTP (corps déjà analysé)
+
+    Returns:
+        dict: {nom du champ: message}
+    """
+    return getattr(request, "upload_errors", {})
+
+
+def _too_large():
+    """Motif du refus d'une image trop lourde"""
+    return f"L'image dépasse la taille maximale de {filesizeformat(MAX_BYTES)}."
+
+
+def _too_big(width=None, height=None):
+    """Motif du refus d'une image aux dimensions trop grandes"""
+    size = f" ({width} × {height} pixels)" if width else ""
+    return (
+        f"L'image est trop grande{size} : {MAX_DIMENSION} pixels de côté "
+        f"et {MAX_PIXELS // 1_000_000} millions de pixels au maximum."
+    )
+
+
+def _identify(header):
+    """
+    Lit le format et les dimensions d'une image à partir de son en-tête.
+
+    Image.open ne lit que l'en-tête : aucun pixel n'est décodé.
+
+    Returns:
+        tuple: (format, largeur, hauteur), ou None si l'en-tête est incomplet
+            ou n'est pas celui d'une image
+
+    Raises:
+        Image.DecompressionBombError: Si Pillow refuse déjà les dimensions
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            with Image.open(BytesIO(header)) as image:
+                return image.format, image.width, image.height
+        except Image.DecompressionBombError:
+            raise
+        except Exception:
+            return None
+
+
+class LimitedImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Gestionnaire de réception qui écrit les fichiers sur disque et refuse les
+    images trop lourdes ou trop grandes au plus tôt.
+
+    Toutes les images du site (couvertures des tickets, administration) sont
+    reçues par ce gestionnaire : il remplace les gestionnaires par défaut de
+    Django, dont celui qui garde les petits fichiers en mémoire.
+    """
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # Une requête qui annonce plus que la limite est refusée avant la
+        # lecture du premier fichier
+        self.request_too_large = content_length > MAX_BYTES + FORM_OVERHEAD
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.header = b""
+        self.identified = False
+        if self.request_too_large:
+            self.reject(_too_large(), stop=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > MAX_BYTES:
+            self.reject(_too_large(), stop=True)
+        if not self.identified:
+            self.header += raw_data
+            self.check_header(complete=False)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.identified:
+            try:
+                self.check_header(complete=True)
+            except SkipFile:
+                self.file.close()
+                return None
+        return super().file_complete(file_size)
+
+    def check_header(self, complete):
+        """
+        Vérifie le format et les dimensions dès que l'en-tête est identifié.
+
+        Args:
+            complete: True si le fichier entier a été reçu
+        """
+        try:
+            found = _identify(self.header)
+        except Image.DecompressionBombError:
+            self.reject(_too_big())
+        if found is None:
+            if complete or len(self.header) >= HEADER_BYTES:
+                self.reject(
+                    f"Le fichier n'est pas une image valide ({', '.join(FORMATS)})."
+                )
+            return
+        image_format, width, height = found
+        if image_format not in FORMATS:
+            self.reject(
+                f"Format d'image non accepté ({image_format}) : "
+                f"{', '.join(FORMATS)} uniquement."
+            )
+        if max(width, height) > MAX_DIMENSION or width * height > MAX_PIXELS:
+            self.reject(_too_big(width, height))
+        self.identified = True
+        self.header = b""
+
+    def reject(self, message, stop=False):
+        """
+        Refuse le fichier en cours.
+
+        Args:
+            message: Le motif affiché par le formulaire
+            stop: True pour cesser de lire le corps de la requête (fichier
+                trop lourd) ; sinon le reste du fichier est ignoré et les
+                champs suivants sont lus
+
+        Raises:
+            StopUpload: Si stop vaut True ; la connexion est fermée
+            SkipFile: Sinon
+        """
+        if not hasattr(self.request, "upload_errors"):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+        self.identified = True
+        self.header = b""
+        if stop:
+            raise StopUpload(connection_reset=True)
+        raise SkipFile
@@ -13,8 +13,15 @@ urlpatterns = [
     path("logout/", views.logout_view, name="logout"),
     path("signup/", views.signup_page, name="signup"),
     path("feed/", views.feed, name="feed"),
+    path("api/feed/", views.feed_api, name="feed-api"),
+    path("api/feed/updates/", views.feed_updates, name="feed-updates"),
+    path("feed/stream/", views.feed_stream, name="feed-stream"),
     path("posts/", views.posts, name="posts"),
+    path("search/", views.search_posts, name="search"),
+    path("posts/export/", views.posts_export, name="posts-export"),
     path("follow-users/", views.follow_users, name="follow-users"),
+    path("api/users/", views.user_search, name="user-search"),
+    path("metrics/", views.metrics_endpoint, name="metrics"),
     path("unfollow/<int:user_id>/", views.unfollow_user, name="unfollow"),
     path("block/<int:user_id>/", views.block_user, name="block"),
     path("unblock/<int:user_id>/", views.unblock_user, name="unblock"),
@@ -0,0 +1,106 @@
+"""
+Recherche de noms d'utilisateur par préfixe (autocomplétion).
+
+La page des abonnements ne charge plus la liste de tous les utilisateurs :
+le champ de saisie interroge l'API de recherche au fil de la frappe.
+- search : page de noms d'utilisateur commençant par un préfixe
+- resolve : utilisateur désigné par un nom ou un identifiant saisi
+
+La recherche est une requête par intervalle sur `username`
+(`username >= préfixe AND username < préfixe + U+10FFFF`) qui suit l'index
+unique de la colonne, contrairement à LIKE ou `istartswith`. La recherche
+est sensible à la casse, comme l'unicité des noms d'utilisateur.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+# Durée de vie d'une page de résultats en cache (en secondes)
+TIMEOUT = getattr(settings, "LISTINGS_USER_SEARCH_CACHE_TIMEOUT", 30)
+
+# Nombre de résultats par page, par défaut et au maximum
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Plus grand caractère Unicode : borne haute de l'intervalle d'un préfixe
+_HIGHEST = "\U0010ffff"
+
+
+def _key(prefix, limit, offset):
+    """Construit la clé de cache d'une page de résultats"""
+    digest = hashlib.md5(prefix.encode(), usedforsecurity=False).hexdigest()
+    return f"listings:usersearch:{digest}:{limit}:{offset}"
+
+
+def prefix_queryset(prefix):
+    """
+    Construit la requête des utilisateurs dont le nom commence par un préfixe.
+
+    Args:
+        prefix: Le début du nom d'utilisateur
+
+    Returns:
+        QuerySet: Les couples (id, username) triés par nom
+    """
+    return (
+        User.objects.filter(
+            username__gte=prefix, username__lt=prefix + _HIGHEST, is_active=True
+        )
+        .order_by("username")
+        .values_list("id", "username")
+    )
+
+
+def search(prefix, limit=DEFAULT_LIMIT, offset=0):
+    """
+    Renvoie une page de noms d'utilisateur commençant par un préfixe.
+
+    Les pages sont partagées entre tous les utilisateurs et gardées en cache
+    quelques secondes : une saisie rapide ne relance pas la même requête.
+
+    Args:
+        prefix: Le début du nom d'utilisateur
+        limit: Le nombre de résultats (borné à MAX_LIMIT)
+        offset: Le nombre de résultats à sauter
+
+    Returns:
+        tuple: (liste de couples (id, username), True s'il reste des
+            résultats après cette page)
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    offset = max(0, offset)
+    if not prefix:
+        return [], False
+
+    key = _key(prefix, limit, offset)
+    page = cache.get(key)
+    if page is None:
+        rows = list(prefix_queryset(prefix)[offset : offset + limit + 1])
+        page = (rows[:limit], len(rows) > limit)
+        cache.set(key, page, TIMEOUT)
+    return page
+
+
+def resolve(value):
+    """
+    Renvoie l'utilisateur désigné par un nom ou un identifiant.
+
+    Un nom d'utilisateur est cherché en priorité ; une valeur numérique qui
+    ne correspond à aucun nom est ensuite traitée comme un identifiant.
+
+    Args:
+        value: Le nom ou l'identifiant saisi
+
+    Returns:
+        User: L'utilisateur trouvé, ou None
+    """
+    value = value.strip()
+    if not value:
+        return None
+    user = User.objects.filter(username=value, is_active=True).first()
+    if user is None and value.isdigit():
+        user = User.objects.filter(pk=int(value), is_active=True).first()
+    return user
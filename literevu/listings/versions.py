@@ -0,0 +1,212 @@
+"""
+Versions des flux de l'application LITRevu pour les requêtes conditionnelles.
+
+Une version résume, sans construire la liste des publications, tout ce qui
+peut changer le contenu d'une page du flux ou des posts. Elle sert d'ETag
+aux vues (décorateur `condition`) : une requête `If-None-Match` dont l'ETag
+est toujours valide reçoit une réponse 304 sans lecture des publications.
+
+Les versions sont calculées à partir de jetons gardés dans le cache, sans
+requête SQL :
+- le jeton du flux d'un utilisateur change quand des entrées de son flux
+  matérialisé sont ajoutées ou retirées (diffusion, rattrapage, purge, voir
+  timeline.py)
+- le jeton d'un auteur change quand une publication affichée dans ses cartes
+  change : ses propres publications, les statistiques de ses tickets, ou le
+  ticket auquel répondent ses critiques
+
+Une modification ne change donc que les versions des utilisateurs qui
+peuvent la voir. Ce fichier contient :
+- feed_version : flux matérialisé, relations et auteurs suivis
+- posts_version : publications de l'utilisateur
+- afeed_version / aposts_version : versions asynchrones (vues async)
+- bump_timelines / bump_authors : changement des jetons, après validation
+- bump_tickets / bump_post : jetons des auteurs concernés par des tickets ou
+  une publication modifiés
+"""
+
+import asyncio
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import relations
+from .models import Review, Ticket
+
+TIMELINE_KEY = "listings:versions:timeline:{}"
+AUTHOR_KEY = "listings:versions:author:{}"
+
+
+def _tokens(keys):
+    """
+    Lit des jetons dans le cache.
+
+    Un jeton absent du cache (expulsé ou premier appel) est remplacé par un
+    nouveau jeton : un ancien ETag ne peut donc jamais redevenir valide.
+
+    Args:
+        keys: Les clés des jetons
+
+    Returns:
+        list: Les jetons, dans l'ordre des clés
+    """
+    tokens = cache.get_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        tokens.update(cache.get_many(missing))
+    return [tokens.get(key) for key in keys]
+
+
+async def _atokens(keys):
+    """Version asynchrone de _tokens"""
+    tokens = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), None)
+        tokens.update(await cache.aget_many(missing))
+    return [tokens.get(key) for key in keys]
+
+
+def _bump(keys):
+    """Remplace des jetons une fois la transaction en cours validée"""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({key: time.time_ns() for key in keys}, None)
+        )
+
+
+def bump_timelines(user_ids):
+    """
+    Change le jeton du flux d'utilisateurs dont le flux matérialisé a changé.
+
+    Args:
+        user_ids: Les identifiants des utilisateurs
+    """
+    _bump(TIMELINE_KEY.format(user_id) for user_id in set(user_ids))
+
+
+def bump_authors(user_ids):
+    """
+    Change le jeton d'auteurs dont une carte affichée a changé.
+
+    Args:
+        user_ids: Les identifiants des auteurs
+    """
+    _bump(AUTHOR_KEY.format(user_id) for user_id in set(user_ids))
+
+
+def bump_tickets(tickets, author_ids=()):
+    """
+    Change le jeton des auteurs de tickets modifiés et de leurs critiques.
+
+    Les cartes d'une critique affichent son ticket, et celles d'un ticket le
+    nombre et la moyenne de ses critiques.
+
+    Args:
+        tickets: Les tickets modifiés (QuerySet)
+        author_ids: D'autres auteurs dont le jeton doit changer
+    """
+    authors = set(author_ids)
+    authors.update(tickets.values_list("user_id", flat=True))
+    authors.update(
+        Review.objects.filter(ticket__in=tickets.values("pk")).values_list(
+            "user_id", flat=True
+        )
+    )
+    bump_authors(authors)
+
+
+def bump_post(post):
+    """
+    Change le jeton des auteurs concernés par une publication créée, modifiée
+    ou supprimée.
+
+    Args:
+        post: Le ticket ou la critique
+    """
+    ticket_id = post.ticket_id if isinstance(post, Review) else post.id
+    bump_tickets(Ticket.objects.filter(pk=ticket_id), author_ids={post.user_id})
+
+
+def _digest(*parts):
+    """Condense les composantes d'une version en une chaîne courte"""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def _feed_keys(user_id, following):
+    """Clés des jetons dont dépend le flux d'un utilisateur"""
+    return [TIMELINE_KEY.format(user_id)] + [
+        AUTHOR_KEY.format(author_id) for author_id in [user_id, *following]
+    ]
+
+
+def feed_version(user):
+    """
+    Calcule la version du flux d'un utilisateur.
+
+    Elle dépend du jeton de son flux matérialisé, de ses relations (lues dans
+    leur cache) et des jetons de l'utilisateur et des auteurs qu'il suit : les
+    critiques d'autres utilisateurs sur ses tickets changent son propre jeton.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+
+    Returns:
+        str: La version du flux
+    """
+    following = sorted(relations.following_ids(user.id))
+    excluded = sorted(relations.excluded_ids(user.id))
+    return _digest(
+        user.id, following, excluded, _tokens(_feed_keys(user.id, following))
+    )
+
+
+def posts_version(user):
+    """
+    Calcule la version de la liste des posts d'un utilisateur.
+
+    Args:
+        user: L'utilisateur dont on affiche les posts
+
+    Returns:
+        str: La version des posts
+    """
+    return _digest(user.id, _tokens([AUTHOR_KEY.format(user.id)]))
+
+
+async def afeed_version(user):
+    """
+    Version asynchrone de feed_version : les deux ensembles de relations sont
+    lus simultanément, puis les jetons.
+
+    Args:
+        user: L'utilisateur dont on affiche le flux
+
+    Returns:
+        str: La version du flux (identique à celle de feed_version)
+    """
+    following, excluded = await asyncio.gather(
+        relations.afollowing_ids(user.id), relations.aexcluded_ids(user.id)
+    )
+    following, excluded = sorted(following), sorted(excluded)
+    tokens = await _atokens(_feed_keys(user.id, following))
+    return _digest(user.id, following, excluded, tokens)
+
+
+async def aposts_version(user):
+    """
+    Version asynchrone de posts_version.
+
+    Args:
+        user: L'utilisateur dont on affiche les posts
+
+    Returns:
+        str: La version des posts (identique à celle de posts_version)
+    """
+    return _digest(user.id, await _atokens([AUTHOR_KEY.format(user.id)]))
@@ -1,61 +1,270 @@
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models import CharField, Value, Q
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.contrib import messages
-from itertools import chain
+from django.http import (
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from . import cards
+from . import database
+from . import deletions
+from . import export
+from . import feeds
 from . import forms
+from . import jobs
+from . import metrics
+from . import relations
+from . import search
+from . import timeline
+from . import uploads
+from . import usersearch
+from . import versions
 from .models import Ticket, Review, UserFollows, UserBlocks
 
+# Intervalle d'interrogation des nouvelles publications du flux (en secondes)
+POLL_INTERVAL = getattr(settings, "LISTINGS_FEED_POLL_INTERVAL", 30)
 
-@login_required
-def feed(request):
+
+def _page_etag(request, version):
+    """
+    Construit l'ETag d'une page paginée à partir de la version de son contenu.
+
+    Args:
+        request: La requête HTTP
+        version: La version du flux ou des posts
+
+    Returns:
+        str: L'ETag de la page demandée
+    """
+    cursor = feeds.decode_cursor(request.GET.get("before"))
+    return f"{version}-{feeds.encode_cursor(cursor) if cursor else 'first'}"
+
+
+def _html_etag(request, version, pending_messages):
+    """
+    Construit l'ETag d'une page HTML, ou None si elle ne peut pas être servie
+    depuis le cache du client.
+
+    La page contient un jeton CSRF : l'ETag dépend donc du secret CSRF de la
+    session. Une page qui affiche des messages n'a pas d'ETag.
+
+    Args:
+        request: La requête HTTP
+        version: La version du flux ou des posts
+        pending_messages: Le nombre de messages en attente d'affichage
+
+    Returns:
+        str: L'ETag de la page, ou None
+    """
+    if pending_messages:
+        return None
+    csrf = hashlib.sha256(request.META.get("CSRF_COOKIE", "").encode())
+    return f"{_page_etag(request, version)}-{csrf.hexdigest()[:8]}"
+
+
+@sync_to_async
+def _pending_messages(request):
+    """Nombre de messages en attente (la session est lue de façon synchrone)"""
+    return len(messages.get_messages(request))
+
+
+async def _feed_etag(request):
+    """ETag de la page du flux d'activité"""
+    pending, version = await asyncio.gather(
+        _pending_messages(request), versions.afeed_version(request.user)
+    )
+    return _html_etag(request, version, pending)
+
+
+async def _posts_etag(request):
+    """ETag de la page des posts"""
+    pending, version = await asyncio.gather(
+        _pending_messages(request), versions.aposts_version(request.user)
+    )
+    return _html_etag(request, version, pending)
+
+
+async def _feed_api_etag(request):
+    """ETag de l'API JSON du flux d'activité"""
+    return _page_etag(request, await versions.afeed_version(request.user))
+
+
+def _async_login_required(view):
+    """
+    Équivalent de login_required pour une vue asynchrone.
+
+    L'utilisateur est lu avec `request.auser()` puis remplace `request.user`,
+    pour que les templates ne le relisent pas en base.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _async_condition(etag_func):
+    """
+    Équivalent du décorateur condition pour une vue asynchrone dont la
+    fonction d'ETag est elle aussi asynchrone.
+
+    Args:
+        etag_func: Coroutine (request) -> ETag ou None
+
+    Returns:
+        function: Le décorateur
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = await etag_func(request)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+@database.replica_reads
+@_async_login_required
+@cache_control(private=True, no_cache=True)
+@_async_condition(_feed_etag)
+async def feed(request):
     """
     Affiche le flux d'activité de l'utilisateur.
     Montre les tickets et critiques de l'utilisateur et des personnes qu'il suit,
     triés par date de création (du plus récent au plus ancien).
 
+    Le flux est lu dans la table matérialisée TimelineEntry et paginé par
+    curseur : le paramètre `before` contient la clé de la dernière publication
+    de la page précédente. La vue est asynchrone : servie par l'application
+    ASGI, elle ne bloque pas de thread pendant les lectures en base.
+
     Args:
         request: La requête HTTP
 
     Returns:
         HttpResponse: Page du flux d'activité
     """
-    # Exclusion des utilisateurs bloqués
-    blocked_users = request.user.blocking.values("blocked_user")
-    users_blocking_me = request.user.blocked_by.values("user")
+    cursor = feeds.decode_cursor(request.GET.get("before"))
+    keys, next_cursor = await feeds.atimeline_page_keys(request.user, cursor=cursor)
+    context = {
+        "posts": await feeds.ahydrate(keys),
+        "next_cursor": next_cursor,
+        # La première page signale les nouvelles publications (feed_updates)
+        "newest_cursor": feeds.encode_cursor(keys[0]) if keys else "",
+        "poll_interval": POLL_INTERVAL if cursor is None else None,
+    }
+    return await sync_to_async(render)(request, "listings/feed.html", context)
+
+
+@database.replica_reads
+@_async_login_required
+@cache_control(private=True, no_cache=True)
+@_async_condition(_feed_api_etag)
+async def feed_api(request):
+    """
+    Renvoie une page du flux d'activité au format JSON.
 
-    # Récupération des tickets avec les utilisateurs associés
-    tickets = (
-        Ticket.objects.select_related("user")
-        .filter(
-            Q(user__in=request.user.following.values("followed_user"))
-            | Q(user=request.user)
-        )
-        .exclude(Q(user__in=blocked_users) | Q(user__in=users_blocking_me))
-    )
+    La réponse porte un ETag fort calculé à partir de la version du flux :
+    une requête `If-None-Match` reçoit une réponse 304 tant que le flux n'a
+    pas changé, sans que les publications soient lues.
 
-    # Récupération des critiques avec les utilisateurs et tickets associés
-    reviews = (
-        Review.objects.select_related("user", "ticket", "ticket__user")
-        .filter(
-            Q(user__in=request.user.following.values("followed_user"))
-            | Q(user=request.user)
-            | Q(ticket__user=request.user)
-        )
-        .exclude(Q(user__in=blocked_users) | Q(user__in=users_blocking_me))
+    Args:
+        request: La requête HTTP (paramètre `before` : curseur de pagination)
+
+    Returns:
+        JsonResponse: Les publications de la page et le curseur suivant
+    """
+    keys, next_cursor = await feeds.atimeline_page_keys(
+        request.user, cursor=feeds.decode_cursor(request.GET.get("before"))
+    )
+    return JsonResponse(
+        {
+            "posts": [feeds.as_dict(post) for post in await feeds.ahydrate(keys)],
+            "next": next_cursor,
+        },
+        json_dumps_params={"ensure_ascii": False},
     )
 
-    tickets = tickets.annotate(content_type=Value("TICKET", CharField()))
-    reviews = reviews.annotate(content_type=Value("REVIEW", CharField()))
 
-    posts = sorted(
-        chain(reviews, tickets), key=lambda post: post.time_created, reverse=True
+@database.replica_reads
+@_async_login_required
+@cache_control(private=True, no_cache=True)
+async def feed_updates(request):
+    """
+    Indique le nombre de publications arrivées dans le flux depuis l'affichage
+    de la page.
+
+    La page du flux interroge cette vue toutes les POLL_INTERVAL secondes ;
+    une seule requête sur l'index du flux matérialisé est exécutée.
+
+    Args:
+        request: La requête HTTP (paramètre `after` : curseur de la
+            publication la plus récente affichée)
+
+    Returns:
+        JsonResponse: Le nombre de nouvelles publications (au plus une page),
+            s'il y en a davantage, et le curseur de la plus récente
+    """
+    after = request.GET.get("after", "")
+    keys, more = await feeds.anewer_keys(request.user, feeds.decode_cursor(after))
+    return JsonResponse(
+        {
+            "count": len(keys),
+            "more": more,
+            "newest": feeds.encode_cursor(keys[0]) if keys else after,
+        }
     )
 
-    return render(request, "listings/feed.html", context={"posts": posts})
+
+def feed_stream(request):
+    """
+    Flux en direct des nouvelles publications, lorsqu'il n'est pas servi.
+
+    Sous ASGI, /feed/stream/ est intercepté par LiveFeedRouter (live.py)
+    avant d'atteindre Django. Cette vue ne répond donc que sous WSGI : le
+    code 204 demande au navigateur de ne pas se reconnecter, et la page du
+    flux revient à l'interrogation périodique de feed_updates.
+
+    Args:
+        request: La requête HTTP
+
+    Returns:
+        HttpResponse: Réponse vide (204)
+    """
+    return HttpResponse(status=204)
 
 
 def signup_page(request):
@@ -93,11 +302,15 @@ def ticket_create(request):
     """
     form = forms.TicketForm()
     if request.method == "POST":
-        form = forms.TicketForm(request.POST, request.FILES)
+        form = forms.TicketForm(
+            request.POST, request.FILES, upload_errors=uploads.errors(request)
+        )
         if form.is_valid():
             ticket = form.save(commit=False)
             ticket.user = request.user
             ticket.save()
+            if ticket.image:
+                jobs.enqueue("images.refresh", ticket_id=ticket.id)
             return redirect("feed")
     return render(request, "listings/ticket_create.html", {"form": form})
 
@@ -119,7 +332,7 @@ def review_create(request, ticket_id=None):
     ticket_form = forms.TicketForm()
     review_form = forms.ReviewForm()
     if ticket_id:
-        ticket = get_object_or_404(Ticket, id=ticket_id)
+        ticket = get_object_or_404(Ticket, id=ticket_id, hidden=False)
         if request.method == "POST":
             review_form = forms.ReviewForm(request.POST)
             if review_form.is_valid():
@@ -135,12 +348,16 @@ def review_create(request, ticket_id=None):
         )
     else:
         if request.method == "POST":
-            ticket_form = forms.TicketForm(request.POST, request.FILES)
+            ticket_form = forms.TicketForm(
+                request.POST, request.FILES, upload_errors=uploads.errors(request)
+            )
             review_form = forms.ReviewForm(request.POST)
             if all([ticket_form.is_valid(), review_form.is_valid()]):
                 ticket = ticket_form.save(commit=False)
                 ticket.user = request.user
                 ticket.save()
+                if ticket.image:
+                    jobs.enqueue("images.refresh", ticket_id=ticket.id)
                 review = review_form.save(commit=False)
                 review.user = request.user
                 review.ticket = ticket
@@ -153,28 +370,102 @@ def review_create(request, ticket_id=None):
         return render(request, "listings/review_create.html", context=context)
 
 
-@login_required
-def posts(request):
+@database.replica_reads
+@_async_login_required
+@cache_control(private=True, no_cache=True)
+@_async_condition(_posts_etag)
+async def posts(request):
     """
     Affiche tous les posts (tickets et critiques) de l'utilisateur connecté.
 
+    Les posts sont paginés par curseur comme le flux d'activité.
+
     Args:
         request: La requête HTTP
 
     Returns:
         HttpResponse: Page des posts de l'utilisateur
     """
-    tickets = Ticket.objects.filter(user=request.user)
-    reviews = Review.objects.filter(user=request.user)
+    tickets, reviews = feeds.posts_querysets(request.user)
+    keys, next_cursor = await feeds.apage_keys(
+        tickets, reviews, cursor=feeds.decode_cursor(request.GET.get("before"))
+    )
+    context = {"posts": await feeds.ahydrate(keys), "next_cursor": next_cursor}
+    return await sync_to_async(render)(request, "listings/posts.html", context)
+
 
-    tickets = tickets.annotate(content_type=Value("TICKET", CharField()))
-    reviews = reviews.annotate(content_type=Value("REVIEW", CharField()))
+@login_required
+def search_posts(request):
+    """
+    Recherche des tickets et critiques par mots-clés.
 
-    posts = sorted(
-        chain(reviews, tickets), key=lambda post: post.time_created, reverse=True
+    Les résultats sont classés par pertinence par l'index plein texte et
+    excluent les utilisateurs bloqués.
+
+    Args:
+        request: La requête HTTP (paramètres `q` et `page`)
+
+    Returns:
+        HttpResponse: Page des résultats de recherche
+    """
+    query = request.GET.get("q", "").strip()
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except ValueError:
+        page = 1
+    results, has_next = search.search(request.user, query, page)
+    return render(
+        request,
+        "listings/search.html",
+        context={
+            "query": query,
+            "posts": results,
+            "page": page,
+            "next_page": page + 1 if has_next else None,
+            "previous_page": page - 1 if page > 1 else None,
+        },
     )
 
-    return render(request, "listings/posts.html", context={"posts": posts})
+
+@login_required
+def posts_export(request):
+    """
+    Exporte tous les posts de l'utilisateur connecté en NDJSON ou en CSV.
+
+    La réponse est produite en flux : les publications sont lues par lots et
+    envoyées au fur et à mesure, quel que soit leur nombre. Sous ASGI, le flux
+    est un générateur asynchrone, que StreamingHttpResponse lit sans le
+    charger en entier.
+
+    Args:
+        request: La requête HTTP (paramètre `format` : "ndjson" ou "csv")
+
+    Returns:
+        StreamingHttpResponse: Le fichier d'export
+    """
+    formats = {
+        "csv": (export.csv_lines, export.acsv_lines, "text/csv"),
+        "ndjson": (
+            export.ndjson_lines,
+            export.andjson_lines,
+            "application/x-ndjson",
+        ),
+    }
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in formats:
+        return HttpResponseBadRequest("Format d'export inconnu.")
+    sync_lines, async_lines, content_type = formats[export_format]
+    if isinstance(request, ASGIRequest):
+        lines = async_lines(request.user)
+    else:
+        lines = sync_lines(request.user)
+
+    response = StreamingHttpResponse(
+        lines, content_type=f"{content_type}; charset=utf-8"
+    )
+    filename = f"litrevu-posts-{request.user.username}.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
 
 
 @login_required
@@ -194,43 +485,69 @@ def follow_users(request):
         form = forms.UserFollowsForm(request.POST, user=request.user)
         if form.is_valid():
             user_to_follow = form.cleaned_data["followed_user"]
-            if UserBlocks.objects.filter(
-                Q(user=request.user, blocked_user=user_to_follow)
-                | Q(user=user_to_follow, blocked_user=request.user)
-            ).exists():
+            if relations.is_blocked_between(request.user.id, user_to_follow.id):
                 messages.error(
                     request,
                     "Impossible de suivre cet utilisateur car l'un de vous "
                     "a bloqué l'autre.",
                 )
             else:
-                UserFollows.objects.get_or_create(
+                _, created = UserFollows.objects.get_or_create(
                     user=request.user, followed_user=user_to_follow
                 )
+                if created:
+                    jobs.enqueue(
+                        "timeline.backfill",
+                        user_id=request.user.id,
+                        author_id=user_to_follow.id,
+                    )
                 messages.success(
                     request, f"Vous suivez maintenant {user_to_follow.username}"
                 )
             return redirect("follow-users")
 
-    following = UserFollows.objects.select_related("followed_user").filter(
-        user=request.user
-    )
-    followers = UserFollows.objects.select_related("user").filter(
-        followed_user=request.user
-    )
-    blocked = UserBlocks.objects.select_related("blocked_user").filter(
-        user=request.user
-    )
-
     return render(
         request,
         "listings/follow_users.html",
-        context={
-            "form": form,
-            "following": following,
-            "followers": followers,
-            "blocked": blocked,
+        context={"form": form, **relations.follow_lists(request.user)},
+    )
+
+
+@login_required
+def user_search(request):
+    """
+    Renvoie les noms d'utilisateur commençant par un préfixe (autocomplétion).
+
+    Chaque résultat indique si l'utilisateur peut être suivi : ni l'utilisateur
+    courant, ni un utilisateur déjà suivi, ni un blocage entre les deux.
+
+    Args:
+        request: La requête HTTP (paramètres `q`, `limit` et `offset`)
+
+    Returns:
+        JsonResponse: Les résultats et la position de la page suivante
+    """
+    try:
+        limit = int(request.GET.get("limit", usersearch.DEFAULT_LIMIT))
+        offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        return HttpResponseBadRequest("Paramètres de pagination invalides.")
+
+    rows, has_more = usersearch.search(request.GET.get("q", ""), limit, offset)
+    unavailable = {
+        request.user.id,
+        *relations.following_ids(request.user.id),
+        *relations.excluded_ids(request.user.id),
+    }
+    return JsonResponse(
+        {
+            "results": [
+                {"id": pk, "username": username, "followable": pk not in unavailable}
+                for pk, username in rows
+            ],
+            "next_offset": max(0, offset) + len(rows) if has_more else None,
         },
+        json_dumps_params={"ensure_ascii": False},
     )
 
 
@@ -247,9 +564,11 @@ def unfollow_user(request, user_id):
         HttpResponse: Redirection vers la page des abonnements
     """
     user_to_unfollow = get_object_or_404(User, id=user_id)
-    UserFollows.objects.filter(
+    deleted, _ = UserFollows.objects.filter(
         user=request.user, followed_user=user_to_unfollow
     ).delete()
+    if deleted:
+        timeline.purge(request.user, user_to_unfollow)
     messages.success(request, f"Vous ne suivez plus {user_to_unfollow.username}")
     return redirect("follow-users")
 
@@ -282,6 +601,7 @@ def block_user(request, user_id):
 
     # Création du blocage
     UserBlocks.objects.get_or_create(user=request.user, blocked_user=user_to_block)
+    timeline.purge_blocked(request.user, user_to_block)
     messages.success(request, f"Vous avez bloqué {user_to_block.username}")
 
     return redirect("follow-users")
@@ -300,7 +620,15 @@ def unblock_user(request, user_id):
         HttpResponse: Redirection vers la page des abonnements
     """
     user_to_unblock = get_object_or_404(User, id=user_id)
-    UserBlocks.objects.filter(user=request.user, blocked_user=user_to_unblock).delete()
+    deleted, _ = UserBlocks.objects.filter(
+        user=request.user, blocked_user=user_to_unblock
+    ).delete()
+    if deleted:
+        jobs.enqueue(
+            "timeline.restore_unblocked",
+            user_id=request.user.id,
+            other_id=user_to_unblock.id,
+        )
     messages.success(request, f"Vous avez débloqué {user_to_unblock.username}")
     return redirect("follow-users")
 
@@ -318,11 +646,20 @@ def ticket_edit(request, ticket_id):
         HttpResponse: Page d'édition du ticket ou redirection vers les posts si
             modification réussie
     """
-    ticket = get_object_or_404(Ticket, id=ticket_id, user=request.user)
+    ticket = get_object_or_404(Ticket, id=ticket_id, user=request.user, hidden=False)
     if request.method == "POST":
-        form = forms.TicketForm(request.POST, request.FILES, instance=ticket)
+        time_edited = ticket.time_edited
+        form = forms.TicketForm(
+            request.POST,
+            request.FILES,
+            instance=ticket,
+            upload_errors=uploads.errors(request),
+        )
         if form.is_valid():
             form.save()
+            if "image" in form.changed_data:
+                jobs.enqueue("images.refresh", ticket_id=ticket.id)
+            cards.invalidate_ticket(ticket, time_edited)
             return redirect("posts")
     else:
         form = forms.TicketForm(instance=ticket)
@@ -344,9 +681,12 @@ def ticket_delete(request, ticket_id):
         HttpResponse: Page de confirmation ou redirection vers les posts si
             suppression effectuée
     """
-    ticket = get_object_or_404(Ticket, id=ticket_id, user=request.user)
+    ticket = get_object_or_404(Ticket, id=ticket_id, user=request.user, hidden=False)
     if request.method == "POST":
-        ticket.delete()
+        # Le ticket est masqué immédiatement ; ses critiques, ses entrées des
+        # flux et les références à ses images sont supprimées par lots en
+        # arrière-plan (deletions.py)
+        deletions.delete_ticket(ticket)
         return redirect("posts")
     return render(request, "listings/ticket_delete.html", {"ticket": ticket})
 
@@ -364,11 +704,15 @@ def review_edit(request, review_id):
         HttpResponse: Page d'édition de la critique ou redirection vers les posts si
             modification réussie
     """
-    review = get_object_or_404(Review, id=review_id, user=request.user)
+    review = get_object_or_404(
+        Review, id=review_id, user=request.user, hidden=False, ticket__hidden=False
+    )
     if request.method == "POST":
+        time_edited = review.time_edited
         form = forms.ReviewForm(request.POST, instance=review)
         if form.is_valid():
             form.save()
+            cards.invalidate_review(review, time_edited)
             return redirect("posts")
     else:
         form = forms.ReviewForm(instance=review)
@@ -390,8 +734,11 @@ def review_delete(request, review_id):
         HttpResponse: Page de confirmation ou redirection vers les posts si
             suppression effectuée
     """
-    review = get_object_or_404(Review, id=review_id, user=request.user)
+    review = get_object_or_404(
+        Review, id=review_id, user=request.user, hidden=False, ticket__hidden=False
+    )
     if request.method == "POST":
+        cards.invalidate_review(review)
         review.delete()
         return redirect("posts")
     return render(request, "listings/review_delete.html", {"review": review})
@@ -412,3 +759,31 @@ def logout_view(request):
         logout(request)
         messages.success(request, "Vous avez été déconnecté avec succès.")
     return redirect("login")
+
+
+def metrics_endpoint(request):
+    """
+    Expose les métriques du processus au format texte de Prometheus.
+
+    Réservé aux membres de l'équipe (is_staff) ; un collecteur peut aussi
+    s'authentifier par l'en-tête `Authorization: Bearer <jeton>` si le
+    paramètre LISTINGS_METRICS_TOKEN est défini.
+
+    Args:
+        request: La requête HTTP
+
+    Returns:
+        HttpResponse: Les métriques, ou 403 si l'accès est refusé
+    """
+    token = getattr(settings, "LISTINGS_METRICS_TOKEN", None)
+    authorized = request.user.is_staff or (
+        token
+        and constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    )
+    if not authorized:
+        return HttpResponseForbidden("Accès réservé à l'équipe.")
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -2,6 +2,8 @@
 Configuration ASGI pour le projet literevu.
 
 Il expose le module ASGI comme une variable de niveau supérieur nommée ``application``.
+Le flux en direct (/feed/stream/, voir listings/live.py) est servi devant
+l'application de Django ; toutes les autres requêtes lui sont transmises.
 
 Pour plus d'informations sur ce fichier, voir
 https://docs.djangoproject.com/fr/5.0/howto/deployment/asgi/
@@ -13,4 +15,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "literevu.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importé après l'initialisation de Django (modèles chargés)
+from listings.live import LiveFeedRouter  # noqa: E402
+
+application = LiveFeedRouter(django_application)
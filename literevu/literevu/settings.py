@@ -47,11 +47,14 @@ INSTALLED_APPS = [
 # Middleware - Composants qui traitent les requêtes/réponses
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",  # Sécurité
+    "listings.middleware.MetricsMiddleware",  # Métriques par vue (/metrics/)
     "django.contrib.sessions.middleware.SessionMiddleware",  # Sessions
     "django.middleware.common.CommonMiddleware",  # Fonctionnalités communes
     "django.middleware.csrf.CsrfViewMiddleware",  # Protection CSRF
     "django.contrib.auth.middleware.AuthenticationMiddleware",  # Authentification
     "django.contrib.messages.middleware.MessageMiddleware",  # Messages
+    # Profil d'une requête à la demande (inactif sans LISTINGS_PROFILER_ENABLED)
+    "listings.middleware.ProfilerMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",  # Protection clickjacking
 ]
 
@@ -130,10 +133,32 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"  # URL pour accéder aux fichiers média
 MEDIA_ROOT = BASE_DIR / "media"  # Répertoire de stockage des fichiers média
 
+# Réception des fichiers envoyés : écrits sur disque par morceaux, refusés dès
+# qu'ils dépassent les limites de taille et de dimensions (voir uploads.py)
+FILE_UPLOAD_HANDLERS = ["listings.uploads.LimitedImageUploadHandler"]
+
 # Configuration de l'authentification
 LOGIN_URL = "login"  # URL de la page de connexion
 LOGIN_REDIRECT_URL = "feed"  # Redirection après connexion
 LOGOUT_REDIRECT_URL = "login"  # Redirection après déconnexion
 
+# Cache Django : mémoire du processus en développement. Il sert de second
+# niveau aux caches de listings/caching.py et doit être partagé entre les
+# processus en production (voir settings_production.py)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "litrevu",
+    }
+}
+
+# Utilisateur de chaque requête lu depuis le cache (voir listings/backends.py)
+AUTHENTICATION_BACKENDS = ["listings.backends.CachedModelBackend"]
+
+# Sessions lues depuis un cache du processus, puis le cache partagé, puis la
+# base de données ; une session inchangée n'est pas réécrite (voir
+# listings/sessions.py)
+SESSION_ENGINE = "listings.sessions"
+
 # Type de clé primaire par défaut
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
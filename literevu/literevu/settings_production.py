@@ -0,0 +1,68 @@
+"""
+Profil de production de la base de données.
+
+Ce fichier reprend settings.py et remplace la configuration de la base
+SQLite. Il s'active avec :
+    DJANGO_SETTINGS_MODULE=literevu.settings_production
+
+Il définit notamment :
+- Les PRAGMA appliqués à chaque nouvelle connexion (voir listings/database.py)
+- Des connexions persistantes, vérifiées avant réutilisation
+- Une connexion en lecture seule pour le flux et les posts : le même fichier
+  ouvert en lecture seule, ou la copie désignée par LITREVU_DB_REPLICA
+- Un cache partagé par tous les processus : Redis si LITREVU_REDIS_URL est
+  défini (paquet redis requis), sinon des fichiers sur disque
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+# Fichier de la base principale et, facultativement, de sa copie répliquée
+DATABASE_PATH = os.environ.get("LITREVU_DB_PATH", str(BASE_DIR / "db.sqlite3"))
+REPLICA_PATH = os.environ.get("LITREVU_DB_REPLICA", DATABASE_PATH)
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": DATABASE_PATH,
+        "CONN_MAX_AGE": 600,  # Connexions conservées entre les requêtes
+        "CONN_HEALTH_CHECKS": True,  # Vérifiées avant d'être réutilisées
+        "OPTIONS": {"timeout": 5},  # Attente d'un verrou (en secondes)
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        # Ouverture en lecture seule (URI SQLite)
+        "NAME": f"file:{REPLICA_PATH}?mode=ro",
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"timeout": 5},
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+# Lectures du flux et des posts vers la connexion en lecture seule
+DATABASE_ROUTERS = ["listings.database.ReadReplicaRouter"]
+
+# PRAGMA de chaque nouvelle connexion SQLite (WAL, mmap, cache, attente des
+# verrous...) : voir PROFILES dans listings/database.py
+LISTINGS_SQLITE_PROFILE = "production"
+
+# Cache partagé entre les processus, second niveau des caches de
+# listings/caching.py (sessions, utilisateurs, relations, versions)
+if os.environ.get("LITREVU_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["LITREVU_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("LITREVU_CACHE_DIR", str(BASE_DIR / "cache")),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }
+    }